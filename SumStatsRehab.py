@@ -4,7 +4,7 @@ import os
 from subprocess import call
 import inspect
 import time
-from typing import Dict, List, Literal, Union
+from typing import Any, Callable, Dict, List, Literal, Union
 import json
 import argparse
 import pathlib
@@ -13,13 +13,16 @@ import pathlib
 from lib.prepare_two_dbSNPs import prepare_two_dbSNPs
 from lib.prepare_GWASSS_columns import prepare_GWASSS_columns
 from lib.validate_GWASSS_entries import validate_GWASSS_entries
+from lib.sample_GWASSS_entries import sample_GWASSS_entries
 from lib.sort_GWASSS_by_ChrBP import sort_GWASSS_by_ChrBP
 from lib.sort_GWASSS_by_rsID import sort_GWASSS_by_rsID
-from lib.loop_fix import ResolverName, resolvers_names, loop_fix, ActivatedResolvers
+from lib.liftover_GWASSS import liftover_GWASSS
+from lib.loop_fix import ResolverName, resolvers_names, loop_fix, ActivatedResolvers, write_checkpoint
 from lib.report_utils import read_report_from_dir
 from lib.standard_column_order import STANDARD_COLUMN_ORDER
 from lib.env import get_build, set_build
 from lib.utils import mv, rm, rm_r, rm_rf
+from lib.file import BGZF_DEFAULT_LEVEL, is_bgzf_output, compress_into_bgzf, file_exists, get_file_stat
 
 
 
@@ -42,6 +45,23 @@ def perc(x, total):
         return str(round((x/total)*100, 2)) + "%"
 
 
+# the run manifest of fix, with the steps it has finished, is written next to the output file with this extension
+RUN_MANIFEST_EXT = '.run.json'
+
+def get_outputs_stat(paths: List[str]) -> Dict[str, Any]:
+    """
+    Size and modification time of each output of a step of fix (see `get_file_stat`): of the file,
+    or of each file in the dir, or None if it doesn't exist
+    """
+    outputs_stat: Dict[str, Any] = {}
+    for path in paths:
+        if os.path.isdir(path):
+            outputs_stat[path] = {name: get_file_stat(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+        else:
+            outputs_stat[path] = get_file_stat(path) if file_exists(path) else None
+    return outputs_stat
+
+
 class brag:
     def see_formatted_file(self, OUTPUT_FILE: str):
         print(f" see formatted file at: \"{OUTPUT_FILE}\"")
@@ -49,6 +69,9 @@ class brag:
     def see_fixed_file(self, OUTPUT_FILE: str):
         print(f" see fixed file at: \"{OUTPUT_FILE}\"")
 
+    def see_lifted_file(self, OUTPUT_FILE: str):
+        print(f" see lifted file at: \"{OUTPUT_FILE}\"")
+
 
     def all_issues_resolved(self, total_entries: int):
         print(f"All issues with all data points have been resolved!")
@@ -113,6 +136,13 @@ def fix(INPUT_GWAS_FILE: str,
             "pval":  True,
         },
         VERBOSE: bool = False,
+        PROCESSES: int = 1,
+        CACHE_DIR: Union[str, None] = None,
+        ENGINE: Literal['rows', 'chunks'] = 'rows',
+        JOIN: Literal['merge', 'hash'] = 'merge',
+        PIPELINE: bool = False,
+        COMPRESS_LEVEL: int = BGZF_DEFAULT_LEVEL,
+        RESUME: bool = False,
     ):
 
     ### PROCESS INPUT ###
@@ -121,6 +151,7 @@ def fix(INPUT_GWAS_FILE: str,
     OUTPUT_FILE = str(OUTPUT_FILE)
     dbSNP_FILE = str(dbSNP_FILE)
     dbSNP2_FILE = str(dbSNP2_FILE)
+    CACHE_DIR = str(CACHE_DIR) if CACHE_DIR else None
     CHAIN_FILE = str(CHAIN_FILE)
     FREQ_DATABASE_SLUG = str(FREQ_DATABASE_SLUG)
     ACTIVATED_RESOLVERS = ActivatedResolvers(ACTIVATED_RESOLVERS)
@@ -144,14 +175,65 @@ def fix(INPUT_GWAS_FILE: str,
                 issues_to_resolve[field] = True
         return any(issues_to_resolve.values())
 
+    RUN_MANIFEST = OUTPUT_FILE + RUN_MANIFEST_EXT
+    # what the run manifest is valid for: the input, and the arguments that change what the steps make
+    manifest_run = {
+        "INPUT": get_file_stat(INPUT_GWAS_FILE),
+        "config": get_file_stat(JSON_CONFIG),
+        "files": {FILE: get_file_stat(FILE) if file_exists(FILE) else None for FILE in (dbSNP_FILE, dbSNP2_FILE, CHAIN_FILE)},
+        "FREQ_DATABASE_SLUG": FREQ_DATABASE_SLUG,
+        "ACTIVATED_RESOLVERS": dict(ACTIVATED_RESOLVERS),
+        "JOIN": JOIN,
+        "VERBOSE": VERBOSE,
+        "COMPRESS_LEVEL": COMPRESS_LEVEL,
+    }
+    manifest: Dict[str, Any] = {"run": manifest_run, "steps": {}}
+    # steps finished by the interrupted run, which are skipped when it's resumed
+    finished_steps: Dict[str, Any] = {}
+    if RESUME and file_exists(RUN_MANIFEST):
+        with open(RUN_MANIFEST, 'r') as RUN_MANIFEST_o:
+            previous_manifest = json.load(RUN_MANIFEST_o)
+        if previous_manifest["run"] == json.loads(json.dumps(manifest_run)):
+            finished_steps = previous_manifest["steps"]
+        else:
+            print(f"the run manifest {RUN_MANIFEST} is for another input or arguments, so all steps are made again")
+
+    def run_step(step: str, outputs: List[str], make: Callable[[], Any]) -> Any:
+        """
+        Calls `make` and saves the step as finished into the run manifest, with its outputs and what `make` returned.
+        With --resume, a step finished by the interrupted run is skipped instead, if its outputs haven't changed since.
+        Once a step is made again, the steps after it are made again as well, as they are made from its outputs
+        """
+        nonlocal finished_steps
+        finished = finished_steps.get(step)
+        if finished is not None and finished["outputs"] == get_outputs_stat(outputs):
+            print(f"{step} was finished by the interrupted run, so it's skipped")
+            result = finished["result"]
+        else:
+            finished_steps = {}
+            result = make()
+        manifest["steps"][step] = {"outputs": get_outputs_stat(outputs), "result": result}
+        write_checkpoint(RUN_MANIFEST, manifest)
+        return result
+
     intermediate_files: List[str] = []
     def present_output(result_file: str):
+        # the run is finished
+        rm(RUN_MANIFEST)
         if VERBOSE:
             return result_file
         else:
             for junk in intermediate_files:
                 rm_rf(junk)
-            mv(result_file, OUTPUT_FILE)
+            if is_bgzf_output(OUTPUT_FILE) and not is_bgzf_output(result_file):
+                # the file wasn't written by a REHAB that compresses its output
+                print(f'=== Compress the fixed file ===')
+                start_time = time.time()
+                compress_into_bgzf(result_file, OUTPUT_FILE, COMPRESS_LEVEL)
+                rm(result_file)
+                print(f"  Compressing finished in {(time.time() - start_time)} seconds\n")
+            else:
+                mv(result_file, OUTPUT_FILE)
             return OUTPUT_FILE
 
 
@@ -175,10 +257,10 @@ def fix(INPUT_GWAS_FILE: str,
     start_time = time.time()
 
     INPUT_GWAS_FILE_standard = remove_last_ext(INPUT_GWAS_FILE) + "_standard.tsv"
-    prepare_GWASSS_columns(
+    run_step('formatting', [INPUT_GWAS_FILE_standard], lambda: prepare_GWASSS_columns(
         INPUT_GWAS_FILE,
         INPUT_GWAS_FILE_standard,
-    )
+    ))
     print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
 
 
@@ -188,11 +270,15 @@ def fix(INPUT_GWAS_FILE: str,
     start_time = time.time()
 
     input_validation_report_dir = INPUT_GWAS_FILE + "_input-report"
-    validate_GWASSS_entries(
+    run_step('validation', [input_validation_report_dir], lambda: validate_GWASSS_entries(
         INPUT_GWAS_FILE_standard,
         "standard",
-        input_validation_report_dir,   
-    )
+        input_validation_report_dir,
+        PROCESSES=PROCESSES,
+        PLOTS=VERBOSE,
+        CACHE_DIR=CACHE_DIR,
+        ISSUES_BITMASK=True, # lets loop_fix skip re-checking rows, as long as the file isn't sorted in between
+    ))
     intermediate_files.append(input_validation_report_dir)
     print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
 
@@ -216,7 +302,9 @@ def fix(INPUT_GWAS_FILE: str,
     if get_build() != 'hg38' and CHAIN_FILE and CHAIN_FILE != "None":
         if issues['BP']<total_entries and issues['Chr']<total_entries:
             required_liftover = True
-            ChrBP_lost_because_of_liftover = loop_fix(
+            # the lifted file is validated as it's written
+            input_lifted_validation_report_dir = INPUT_GWAS_FILE + "_input-lifted-report"
+            ChrBP_lost_because_of_liftover = run_step('liftover', [INPUT_GWAS_FILE_standard_lifted, input_lifted_validation_report_dir], lambda: loop_fix(
                 INPUT_GWAS_FILE_standard,
                 input_validation_report_dir,
                 INPUT_GWAS_FILE_standard_lifted,
@@ -225,20 +313,19 @@ def fix(INPUT_GWAS_FILE: str,
                 CHAIN_FILE,
                 FREQ_DATABASE_SLUG if FREQ_DATABASE_SLUG else 'None',
                 sorted_by if sorted_by else None,
-            )
+                ENGINE=ENGINE,
+                PIPELINE=PIPELINE,
+                CHECKPOINTS=True,
+                RESUME=RESUME,
+                OUTPUT_REPORT_DIR=input_lifted_validation_report_dir,
+                OUTPUT_REPORT_PLOTS=VERBOSE,
+            ))
             INPUT_GWAS_FILE_prepared = INPUT_GWAS_FILE_standard_lifted
             intermediate_files.append(INPUT_GWAS_FILE_standard)
+            intermediate_files.append(input_lifted_validation_report_dir)
 
             print("finished liftover to hg38 (saved report)")
             set_build('hg38')
-
-            input_lifted_validation_report_dir = INPUT_GWAS_FILE + "_input-lifted-report"
-            validate_GWASSS_entries(
-                INPUT_GWAS_FILE_standard_lifted,
-                "standard",
-                input_lifted_validation_report_dir,
-            )
-            intermediate_files.append(input_lifted_validation_report_dir)
         elif dbSNP2_FILE != 'None':
             # if either Chr or BP is fully missing, there's no need for liftover.
             # Because Chr and BP will be attempted to be restored with dbSNPs in the target build
@@ -259,16 +346,20 @@ def fix(INPUT_GWAS_FILE: str,
         for col in ('Chr', 'BP'):
             if issues[col]:
                 print(f"{issues[col]}/{total_entries} entries are missing {col}")
-        print(f"Going to sort the GWAS SS file by rsID")
-        sort_GWASSS_by_rsID(
-            INPUT_GWAS_FILE_standard_lifted if required_liftover else INPUT_GWAS_FILE_standard,
-            INPUT_GWAS_FILE_standard_sorted,
-        )
-        intermediate_files.append(INPUT_GWAS_FILE_standard_lifted)
-        intermediate_files.append(INPUT_GWAS_FILE_standard)
-        
-        INPUT_GWAS_FILE_prepared = INPUT_GWAS_FILE_standard_sorted
-        print(f"Sorted by rsID")
+        if JOIN == 'hash':
+            # SNPs are looked up by rsID, and the file doesn't have to be sorted
+            print(f"Going to restore the GWAS SS file by rsID")
+        else:
+            print(f"Going to sort the GWAS SS file by rsID")
+            run_step('sorting', [INPUT_GWAS_FILE_standard_sorted], lambda: sort_GWASSS_by_rsID(
+                INPUT_GWAS_FILE_standard_lifted if required_liftover else INPUT_GWAS_FILE_standard,
+                INPUT_GWAS_FILE_standard_sorted,
+            ))
+            intermediate_files.append(INPUT_GWAS_FILE_standard_lifted)
+            intermediate_files.append(INPUT_GWAS_FILE_standard)
+            
+            INPUT_GWAS_FILE_prepared = INPUT_GWAS_FILE_standard_sorted
+            print(f"Sorted by rsID")
 
     elif (
             gonna_resolve('rsID',issues) or 
@@ -285,15 +376,19 @@ def fix(INPUT_GWAS_FILE: str,
         for col in ('rsID', 'OA', 'EA'):
             if issues[col]:
                 print(f"{issues[col]}/{total_entries} entries are missing {col}")
-        print(f"Going to sort the GWAS SS file by Chr and BP")
-        sort_GWASSS_by_ChrBP(
-            INPUT_GWAS_FILE_standard_lifted if required_liftover else INPUT_GWAS_FILE_standard,
-            INPUT_GWAS_FILE_standard_sorted,
-        )
-        intermediate_files.append(INPUT_GWAS_FILE_standard_lifted)
-        intermediate_files.append(INPUT_GWAS_FILE_standard)
-        INPUT_GWAS_FILE_prepared = INPUT_GWAS_FILE_standard_sorted
-        print(f"Sorted by Chr and BP")
+        if JOIN == 'hash':
+            # SNPs are looked up by Chr and BP, and the file doesn't have to be sorted
+            print(f"Going to restore the GWAS SS file by Chr and BP")
+        else:
+            print(f"Going to sort the GWAS SS file by Chr and BP")
+            run_step('sorting', [INPUT_GWAS_FILE_standard_sorted], lambda: sort_GWASSS_by_ChrBP(
+                INPUT_GWAS_FILE_standard_lifted if required_liftover else INPUT_GWAS_FILE_standard,
+                INPUT_GWAS_FILE_standard_sorted,
+            ))
+            intermediate_files.append(INPUT_GWAS_FILE_standard_lifted)
+            intermediate_files.append(INPUT_GWAS_FILE_standard)
+            INPUT_GWAS_FILE_prepared = INPUT_GWAS_FILE_standard_sorted
+            print(f"Sorted by Chr and BP")
 
     print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
 
@@ -326,12 +421,20 @@ def fix(INPUT_GWAS_FILE: str,
 
     ##### 4 #####
     i_step += 1
-    print(f'=== Step {i_step}: REHAB: loopping through the GWAS SS file and fixing entries ===')
+    print(f'=== Step {i_step}: REHAB: loopping through the GWAS SS file, fixing entries, and validating the fixed entries ===')
     start_time = time.time()
 
     FILE_FOR_FIXING = INPUT_GWAS_FILE_prepared
-    REHAB_OUTPUT_FILE = OUTPUT_FILE + '.rehabed.tsv'
-    loop_fix(
+    # a .gz or .bgz output file is compressed by the last REHAB as it's written.
+    # This REHAB is the last one, unless the file may be fixed again after sorting by Chr and BP (see Step 5)
+    COMPRESS_OUTPUT = is_bgzf_output(OUTPUT_FILE) and not VERBOSE
+    may_REHAB_twice = sorted_by != 'ChrBP' and \
+        any(gonna_resolve(col, {c: 1 for c in issues}) for col in ('rsID', 'OA', 'EA', 'EAF')) and \
+        (not issues['Chr']==total_entries and not issues['BP']==total_entries)
+    REHAB_OUTPUT_FILE = OUTPUT_FILE + '.rehabed.tsv' + ('.gz' if COMPRESS_OUTPUT and not may_REHAB_twice else '')
+    # the fixed file is validated as it's written, and the report is saved
+    REHABed_validation_report_dir = INPUT_GWAS_FILE + "_REHABed-report"
+    run_step('REHAB', [REHAB_OUTPUT_FILE, REHABed_validation_report_dir], lambda: loop_fix(
         FILE_FOR_FIXING,
         input_validation_report_dir,
         REHAB_OUTPUT_FILE,
@@ -341,29 +444,23 @@ def fix(INPUT_GWAS_FILE: str,
         FREQ_DATABASE_SLUG if FREQ_DATABASE_SLUG else 'None',
         sorted_by if sorted_by else None,
         ACTIVATED_RESOLVERS,
-    )
+        ENGINE,
+        JOIN,
+        PROCESSES=PROCESSES,
+        PIPELINE=PIPELINE,
+        CHECKPOINTS=True,
+        RESUME=RESUME,
+        COMPRESS_LEVEL=COMPRESS_LEVEL,
+        OUTPUT_REPORT_DIR=REHABed_validation_report_dir,
+        OUTPUT_REPORT_PLOTS=VERBOSE,
+    ))
     intermediate_files.append(FILE_FOR_FIXING)
-    print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
-
-
-
-    ##### 5 #####
-    i_step += 1
-    print(f'=== Step {i_step}: Validate entries in the fixed GWAS SS file and save the report ===')
-    start_time = time.time()
-
-    REHABed_validation_report_dir = INPUT_GWAS_FILE + "_REHABed-report"
-    validate_GWASSS_entries(
-        REHAB_OUTPUT_FILE,
-        "standard",
-        REHABed_validation_report_dir,   
-    )
     intermediate_files.append(REHABed_validation_report_dir)
     print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
 
 
 
-    ##### 6 #####
+    ##### 5 #####
     i_step += 1
     print(f'=== Step {i_step}: Analyze the report after REHAB ===')
     start_time = time.time()
@@ -398,14 +495,17 @@ def fix(INPUT_GWAS_FILE: str,
         for col in ('rsID', 'OA', 'EA'):
             if issues_REHABed[col]:
                 print(f"{issues_REHABed[col]}/{total_entries} entries are missing {col}")
-        print(f"Going to sort the GWAS SS file by Chr and BP")
-        sort_GWASSS_by_ChrBP(
-            REHAB_OUTPUT_FILE,
-            INPUT_GWAS_FILE_standard_sorted2,
-        )
-        intermediate_files.append(REHAB_OUTPUT_FILE)
+        if JOIN == 'hash':
+            print(f"Going to restore the GWAS SS file by Chr and BP")
+        else:
+            print(f"Going to sort the GWAS SS file by Chr and BP")
+            run_step('second sorting', [INPUT_GWAS_FILE_standard_sorted2], lambda: sort_GWASSS_by_ChrBP(
+                REHAB_OUTPUT_FILE,
+                INPUT_GWAS_FILE_standard_sorted2,
+            ))
+            intermediate_files.append(REHAB_OUTPUT_FILE)
 
-        print(f"Sorted by Chr and BP")
+            print(f"Sorted by Chr and BP")
 
     print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
 
@@ -427,14 +527,15 @@ def fix(INPUT_GWAS_FILE: str,
 
 
 
-    ##### 7 #####
+    ##### 6 #####
     i_step += 1
-    print(f'=== Step {i_step}: REHAB: loopping through the GWAS SS file again and fixing entries ===')
+    print(f'=== Step {i_step}: REHAB: loopping through the GWAS SS file again, fixing entries, and validating the fixed entries ===')
     start_time = time.time()
 
-    FILE_FOR_FIXING = INPUT_GWAS_FILE_standard_sorted2 if required_sorting2 else REHAB_OUTPUT_FILE
-    REHAB2_OUTPUT_FILE = OUTPUT_FILE + '.rehabed-twice.tsv'
-    loop_fix(
+    FILE_FOR_FIXING = INPUT_GWAS_FILE_standard_sorted2 if required_sorting2 and JOIN != 'hash' else REHAB_OUTPUT_FILE
+    REHAB2_OUTPUT_FILE = OUTPUT_FILE + '.rehabed-twice.tsv' + ('.gz' if COMPRESS_OUTPUT else '')
+    REHABed_twice_validation_report_dir = INPUT_GWAS_FILE + "_REHABed-twice-report"
+    run_step('second REHAB', [REHAB2_OUTPUT_FILE, REHABed_twice_validation_report_dir], lambda: loop_fix(
         FILE_FOR_FIXING,
         REHABed_validation_report_dir,
         REHAB2_OUTPUT_FILE,
@@ -444,29 +545,23 @@ def fix(INPUT_GWAS_FILE: str,
         FREQ_DATABASE_SLUG if FREQ_DATABASE_SLUG else 'None',
         sorted_by if sorted_by else None,
         ACTIVATED_RESOLVERS,
-    )
+        ENGINE,
+        JOIN,
+        PROCESSES=PROCESSES,
+        PIPELINE=PIPELINE,
+        CHECKPOINTS=True,
+        RESUME=RESUME,
+        COMPRESS_LEVEL=COMPRESS_LEVEL,
+        OUTPUT_REPORT_DIR=REHABed_twice_validation_report_dir,
+        OUTPUT_REPORT_PLOTS=VERBOSE,
+    ))
     intermediate_files.append(FILE_FOR_FIXING)
-    print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
-
-
-
-    ##### 8 #####
-    i_step += 1
-    print(f'=== Step {i_step}: Validate entries in the twice REHABed GWAS SS file and save the report ===')
-    start_time = time.time()
-
-    REHABed_twice_validation_report_dir = INPUT_GWAS_FILE + "_REHABed-twice-report"
-    validate_GWASSS_entries(
-        REHAB2_OUTPUT_FILE,
-        "standard",
-        REHABed_twice_validation_report_dir,
-    )
     intermediate_files.append(REHABed_twice_validation_report_dir)
     print(f"  Step {i_step} finished in {(time.time() - start_time)} seconds\n")
 
 
 
-    ##### 9 #####
+    ##### 7 #####
     i_step += 1
     print(f'=== Step {i_step}: Analyze the report after the second REHAB ===')
     start_time = time.time()
@@ -499,11 +594,12 @@ def fix(INPUT_GWAS_FILE: str,
 
 
 
-def diagnose(INPUT_GWAS_FILE: str, REPORT_DIR: str):
+def diagnose(INPUT_GWAS_FILE: str, REPORT_DIR: str, PROCESSES: int = 1, PLOTS: bool = True, SAMPLE: Union[int, None] = None, SEED: Union[int, None] = None, CACHE_DIR: Union[str, None] = None):
 
     ### PROCESS INPUT ###
     INPUT_GWAS_FILE = str(INPUT_GWAS_FILE)
     REPORT_DIR = str(REPORT_DIR)
+    CACHE_DIR = str(CACHE_DIR) if CACHE_DIR else None
 
     JSON_CONFIG = INPUT_GWAS_FILE + '.json'
     if not os.path.isfile(JSON_CONFIG):
@@ -514,17 +610,31 @@ def diagnose(INPUT_GWAS_FILE: str, REPORT_DIR: str):
     print(f'=== Diagnosis ===')
     start_time = time.time()
 
+    if SAMPLE:
+        sample_GWASSS_entries(
+            INPUT_GWAS_FILE,
+            JSON_CONFIG,
+            REPORT_DIR if REPORT_DIR and REPORT_DIR != 'None' else None,
+            SAMPLE_SIZE=SAMPLE,
+            SEED=SEED,
+        )
+        print(f"  Diagnosis finished in {(time.time() - start_time)} seconds\n")
+        return None
+
     validate_GWASSS_entries(
         INPUT_GWAS_FILE,
         JSON_CONFIG,
         REPORT_DIR if REPORT_DIR and REPORT_DIR != 'None' else None,
+        PROCESSES=PROCESSES,
+        PLOTS=PLOTS,
+        CACHE_DIR=CACHE_DIR,
     )
     print(f"  Diagnosis finished in {(time.time() - start_time)} seconds\n")
 
     return None
 
 
-def sort(INPUT_GWAS_FILE: str, OUTPUT_FILE: str, SORT_BY: str):
+def sort(INPUT_GWAS_FILE: str, OUTPUT_FILE: str, SORT_BY: str, COMPRESS_LEVEL: int = BGZF_DEFAULT_LEVEL):
 
     ### PROCESS INPUT ###
     INPUT_GWAS_FILE = str(INPUT_GWAS_FILE)
@@ -553,15 +663,18 @@ def sort(INPUT_GWAS_FILE: str, OUTPUT_FILE: str, SORT_BY: str):
     print(f'=== Sorting the GWAS SS file by {SORT_BY} ===')
     start_time = time.time()
 
+    # a .gz or .bgz output file is compressed as the sorted rows are written
     if SORT_BY == 'rsID':
         sort_GWASSS_by_rsID(
             FILE_TO_SORT,
             OUTPUT_FILE,
+            COMPRESS_LEVEL,
         )
     elif SORT_BY == 'ChrBP':
         sort_GWASSS_by_ChrBP(
             FILE_TO_SORT,
             OUTPUT_FILE,
+            COMPRESS_LEVEL,
         )
 
     print(f"  Sorting finished in {(time.time() - start_time)} seconds\n")
@@ -569,7 +682,58 @@ def sort(INPUT_GWAS_FILE: str, OUTPUT_FILE: str, SORT_BY: str):
     return None
 
 
-def prepare_dbSNPs(SNPs_FILE: str, OUTPUT_FILE: str, gzsort: str, bcftools: str, buffer_size: str):
+def liftover(INPUT_GWAS_FILE: str, OUTPUT_FILE: str, CHAIN_FILE: str, UNMAPPED_FILE: Union[str, None] = None, SORT: bool = False, BUILD: Union[str, None] = None):
+
+    ### PROCESS INPUT ###
+    INPUT_GWAS_FILE = str(INPUT_GWAS_FILE)
+    OUTPUT_FILE = str(OUTPUT_FILE)
+    CHAIN_FILE = str(CHAIN_FILE)
+    UNMAPPED_FILE = str(UNMAPPED_FILE) if UNMAPPED_FILE else OUTPUT_FILE + ".unmapped.tsv"
+    BUILD = set_build(BUILD) if BUILD else None
+
+    FILE_TO_LIFT = INPUT_GWAS_FILE
+
+    if os.path.isfile(INPUT_GWAS_FILE+".json"):
+        ##### 1 #####
+        print(f'=== Format the GWAS SS file ===')
+        start_time = time.time()
+
+        FILE_TO_LIFT = OUTPUT_FILE + ".unlifted.tsv"
+        prepare_GWASSS_columns(
+            INPUT_GWAS_FILE,
+            FILE_TO_LIFT,
+        )
+        print(f"  Formatting finished in {(time.time() - start_time)} seconds\n")
+
+    else:
+        print("there's no corresponding .json file, so STANDARD_COLUMN_ORDER is assumed")
+
+
+    ##### 2 #####
+    print(f'=== Lifting over the GWAS SS file ===')
+    start_time = time.time()
+
+    lifted, unmapped = liftover_GWASSS(
+        FILE_TO_LIFT,
+        CHAIN_FILE,
+        OUTPUT_FILE,
+        UNMAPPED_FILE,
+        SORT,
+        BUILD,
+    )
+    if FILE_TO_LIFT != INPUT_GWAS_FILE:
+        rm(FILE_TO_LIFT)
+
+    print(f"  Liftover finished in {(time.time() - start_time)} seconds\n")
+    total = lifted + unmapped
+    print(f"{lifted} SNP entries were lifted over" + (f" ({perc(lifted, total)})" if total else ""))
+    print(f"{unmapped} SNP entries couldn't be lifted over, see them at: \"{UNMAPPED_FILE}\"")
+    BRAG.see_lifted_file(OUTPUT_FILE)
+
+    return None
+
+
+def prepare_dbSNPs(SNPs_FILE: str, OUTPUT_FILE: str, gzsort: str, bcftools: str, buffer_size: str, BINARY: bool = False, FREQ_DATABASE_SLUGS: Union[List[str], None] = None):
 
     ### PROCESS INPUT ###
     SNPs_FILE = str(SNPs_FILE)
@@ -585,6 +749,8 @@ def prepare_dbSNPs(SNPs_FILE: str, OUTPUT_FILE: str, gzsort: str, bcftools: str,
         bcftools,
         buffer_size,
         OUTPUT_FILE,
+        BINARY,
+        FREQ_DATABASE_SLUGS,
     )
 
     return None
@@ -640,6 +806,7 @@ def main():
     PREPARE_DBSNPS_PARSER = subparser.add_parser('prepare_dbSNPs', help="prepares two DBs from the given dbSNP database. These two DBs are required for restoring rsID, chr, BP, alleles, and allele frequencies")
     DIAGNOSE_PARSER = subparser.add_parser('diagnose', help="only diagnosis. Produce report to a directory or just pop up plots")
     SORT_PARSER = subparser.add_parser('sort', help="sort GWAS SS file either by Chr:BP or rsID")
+    LIFTOVER_PARSER = subparser.add_parser('liftover', help="only liftover of Chr and BP with a chain file, without dbSNPs")
 
 
     # fix.add_argument('-v', '--version', action='version', version='%(prog)s {}'.format(version))
@@ -664,12 +831,38 @@ def main():
         "The --OUTPUT key path will be used as a base name for the resulting files, and will not be the exact path to a file\n" + 
         "This key doesn't affect logging."
         , required=False)
+    FIX_PARSER.add_argument('--processes', dest='PROCESSES', type=int, required=False, default=1,
+        help='Number of processes to validate entries and to restore data by Chr and BP with. Default: 1')
+    FIX_PARSER.add_argument('--cache-dir', dest='CACHE_DIR', type=pathlib.Path, required=False, default=None,
+        help='A directory to cache validated entries in. Re-running fix on the same input then doesn\'t re-validate intermediate files that come out the same')
+    FIX_PARSER.add_argument('--engine', dest='ENGINE', choices=['rows', 'chunks'], required=False, default='rows',
+        help='How the file is looped through when fixing: "rows" fixes rows one by one, "chunks" checks chunks of rows at once and only passes rows with issues to each resolver. The output is the same. Default: rows')
+    FIX_PARSER.add_argument('--join', dest='JOIN', choices=['merge', 'hash'], required=False, default='merge',
+        help='How rows are matched with SNPs in dbSNPs: "merge" sorts the GWAS SS file and merges it with a dbSNP, "hash" keeps the file unsorted and looks up SNPs it needs, which are read from a dbSNP into memory. Default: merge')
+    FIX_PARSER.add_argument('--compress-level', dest='COMPRESS_LEVEL', type=int, choices=range(10), required=False, default=BGZF_DEFAULT_LEVEL,
+        help=f'If the --OUTPUT path ends with .gz or .bgz, the fixed file is compressed as BGZF (as with bgzip) with this compression level, from 0 to 9. Default: {BGZF_DEFAULT_LEVEL}')
+    FIX_PARSER.add_argument('--pipeline', dest='PIPELINE', action='store_true',
+        help='If set, the files are read and decompressed ahead, and the fixed files are written, by separate threads while rows are being fixed. The output is the same', required=False)
+    FIX_PARSER.add_argument('--resume', dest='RESUME', action='store_true',
+        help='If set, and a previous run of fix with the same input and arguments was interrupted, the steps it has finished are skipped, and the loop it was in continues from its last checkpoint (saved every few minutes) instead of starting over', required=False)
 
 
     DIAGNOSE_PARSER.add_argument('--INPUT', dest='INPUT_GWAS_FILE', type=file_path_type, required=True,
         help='Path to GWAS summary stats in tab-separated format (.tsv, .tsv.gz), with a config file at the same path with .json suffix. If the config file is absent, internal "STANDARD_COLUMN_ORDER" is assumed.')
     DIAGNOSE_PARSER.add_argument('--REPORT-DIR', dest='REPORT_DIR', type=maybe_dir_type, required=False, default='None',
         help='A directory where the report should be saved. If not specified, doesn\'t save the full report and pops up matplotlib plots instead')
+    DIAGNOSE_PARSER.add_argument('--processes', dest='PROCESSES', type=int, required=False, default=1,
+        help='Number of processes to validate entries with. Default: 1')
+    DIAGNOSE_PARSER.add_argument('--no-plots', dest='PLOTS', action='store_false',
+        help='If set, doesn\'t plot anything, and only saves the textual report (invalid_entries.csv and summary.json) to the REPORT_DIR'
+        , required=False)
+    DIAGNOSE_PARSER.add_argument('--sample', dest='SAMPLE', type=int, required=False, default=None,
+        help='If set, only checks a uniform random sample of this many entries, and estimates the proportions of issues with 95%% confidence intervals. '
+        'The estimates are saved to the REPORT_DIR as sample_summary.json. No plots are made in this mode')
+    DIAGNOSE_PARSER.add_argument('--seed', dest='SEED', type=int, required=False, default=None,
+        help='Seed for the random sample, to make --sample reproducible')
+    DIAGNOSE_PARSER.add_argument('--cache-dir', dest='CACHE_DIR', type=pathlib.Path, required=False, default=None,
+        help='A directory to cache validated entries in. Diagnosing the same unchanged file again loads entries from the cache and only redoes the report')
 
 
     SORT_PARSER.add_argument('--INPUT', dest='INPUT_GWAS_FILE', type=file_path_type, required=True,
@@ -678,6 +871,22 @@ def main():
         help='Output path. This name will be used as a base for output file(s)')
     SORT_PARSER.add_argument('--by', dest='SORT_BY', choices=['rsID', 'ChrBP'], required=False, default='ChrBP',
         help='How to sort. Default: by Chr and BP')
+    SORT_PARSER.add_argument('--compress-level', dest='COMPRESS_LEVEL', type=int, choices=range(10), required=False, default=BGZF_DEFAULT_LEVEL,
+        help=f'If the --OUTPUT path ends with .gz or .bgz, the sorted file is compressed as BGZF (as with bgzip) with this compression level, from 0 to 9. Default: {BGZF_DEFAULT_LEVEL}')
+
+
+    LIFTOVER_PARSER.add_argument('--INPUT', dest='INPUT_GWAS_FILE', type=file_path_type, required=True,
+        help='Path to GWAS summary stats in tab-separated format (.tsv, .tsv.gz, .tsv.zip), with a config file at the same path with .json suffix. If the config file is absent, internal "STANDARD_COLUMN_ORDER" is assumed.')
+    LIFTOVER_PARSER.add_argument('--OUTPUT', dest='OUTPUT_FILE', type=pathlib.Path, required=True,
+        help='Output path for the lifted file')
+    LIFTOVER_PARSER.add_argument('--chain-file', dest='CHAIN_FILE', type=file_path_type, required=True,
+        help='Path to the chain file for liftover from the build of the GWAS SS file to another build (in either direction)')
+    LIFTOVER_PARSER.add_argument('--unmapped', dest='UNMAPPED_FILE', type=pathlib.Path, required=False, default=None,
+        help='Output path for the rows with invalid Chr or BP, or that can\'t be lifted over. These rows are kept as they are. Default: OUTPUT with ".unmapped.tsv" suffix')
+    LIFTOVER_PARSER.add_argument('--sort', dest='SORT', action='store_true',
+        help='If set, sorts the lifted file by Chr and BP', required=False)
+    LIFTOVER_PARSER.add_argument('--build', dest='BUILD', type=str, required=False, default=None,
+        help='The build the chain file lifts over to (e.g. "hg19" or "hg38"). If set, a config file for the lifted file is written at the same path with .json suffix, so that it can be passed to the fix command')
 
 
     PREPARE_DBSNPS_PARSER.add_argument('--dbsnp', dest='DBSNP', type=file_path_type, required=True,
@@ -690,6 +899,10 @@ def main():
         help='Path to bcftools executable. Get from: http://samtools.github.io/bcftools/ (recommended version - 1.11)')
     PREPARE_DBSNPS_PARSER.add_argument('--buffer', dest='BUFFER', type=str, required=False, default="1G",
         help='Buffer size for sorting (size of presort), supports k/M/G suffix. Default: 1G. Recommended: at least 200M, ideally 4G or more')
+    PREPARE_DBSNPS_PARSER.add_argument('--binary', dest='BINARY', action='store_true',
+        help='If set, also writes the two DBs in a binary format, in which SNPs are looked up without parsing the DBs')
+    PREPARE_DBSNPS_PARSER.add_argument('--freq-dbs', dest='FREQ_DATABASE_SLUGS', type=str, nargs='+', required=False, default=None,
+        help='Frequency databases to keep allele frequencies from (e.g. GnomAD dbGaP_PopFreq). If set, frequencies are pre-parsed at this step, and frequencies from other databases are dropped. Default: all are kept')
 
 
     args = p.parse_args()
@@ -721,18 +934,22 @@ def main():
 
         fix(args.INPUT_GWAS_FILE, args.OUTPUT_FILE,
             args.dbSNP1_FILE, args.dbSNP2_FILE, args.CHAIN_FILE, args.FREQ_DATABASE_SLUG,
-            chosen_resolvers, args.VERBOSE)
+            chosen_resolvers, args.VERBOSE, args.PROCESSES, args.CACHE_DIR, args.ENGINE, args.JOIN, args.PIPELINE, args.COMPRESS_LEVEL, args.RESUME)
 
     elif args.command == 'diagnose':
-        diagnose(args.INPUT_GWAS_FILE, args.REPORT_DIR)
+        diagnose(args.INPUT_GWAS_FILE, args.REPORT_DIR, args.PROCESSES, args.PLOTS, args.SAMPLE, args.SEED, args.CACHE_DIR)
 
     elif args.command == 'sort':
         sort(args.INPUT_GWAS_FILE, args.OUTPUT_FILE,
-             args.SORT_BY)
+             args.SORT_BY, args.COMPRESS_LEVEL)
+
+    elif args.command == 'liftover':
+        liftover(args.INPUT_GWAS_FILE, args.OUTPUT_FILE, args.CHAIN_FILE,
+                 args.UNMAPPED_FILE, args.SORT, args.BUILD)
 
     elif args.command == 'prepare_dbSNPs':
         prepare_dbSNPs(args.DBSNP, args.OUTPUT,
-                       args.GZ_SORT, args.BCFTOOLS, args.BUFFER)
+                       args.GZ_SORT, args.BCFTOOLS, args.BUFFER, args.BINARY, args.FREQ_DATABASE_SLUGS)
 
     else:
         p.print_help(sys.stderr)
@@ -0,0 +1,7 @@
+"""
+Benchmarks of SumStatsRehab on synthetic GWAS SS files, prepared dbSNPs, and chain files.
+
+Run from the root of the repository, e.g.:
+    python -m benchmark run --rows 1000000 --OUTPUT before.json
+    python -m benchmark compare before.json after.json
+"""
@@ -0,0 +1,183 @@
+# standard library
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from typing import Any, Dict, List
+
+# local
+from benchmark.generate import DEFAULT_ISSUE_RATES, generate_SNPs, generate_dbSNPs, generate_chain_file, generate_GWASSS
+from benchmark.measure import measure
+from benchmark.scenarios import PARALLEL_SCENARIOS, SCENARIOS, Workspace
+from lib.utils import run_cmd_rich
+
+
+
+def get_commit() -> str:
+    res = run_cmd_rich(['git', '-C', os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rev-parse', '--short', 'HEAD'])
+    return res.stdout if res.ec == 0 else 'unknown'
+
+
+def parse_issue_rates(values: List[str]) -> Dict[str, float]:
+    """Parses "COLUMN=RATE" pairs on top of the default issue rates"""
+    issue_rates = dict(DEFAULT_ISSUE_RATES)
+    for value in values or []:
+        col, rate = value.split('=')
+        issue_rates[col] = float(rate)
+    return issue_rates
+
+
+def result_label(scenario: str, PROCESSES: int) -> str:
+    return scenario if PROCESSES == 1 else f"{scenario} x{PROCESSES}"
+
+
+def run(args):
+    scenarios = args.scenarios or list(SCENARIOS.keys())
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise ValueError(f"unknown scenario: {name}. Available scenarios: {', '.join(SCENARIOS.keys())}")
+
+    WORKDIR = args.WORKDIR or tempfile.mkdtemp(prefix='SumStatsRehab-benchmark-')
+    ws = Workspace(WORKDIR, args.ROWS, parse_issue_rates(args.ISSUE_RATES), args.DBSNP_FACTOR, args.SEED)
+
+    results: List[Dict[str, Any]] = []
+    try:
+        for name in scenarios:
+            # scenarios that can't run in parallel run once, in one process
+            for PROCESSES in (args.PROCESSES if name in PARALLEL_SCENARIOS else [1]):
+                label = result_label(name, PROCESSES)
+                print(f'=== Scenario: {label} ===')
+                scenario = PARALLEL_SCENARIOS[name](PROCESSES) if name in PARALLEL_SCENARIOS else SCENARIOS[name]
+                func, func_args = scenario(ws)
+                for repeat_i in range(args.REPEAT):
+                    measured = measure(func, func_args)
+                    result = {
+                        "scenario": name,
+                        "processes": PROCESSES,
+                        "rows": ws.num_of_rows,
+                        "seconds": measured["seconds"],
+                        "rows_per_second": ws.num_of_rows / measured["seconds"],
+                        "peak_rss_mb": measured["peak_rss_mb"],
+                    }
+                    results.append(result)
+                    print(f"  {label}: {result['seconds']:.2f} s, {result['rows_per_second']:.0f} rows/s, peak RSS {result['peak_rss_mb']:.0f} MiB\n")
+    finally:
+        if not args.WORKDIR:
+            shutil.rmtree(WORKDIR)
+
+    benchmark = {
+        "commit": get_commit(),
+        "date": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "rows": args.ROWS,
+        "seed": args.SEED,
+        "issue_rates": ws.ISSUE_RATES,
+        "dbsnp_factor": args.DBSNP_FACTOR,
+        "results": results,
+    }
+    with open(args.OUTPUT, 'w') as f:
+        json.dump(benchmark, f, indent=2)
+    print(f"saved results to {args.OUTPUT}")
+
+
+def best_results(benchmark: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Takes the fastest of repeated runs of each scenario with each number of processes"""
+    best: Dict[str, Dict[str, float]] = {}
+    for result in benchmark["results"]:
+        # results saved before scenarios could run in parallel are all in one process
+        label = result_label(result["scenario"], result.get("processes", 1))
+        if label not in best or result["seconds"] < best[label]["seconds"]:
+            best[label] = result
+    return best
+
+
+def compare(args):
+    base = json.load(open(args.BASE))
+    new = json.load(open(args.NEW))
+    if base["rows"] != new["rows"]:
+        print(f"WARNING: benchmarks were run with different number of rows: {base['rows']} and {new['rows']}")
+
+    base_results = best_results(base)
+    new_results = best_results(new)
+    print(f"{'rows/s':<30}{base['commit']:>12}{new['commit']:>12}  {'speedup':<8}{'peak RSS (MiB)':>24}")
+    for name, new_result in new_results.items():
+        if name not in base_results:
+            continue
+        base_result = base_results[name]
+        speedup = new_result["rows_per_second"] / base_result["rows_per_second"]
+        print(f"{name:<30}{base_result['rows_per_second']:>12.0f}{new_result['rows_per_second']:>12.0f}  x{speedup:<7.2f}"
+              f"{base_result['peak_rss_mb']:>12.0f}{new_result['peak_rss_mb']:>12.0f}")
+
+
+def generate(args):
+    OUTPUT_DIR = args.OUTPUT_DIR
+    if not os.path.isdir(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+    SNPs = generate_SNPs(args.ROWS * args.DBSNP_FACTOR, args.SEED)
+    generate_dbSNPs(SNPs, os.path.join(OUTPUT_DIR, 'dbSNP'))
+    generate_chain_file(os.path.join(OUTPUT_DIR, 'hg19ToHg38.over.chain'))
+    generate_GWASSS(SNPs, os.path.join(OUTPUT_DIR, 'gwas.tsv'), args.ROWS, parse_issue_rates(args.ISSUE_RATES), args.SORTED_BY, args.BUILD, args.SEED)
+    print(f"generated gwas.tsv, dbSNP.1.tsv.gz (with its index), dbSNP.2.tsv.gz, and hg19ToHg38.over.chain in {OUTPUT_DIR}")
+
+
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmarks of SumStatsRehab on synthetic data')
+    p.prog = 'python -m benchmark'
+    subparser = p.add_subparsers(dest='command')
+    RUN_PARSER = subparser.add_parser('run', help="runs benchmark scenarios and saves the results to a JSON file")
+    COMPARE_PARSER = subparser.add_parser('compare', help="compares results of two benchmark runs, e.g. on different commits")
+    GENERATE_PARSER = subparser.add_parser('generate', help="only generates a synthetic GWAS SS file, prepared dbSNPs, and a chain file")
+
+    for parser in (RUN_PARSER, GENERATE_PARSER):
+        parser.add_argument('--rows', dest='ROWS', type=int, required=False, default=1000000,
+            help='Number of rows in the GWAS SS file. Default: 1000000')
+        parser.add_argument('--issue-rate', dest='ISSUE_RATES', nargs='+', required=False,
+            help=f'Proportions of invalid fields in columns, as COLUMN=RATE pairs (e.g. rsID=0.1 format=0.01). Default: {DEFAULT_ISSUE_RATES["rsID"]} for each column, and 0 for "format"')
+        parser.add_argument('--dbsnp-factor', dest='DBSNP_FACTOR', type=int, required=False, default=3,
+            help='How many times there are more SNPs in the prepared dbSNPs than in the GWAS SS file. Default: 3')
+        parser.add_argument('--seed', dest='SEED', type=int, required=False, default=0,
+            help='Seed for the generated data. Default: 0')
+
+    RUN_PARSER.add_argument('--scenarios', nargs='+', required=False,
+        help=f'Scenarios to run. Default: all ({", ".join(SCENARIOS.keys())})')
+    RUN_PARSER.add_argument('--processes', dest='PROCESSES', type=int, nargs='+', required=False, default=[1],
+        help=f'Numbers of processes to run each of the parallel scenarios with ({", ".join(PARALLEL_SCENARIOS.keys())}), e.g. 1 2 4 8. Default: 1')
+    RUN_PARSER.add_argument('--repeat', dest='REPEAT', type=int, required=False, default=1,
+        help='Number of runs of each scenario. Default: 1')
+    RUN_PARSER.add_argument('--workdir', dest='WORKDIR', type=str, required=False, default=None,
+        help='A directory for the generated and output files. If not set, a temporary directory is used and removed afterwards')
+    RUN_PARSER.add_argument('--OUTPUT', dest='OUTPUT', type=str, required=False, default='benchmark.json',
+        help='Path to the JSON file with results. Default: benchmark.json')
+
+    COMPARE_PARSER.add_argument('BASE', type=str, help='JSON file with results of the base run')
+    COMPARE_PARSER.add_argument('NEW', type=str, help='JSON file with results of the new run')
+
+    GENERATE_PARSER.add_argument('--OUTPUT-DIR', dest='OUTPUT_DIR', type=str, required=True,
+        help='A directory for the generated files')
+    GENERATE_PARSER.add_argument('--sorted-by', dest='SORTED_BY', choices=['ChrBP', 'rsID'], required=False, default=None,
+        help='Order of rows in the GWAS SS file. Default: random')
+    GENERATE_PARSER.add_argument('--build', dest='BUILD', choices=['hg38', 'hg19'], required=False, default='hg38',
+        help='Build of the GWAS SS file. hg19 positions can be lifted over with the generated chain file. Default: hg38')
+
+    args = p.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args)
+    elif args.command == 'generate':
+        generate(args)
+    else:
+        p.print_help(sys.stderr)
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# standard library
+import json
+import gzip
+from math import erfc, sqrt
+from typing import Dict, List, Literal, Union
+
+# third-party libraries
+import numpy as np
+
+# local
+from lib.dbSNP_utils import write_dbSNP1, write_dbSNP2_sorting, parse_rsID
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    CONSTANTS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+# chromosomes with their lengths in GRCh38
+CHROMOSOMES = [
+    ('1', 248956422), ('2', 242193529), ('3', 198295559), ('4', 190214555), ('5', 181538259),
+    ('6', 170805979), ('7', 159345973), ('8', 145138636), ('9', 138394717), ('10', 133797422),
+    ('11', 135086622), ('12', 133275309), ('13', 114364328), ('14', 107043718), ('15', 101991189),
+    ('16', 90338345), ('17', 83257441), ('18', 80373285), ('19', 58617616), ('20', 64444167),
+    ('21', 46709983), ('22', 50818468), ('X', 156040895),
+]
+
+# the synthetic build 37 differs from build 38 by a shift of positions in each chromosome,
+# and a gap in the middle of each chromosome that can't be lifted over
+CHAIN_SHIFT = 10000
+CHAIN_GAP = 100000
+
+# the order of chromosomes in the prepared dbSNPs and in GWAS SS files sorted by Chr and BP
+CHR_ORDER = {chr: (25 if chr == 'X' else int(chr)) for chr, _ in CHROMOSOMES}
+
+# number of lines of the prepared dbSNP1 formatted at once
+DB1_LINES_PER_CHUNK = 100000
+
+NUCLEOTIDES = np.array(['A', 'C', 'G', 'T'])
+
+# the order of columns in generated GWAS SS files, as in the sample file
+GWASSS_COLUMNS = ["rsID", "Chr", "BP", "EA", "OA", "EAF", "beta", "SE", "pval", "N", "INFO"]
+GWASSS_HEADER = ["rsID", "CHR", "POS", "EA", "NEA", "EAF", "beta", "SE", "pval", "N", "INFO"]
+
+# values that make a field invalid, one of them is picked at random for each invalid field
+INVALID_VALUES: Dict[str, List[str]] = {
+    "rsID": ['.', '', 'NA', '1:12345_A_G'],
+    "Chr":  ['.', '', 'NA'],
+    "BP":   ['.', '', 'NA'],
+    "EA":   ['.', '', 'N'],
+    "OA":   ['.', '', 'N'],
+    "EAF":  ['.', '', 'NA', '1.5'],
+    "beta": ['.', '', 'NA'],
+    "SE":   ['.', '', 'NA', 'nan'],
+    "pval": ['.', '', 'NA', '2'],
+}
+
+# proportions of invalid fields in each column by default
+DEFAULT_ISSUE_RATES: Dict[str, float] = {col: 0.05 for col in INVALID_VALUES}
+
+
+SNPs = Dict[str, np.ndarray]
+Build = Literal['hg38', 'hg19']
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    FUNCTIONS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def chain_gap_start(length: int) -> int:
+    return length // 2
+
+
+def lift_positions(chr_length: int, chr_i: int, positions: np.ndarray) -> np.ndarray:
+    """
+    Converts positions in a chromosome from the synthetic build 37 to build 38 the same way the generated chain file does,
+    with -1 for positions that can't be lifted over
+    """
+    shift = CHAIN_SHIFT * (chr_i + 1)
+    gap_start = chain_gap_start(chr_length)
+    lifted = np.where(positions < gap_start, positions + shift, positions + shift - CHAIN_GAP)
+    lifted[(positions >= gap_start) & (positions < gap_start + CHAIN_GAP)] = -1
+    return lifted
+
+
+def generate_chain_file(path: str):
+    """
+    Writes the chain file for liftover from the synthetic build 37 to build 38 (see `lift_positions`)
+    """
+    with open(path, 'w') as f:
+        for chr_i, (chr, length) in enumerate(CHROMOSOMES):
+            shift = CHAIN_SHIFT * (chr_i + 1)
+            gap_start = chain_gap_start(length)
+            f.write(f"chain 1000 chr{chr} {length} + 0 {length} chr{chr} {length + shift} + {shift} {length + shift - CHAIN_GAP} {chr_i + 1}\n")
+            f.write(f"{gap_start}\t{CHAIN_GAP}\t0\n")
+            f.write(f"{length - gap_start - CHAIN_GAP}\n\n")
+
+
+def generate_SNPs(num_of_SNPs: int, seed: int = 0) -> SNPs:
+    """
+    Generates SNPs spread over chromosomes proportionally to their lengths.
+
+    Returns
+    -------
+    SNPs : Dict[str, np.ndarray]
+        arrays with a value for each SNP:
+        "Chr", "BP19" and "BP38" (-1 if it can't be lifted over), "rsID" (number), "REF", "ALT", "AF" (frequency of ALT), "freq" (field of the dbSNP)
+    """
+    rng = np.random.default_rng(seed)
+
+    lengths = np.array([length for _, length in CHROMOSOMES])
+    per_chr = rng.multinomial(num_of_SNPs, lengths / lengths.sum())
+
+    chrs: List[np.ndarray] = []
+    positions19: List[np.ndarray] = []
+    positions38: List[np.ndarray] = []
+    for chr_i, ((chr, length), n) in enumerate(zip(CHROMOSOMES, per_chr)):
+        positions = np.unique(rng.integers(1, length, size=n + n//10 + 10))
+        positions = rng.permutation(positions)[:n]
+        chrs.append(np.full(len(positions), chr, dtype=object))
+        positions19.append(positions)
+        positions38.append(lift_positions(length, chr_i, positions))
+
+    Chr = np.concatenate(chrs)
+    n = len(Chr)
+
+    rsIDs = rng.permutation(np.unique(rng.integers(1, 50 * n + 1000, size=n + n//10 + 10)))[:n]
+
+    REF_i = rng.integers(0, 4, size=n)
+    ALT_i = (REF_i + rng.integers(1, 4, size=n)) % 4
+    AF = np.round(rng.beta(0.5, 2, size=n), 4)
+
+    # some frequencies of the REF allele are missing, so they have to be inferred from the others
+    REF_AF_missing = rng.random(n) < 0.1
+    freq = np.array([
+        f"freq=1000Genomes:{1-af:.4g},{af:.4g}|GnomAD:{'.' if missing else f'{1-af:.4g}'},{af:.4g}"
+            for af, missing in zip(AF.tolist(), REF_AF_missing.tolist())
+    ], dtype=object)
+
+    return {
+        "Chr": Chr,
+        "BP19": np.concatenate(positions19),
+        "BP38": np.concatenate(positions38),
+        "rsID": rsIDs,
+        "REF": NUCLEOTIDES[REF_i],
+        "ALT": NUCLEOTIDES[ALT_i],
+        "AF": AF,
+        "freq": freq,
+    }
+
+
+def order_by_ChrBP(Chr: np.ndarray, BP: np.ndarray) -> np.ndarray:
+    return np.lexsort((BP, np.array([CHR_ORDER[c] for c in Chr.tolist()])))
+
+
+def order_by_rsID(rsIDs: List[str]) -> np.ndarray:
+    # rsIDs are compared by their numbers, the same way the files are sorted by rsID
+    return np.argsort(np.array([parse_rsID(rsID) for rsID in rsIDs], dtype=np.uint64), kind='stable')
+
+
+def generate_dbSNPs(SNPs: SNPs, OUTPUT_FILE: str):
+    """
+    Writes the two prepared dbSNP files in build 38 from the SNPs,
+    the same way `prepare_two_dbSNPs` does: `OUTPUT_FILE`.1.tsv.gz sorted by Chr and BP, and `OUTPUT_FILE`.2.tsv.gz sorted by rsID
+    """
+    liftable = SNPs["BP38"] >= 0
+    Chr = SNPs["Chr"][liftable]
+    BP = SNPs["BP38"][liftable]
+    rsIDs = [f"rs{rsid}" for rsid in SNPs["rsID"][liftable].tolist()]
+    REF = SNPs["REF"][liftable].tolist()
+    ALT = SNPs["ALT"][liftable].tolist()
+    freq = SNPs["freq"][liftable].tolist()
+    Chr_list = Chr.tolist()
+    BP_list = BP.tolist()
+
+    order = order_by_ChrBP(Chr, BP).tolist()
+    write_dbSNP1((
+        ''.join(
+            f"{Chr_list[i]}\t{BP_list[i]}\t{rsIDs[i]}\t{REF[i]}\t{ALT[i]}\t{freq[i]}\n"
+                for i in order[start:start+DB1_LINES_PER_CHUNK]
+        ).encode('utf-8')
+            for start in range(0, len(order), DB1_LINES_PER_CHUNK)
+    ), OUTPUT_FILE + ".1.tsv.gz")
+
+    with gzip.open(OUTPUT_FILE + ".2.tsv.gz", 'wt', compresslevel=1) as f:
+        f.writelines(
+            f"{rsIDs[i]}\t{Chr_list[i]}\t{BP_list[i]}\t{REF[i]}\t{ALT[i]}\t{freq[i]}\n"
+                for i in order_by_rsID(rsIDs).tolist()
+        )
+    write_dbSNP2_sorting(OUTPUT_FILE + ".2.tsv.gz")
+
+
+def generate_GWASSS(
+    SNPs: SNPs,
+    OUTPUT_FILE: str,
+    num_of_rows: int,
+    ISSUE_RATES: Dict[str, float] = DEFAULT_ISSUE_RATES,
+    SORTED_BY: Union[None, Literal['ChrBP', 'rsID']] = None,
+    BUILD: Build = 'hg38',
+    seed: int = 0,
+):
+    """
+    Writes a GWAS SS file with a random subset of the SNPs, and its .json config file.
+    Columns go in the same order as in the sample file, so the file has to be formatted with `prepare_GWASSS_columns`.
+
+    Parameters
+    ----------
+    ISSUE_RATES : Dict[str, float]
+        proportion of invalid fields in each column (see INVALID_VALUES), e.g. {"rsID": 0.05, "SE": 0.1}.
+        The "format" key sets the proportion of rows that miss columns.
+        Note that loop_fix stops at the first such row, so it's 0 by default
+
+    SORTED_BY : None | 'ChrBP' | 'rsID'
+        order of rows (before fields are made invalid), or None for the random order
+
+    BUILD : 'hg38' | 'hg19'
+        build of positions in the file. Build 37 is the synthetic one from `generate_chain_file`
+    """
+    rng = np.random.default_rng(seed)
+
+    rows = rng.choice(len(SNPs["Chr"]), size=min(num_of_rows, len(SNPs["Chr"])), replace=False)
+    n = len(rows)
+
+    Chr = SNPs["Chr"][rows]
+    BP = SNPs["BP19" if BUILD == 'hg19' else "BP38"][rows]
+    rsIDs = [f"rs{rsid}" for rsid in SNPs["rsID"][rows].tolist()]
+
+    if SORTED_BY == 'ChrBP':
+        order = order_by_ChrBP(Chr, BP)
+    elif SORTED_BY == 'rsID':
+        order = order_by_rsID(rsIDs)
+    else:
+        order = np.arange(n)
+    rows = rows[order]
+    Chr = Chr[order]
+    BP = BP[order]
+    rsIDs = [rsIDs[i] for i in order.tolist()]
+
+    # effect allele is either ALT or REF
+    swap = rng.random(n) < 0.5
+    REF = SNPs["REF"][rows]
+    ALT = SNPs["ALT"][rows]
+    AF = SNPs["AF"][rows]
+    EA = np.where(swap, REF, ALT)
+    OA = np.where(swap, ALT, REF)
+    EAF = np.where(swap, 1 - AF, AF)
+
+    SE = rng.uniform(0.01, 0.1, size=n)
+    beta = rng.normal(0, 0.05, size=n)
+    pval = [erfc(abs(b/se)/sqrt(2)) for b, se in zip(beta.tolist(), SE.tolist())]
+
+    columns: Dict[str, np.ndarray] = {
+        "rsID": np.array(rsIDs, dtype=object),
+        "Chr":  Chr.astype(object),
+        "BP":   np.array([str(bp) for bp in BP.tolist()], dtype=object),
+        "EA":   EA.astype(object),
+        "OA":   OA.astype(object),
+        "EAF":  np.array([f"{af:.4g}" for af in EAF.tolist()], dtype=object),
+        "beta": np.array([f"{b:.6g}" for b in beta.tolist()], dtype=object),
+        "SE":   np.array([f"{se:.6g}" for se in SE.tolist()], dtype=object),
+        "pval": np.array([f"{p:.6g}" for p in pval], dtype=object),
+        "N":    np.full(n, "50000", dtype=object),
+        "INFO": np.array([f"{info:.3g}" for info in rng.uniform(0.8, 1, size=n).tolist()], dtype=object),
+    }
+
+    for col, values in INVALID_VALUES.items():
+        invalid = np.flatnonzero(rng.random(n) < ISSUE_RATES.get(col, 0))
+        columns[col][invalid] = np.array(values, dtype=object)[rng.integers(0, len(values), size=len(invalid))]
+
+    lines = ["\t".join(row) for row in zip(*(columns[col].tolist() for col in GWASSS_COLUMNS))]
+    for i in np.flatnonzero(rng.random(n) < ISSUE_RATES.get("format", 0)).tolist():
+        lines[i] = "\t".join(lines[i].split("\t")[:4])
+
+    with open(OUTPUT_FILE, 'w') as f:
+        f.write("\t".join(GWASSS_HEADER) + "\n")
+        f.writelines(line + "\n" for line in lines)
+
+    config: Dict[str, Union[int, str]] = {col: i for i, col in enumerate(GWASSS_COLUMNS)}
+    config["build"] = 'GRCh37' if BUILD == 'hg19' else 'GRCh38'
+    with open(OUTPUT_FILE + '.json', 'w') as f:
+        json.dump(config, f, indent=4)
+
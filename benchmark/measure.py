@@ -0,0 +1,72 @@
+# standard library
+import time
+import resource
+import traceback
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Tuple
+
+
+
+def get_peak_rss_kb() -> int:
+    """
+    Peak RSS of this process in kilobytes.
+
+    VmHWM is used where available, because on Linux ru_maxrss is kept through exec,
+    so for a fresh process it would include the memory of the process it was forked from
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_and_measure(conn: Connection, func: Callable, args: Tuple[Any, ...]):
+    """
+    Runs the function in this (fresh) process and sends back its wall time and peak RSS,
+    or the traceback if it fails
+    """
+    try:
+        start_time = time.perf_counter()
+        func(*args)
+        seconds = time.perf_counter() - start_time
+    except BaseException:
+        conn.send({"error": traceback.format_exc()})
+        raise
+
+    # subprocesses (e.g. sort, or a pool of workers) are accounted separately, and the largest of them is taken
+    children_maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    conn.send({
+        "seconds": seconds,
+        "peak_rss_mb": max(get_peak_rss_kb(), children_maxrss) / 1024,
+    })
+
+
+def measure(func: Callable, args: Tuple[Any, ...]) -> Dict[str, float]:
+    """
+    Runs the function in a separate process, so that its peak RSS doesn't include memory used by anything else.
+
+    Returns
+    -------
+    Dict[str, float]
+        "seconds": wall time of the function call,
+        "peak_rss_mb": peak resident set size in MiB of the process, or of its largest subprocess
+    """
+    ctx = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=run_and_measure, args=(child_conn, func, args))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {"error": f"the process exited with code {process.exitcode}"}
+    process.join()
+
+    if "error" in result:
+        raise ChildProcessError(f"benchmarked function {func.__name__} failed:\n{result['error']}")
+    return result
@@ -0,0 +1,193 @@
+# standard library
+import os
+from functools import partial
+from typing import Any, Callable, Dict, List, Literal, Tuple, Union
+
+# local
+from benchmark.generate import (
+    DEFAULT_ISSUE_RATES, Build,
+    generate_SNPs, generate_dbSNPs, generate_chain_file, generate_GWASSS,
+)
+from lib.env import set_build
+from lib.loop_fix import loop_fix, resolvers_names
+from lib.prepare_GWASSS_columns import prepare_GWASSS_columns
+from lib.sort_GWASSS_by_ChrBP import sort_GWASSS_by_ChrBP
+from lib.sort_GWASSS_by_rsID import sort_GWASSS_by_rsID
+from lib.validate_GWASSS_entries import validate_GWASSS_entries
+from SumStatsRehab import fix
+
+
+FREQ_DATABASE_SLUG = 'GnomAD'
+
+
+
+class Workspace:
+    """
+    Generates the input files for scenarios in the directory on demand,
+    so that each file is generated only once and is shared between scenarios
+    """
+
+    def __init__(self, DIR: str, num_of_rows: int, ISSUE_RATES: Dict[str, float] = DEFAULT_ISSUE_RATES, DBSNP_FACTOR: int = 3, seed: int = 0):
+        self.DIR = DIR
+        self.num_of_rows = num_of_rows
+        self.ISSUE_RATES = ISSUE_RATES
+        self.DBSNP_FACTOR = DBSNP_FACTOR
+        self.seed = seed
+        self.files: Dict[Any, str] = {}
+        self.SNPs = None
+        if not os.path.isdir(DIR):
+            os.makedirs(DIR)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.DIR, name)
+
+    def once(self, key: Any, make: Callable[[], str]) -> str:
+        if key not in self.files:
+            self.files[key] = make()
+        return self.files[key]
+
+    def get_SNPs(self):
+        if self.SNPs is None:
+            self.SNPs = generate_SNPs(self.num_of_rows * self.DBSNP_FACTOR, self.seed)
+        return self.SNPs
+
+    def dbSNPs(self) -> Tuple[str, str]:
+        def make():
+            generate_dbSNPs(self.get_SNPs(), self.path('dbSNP'))
+            return self.path('dbSNP')
+        base = self.once('dbSNPs', make)
+        return base + '.1.tsv.gz', base + '.2.tsv.gz'
+
+    def chain_file(self) -> str:
+        def make():
+            generate_chain_file(self.path('hg19ToHg38.over.chain'))
+            return self.path('hg19ToHg38.over.chain')
+        return self.once('chain', make)
+
+    def gwas(self, BUILD: Build = 'hg38') -> str:
+        """GWAS SS file in random order with a .json config file"""
+        def make():
+            path = self.path(f'gwas_{BUILD}.tsv')
+            generate_GWASSS(self.get_SNPs(), path, self.num_of_rows, self.ISSUE_RATES, None, BUILD, self.seed)
+            return path
+        return self.once(('gwas', BUILD), make)
+
+    def standard(self, BUILD: Build = 'hg38') -> str:
+        """GWAS SS file in random order formatted with `prepare_GWASSS_columns`"""
+        def make():
+            path = self.path(f'gwas_{BUILD}_formatted.tsv')
+            prepare_GWASSS_columns(self.gwas(BUILD), path)
+            return path
+        return self.once(('standard', BUILD), make)
+
+    def sorted(self, SORT_BY: Literal['ChrBP', 'rsID']) -> str:
+        def make():
+            path = self.path(f'gwas_hg38_formatted_sorted_by_{SORT_BY}.tsv')
+            (sort_GWASSS_by_ChrBP if SORT_BY == 'ChrBP' else sort_GWASSS_by_rsID)(self.standard(), path)
+            return path
+        return self.once(('sorted', SORT_BY), make)
+
+    def report(self, BUILD: Build = 'hg38') -> str:
+        """Report for the formatted file, made the same way as in `fix`"""
+        def make():
+            path = self.path(f'gwas_{BUILD}_formatted_report')
+            validate_GWASSS_entries(self.standard(BUILD), "standard", path, PLOTS=False, ISSUES_BITMASK=True)
+            return path
+        return self.once(('report', BUILD), make)
+
+
+
+##### functions run by scenarios #####
+
+def run_loop_fix(BUILD: Build, *args):
+    # liftover depends on the build set in the environment
+    set_build(BUILD)
+    return loop_fix(*args)
+
+
+def only_resolvers(*names: str) -> Dict[str, bool]:
+    return {name: name in names for name in resolvers_names}
+
+
+
+##### scenarios #####
+"""
+Each scenario prepares its input files in the workspace (this isn't measured),
+and returns the function to measure with its arguments
+"""
+
+Scenario = Callable[[Workspace], Tuple[Callable, Tuple[Any, ...]]]
+
+
+def prepare_columns_scenario(ws: Workspace):
+    return prepare_GWASSS_columns, (ws.gwas(), ws.path('out_prepared.tsv'))
+
+def validate_scenario(PROCESSES: int = 1) -> Scenario:
+    def scenario(ws: Workspace):
+        return partial(validate_GWASSS_entries, PROCESSES=PROCESSES, PLOTS=False), (ws.standard(), "standard", ws.path('out_report'))
+    return scenario
+
+def sort_ChrBP_scenario(ws: Workspace):
+    return sort_GWASSS_by_ChrBP, (ws.standard(), ws.path('out_sorted_by_ChrBP.tsv'))
+
+def sort_rsID_scenario(ws: Workspace):
+    return sort_GWASSS_by_rsID, (ws.standard(), ws.path('out_sorted_by_rsID.tsv'))
+
+
+def loop_fix_scenario(
+    GWAS_SORTING: Union[None, Literal['ChrBP', 'rsID']],
+    RESOLVERS: List[str],
+    BUILD: Build = 'hg38',
+    JOIN: Literal['merge', 'hash'] = 'merge',
+    PROCESSES: int = 1,
+) -> Scenario:
+    def scenario(ws: Workspace):
+        # the hash join doesn't need the file to be sorted
+        GWAS_FILE = ws.sorted(GWAS_SORTING) if GWAS_SORTING and JOIN == 'merge' else ws.standard(BUILD)
+        dbSNP1_FILE, dbSNP2_FILE = ws.dbSNPs()
+        return run_loop_fix, (
+            BUILD,
+            GWAS_FILE,
+            ws.report(BUILD),
+            ws.path('out_loop_fix.tsv'),
+            dbSNP1_FILE,
+            dbSNP2_FILE,
+            ws.chain_file() if BUILD != 'hg38' else None,
+            FREQ_DATABASE_SLUG,
+            GWAS_SORTING,
+            only_resolvers(*RESOLVERS),
+            'rows',
+            JOIN,
+            PROCESSES,
+        )
+    return scenario
+
+
+def fix_scenario(ws: Workspace):
+    dbSNP1_FILE, dbSNP2_FILE = ws.dbSNPs()
+    return fix, (ws.gwas('hg19'), ws.path('out_fixed.tsv'), dbSNP1_FILE, dbSNP2_FILE, ws.chain_file(), FREQ_DATABASE_SLUG)
+
+
+# scenarios that run in a number of processes
+PARALLEL_SCENARIOS: Dict[str, Callable[[int], Scenario]] = {
+    'validate_GWASSS_entries': validate_scenario,
+    # only a file sorted by Chr and BP is fixed by parts in parallel (see `loop_fix`), so the others run in one process anyway
+    'loop_fix_rsID': lambda PROCESSES: loop_fix_scenario('ChrBP', ["rsID", "OA", "EA", "EAF"], PROCESSES=PROCESSES),
+    'loop_fix_ChrBP': lambda PROCESSES: loop_fix_scenario('rsID', ["ChrBP", "OA", "EA", "EAF"], PROCESSES=PROCESSES),
+}
+
+SCENARIOS: Dict[str, Scenario] = {
+    'prepare_GWASSS_columns': prepare_columns_scenario,
+    'validate_GWASSS_entries': validate_scenario(),
+    'sort_GWASSS_by_ChrBP': sort_ChrBP_scenario,
+    'sort_GWASSS_by_rsID': sort_rsID_scenario,
+    'loop_fix_rsID': loop_fix_scenario('ChrBP', ["rsID", "OA", "EA", "EAF"]),
+    'loop_fix_ChrBP': loop_fix_scenario('rsID', ["ChrBP", "OA", "EA", "EAF"]),
+    'loop_fix_rsID_hash': loop_fix_scenario('ChrBP', ["rsID", "OA", "EA", "EAF"], JOIN='hash'),
+    'loop_fix_ChrBP_hash': loop_fix_scenario('rsID', ["ChrBP", "OA", "EA", "EAF"], JOIN='hash'),
+    'loop_fix_SE': loop_fix_scenario(None, ["SE"]),
+    'loop_fix_beta': loop_fix_scenario(None, ["beta"]),
+    'loop_fix_pval': loop_fix_scenario(None, ["pval"]),
+    'loop_fix_liftover': loop_fix_scenario(None, [], 'hg19'),
+    'fix': fix_scenario,
+}
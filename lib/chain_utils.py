@@ -0,0 +1,303 @@
+# standard library
+import sys
+import os
+import json
+import gzip
+import heapq
+from bisect import bisect_right
+from typing import Dict, List, Tuple, Union
+
+# third-party libraries
+import numpy as np
+
+# local
+from lib.file import get_file_stat
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    CONSTANTS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+# the index of a chain file is saved next to it, with this suffix added to the file name
+CHAIN_INDEX_SUFFIX = '.idx.npz'
+
+# arrays of the index, concatenated for all source chromosomes
+CHAIN_INDEX_ARRAYS = ('starts', 'ends', 'q_bases', 'signs', 'q_contigs')
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+# parameters of the interval tree of the `liftover` package, which define the order of matches for overlapping blocks
+INTERVAL_TREE_MAX_DEPTH = 16
+INTERVAL_TREE_MIN_BUCKET = 64
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    FUNCTIONS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def open_chain_file(CHAIN_FILE: str):
+    with open(CHAIN_FILE, 'rb') as FILE_o:
+        is_gzip = FILE_o.read(2) == b'\x1f\x8b'
+    return gzip.open(CHAIN_FILE, 'rt') if is_gzip else open(CHAIN_FILE, 'r')
+
+
+class ChainIndex:
+    """
+    Aligned blocks of a chain file as sorted NumPy arrays for each source chromosome:
+    start and end of the block in the source build, and how a position in it maps to the target build,
+    `q_base + sign * (pos - start)` on the target chromosome `q_contig`.
+
+    Positions are lifted over the same way the `liftover` package does (with 0-based coordinates),
+    taking the first of its matches where blocks of several chains overlap in the source build.
+    Overlapping blocks are cut into pieces, so that blocks in the index don't overlap
+    """
+    def __init__(self, contigs: List[str], query_contigs: List[str], contig_starts: np.ndarray, arrays: Dict[str, np.ndarray]):
+        self.contigs = contigs
+        self.query_contigs = query_contigs
+        self.contig_starts = contig_starts
+        self.arrays = arrays
+
+        # source chromosomes by their names, as well as by their names with 'chr' prefix added or removed
+        self.lookup: Dict[str, int] = {contig: i for i, contig in enumerate(contigs)}
+        for i, contig in enumerate(contigs):
+            self.lookup.setdefault(contig[3:] if contig.startswith('chr') else f'chr{contig}', i)
+
+        # starts of blocks for lifting over one position at a time with `bisect`, which is faster than numpy for that
+        self.starts_lists: Dict[int, List[int]] = {}
+
+    def get_blocks(self, contig_i: int) -> Dict[str, np.ndarray]:
+        start, end = self.contig_starts[contig_i], self.contig_starts[contig_i+1]
+        return {name: array[start:end] for name, array in self.arrays.items()}
+
+    def lift_over_one(self, chr: str, bp: int) -> Union[Tuple[str, int], None]:
+        """Lifts over the position. Returns the target chromosome and position, or None if it can't be lifted over"""
+        contig_i = self.lookup.get(chr)
+        if contig_i is None or not INT64_MIN <= bp <= INT64_MAX:
+            return None
+        if contig_i not in self.starts_lists:
+            self.starts_lists[contig_i] = self.get_blocks(contig_i)['starts'].tolist()
+        i = bisect_right(self.starts_lists[contig_i], bp) - 1
+        if i < 0:
+            return None
+        i += int(self.contig_starts[contig_i])
+        if bp >= self.arrays['ends'][i]:
+            return None
+        return (
+            self.query_contigs[self.arrays['q_contigs'][i]],
+            int(self.arrays['q_bases'][i]) + int(self.arrays['signs'][i]) * (bp - int(self.arrays['starts'][i])),
+        )
+
+    def lift_over(self, chrs: List[str], bps: List[int]) -> Tuple[List[Union[str, None]], np.ndarray]:
+        """
+        Lifts over positions at once. Returns target chromosomes (None for positions that can't be lifted over),
+        and target positions
+        """
+        new_chrs: List[Union[str, None]] = [None] * len(chrs)
+        new_bps = np.zeros(len(chrs), dtype=np.int64)
+        # positions out of int64 range can't be lifted over, as with the `liftover` package
+        bps_arr = np.fromiter((bp if INT64_MIN <= bp <= INT64_MAX else -1 for bp in bps), dtype=np.int64, count=len(bps))
+
+        rows_by_contig: Dict[int, List[int]] = {}
+        for row_i, chr in enumerate(chrs):
+            contig_i = self.lookup.get(chr)
+            if contig_i is not None:
+                rows_by_contig.setdefault(contig_i, []).append(row_i)
+
+        for contig_i, rows in rows_by_contig.items():
+            blocks = self.get_blocks(contig_i)
+            rows_arr = np.array(rows)
+            pos = bps_arr[rows_arr]
+            i = np.searchsorted(blocks['starts'], pos, 'right') - 1
+            i_clipped = np.maximum(i, 0)
+            found = (i >= 0) & (pos < blocks['ends'][i_clipped])
+            new_bps[rows_arr] = blocks['q_bases'][i_clipped] + blocks['signs'][i_clipped] * (pos - blocks['starts'][i_clipped])
+            q_contigs = blocks['q_contigs'][i_clipped]
+            for row_i, q_contig, is_found in zip(rows, q_contigs.tolist(), found.tolist()):
+                if is_found:
+                    new_chrs[row_i] = self.query_contigs[q_contig]
+        return new_chrs, new_bps
+
+
+def parse_chain_file(CHAIN_FILE: str) -> ChainIndex:
+    """
+    Reads aligned blocks from the chain file (see https://genome.ucsc.edu/goldenPath/help/chain.html) into the ChainIndex
+    """
+    # blocks of each source chromosome: (start, end, q_base, sign, q_contig)
+    blocks_by_contig: Dict[str, List[Tuple[int, int, int, int, int]]] = {}
+    query_contigs: List[str] = []
+    query_contig_ids: Dict[str, int] = {}
+
+    with open_chain_file(CHAIN_FILE) as FILE_o:
+        chain = None
+        for line in FILE_o:
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+
+            if words[0] == 'chain':
+                # chain score tName tSize tStrand tStart tEnd qName qSize qStrand qStart qEnd id
+                t_name, q_name, q_size, q_strand = words[2], words[7], int(words[8]), words[9]
+                if q_name not in query_contig_ids:
+                    query_contig_ids[q_name] = len(query_contigs)
+                    query_contigs.append(q_name)
+                chain = {
+                    "blocks": blocks_by_contig.setdefault(t_name, []),
+                    "t_pos": int(words[5]),
+                    "q_pos": int(words[10]),
+                    "q_size": q_size,
+                    "q_strand": q_strand,
+                    "q_contig": query_contig_ids[q_name],
+                    "t_end": int(words[6]),
+                    "q_end": int(words[11]),
+                }
+                continue
+
+            if chain is None:
+                raise ValueError(f"a block of the chain file {CHAIN_FILE} goes before its chain: {line.strip()}")
+
+            # size [dt dq]
+            size = int(words[0])
+            if chain["q_strand"] == '-':
+                # positions on the reverse strand are counted from the end of the target chromosome
+                q_base, sign = chain["q_size"] - 1 - chain["q_pos"], -1
+            else:
+                q_base, sign = chain["q_pos"], 1
+            # empty blocks don't map any position, but they are kept until the overlapping blocks are cut,
+            # as they take part in building the interval tree of the `liftover` package
+            chain["blocks"].append((chain["t_pos"], chain["t_pos"] + size, q_base, sign, chain["q_contig"]))
+            chain["t_pos"] += size
+            chain["q_pos"] += size
+
+            if len(words) >= 3:
+                chain["t_pos"] += int(words[1])
+                chain["q_pos"] += int(words[2])
+            else:
+                # the last block of the chain
+                if chain["t_pos"] != chain["t_end"] or chain["q_pos"] != chain["q_end"]:
+                    raise ValueError(f"a chain in the chain file {CHAIN_FILE} doesn't end where its header says")
+                chain = None
+
+    contigs = list(blocks_by_contig.keys())
+    contig_starts = [0]
+    columns: Dict[str, List[int]] = {name: [] for name in CHAIN_INDEX_ARRAYS}
+    for contig in contigs:
+        blocks = cut_overlapping_blocks(blocks_by_contig[contig])
+        for name, column in zip(CHAIN_INDEX_ARRAYS, zip(*blocks) if blocks else [()] * len(CHAIN_INDEX_ARRAYS)):
+            columns[name].extend(column)
+        contig_starts.append(contig_starts[-1] + len(blocks))
+
+    arrays = {name: np.array(columns[name], dtype=np.int64) for name in CHAIN_INDEX_ARRAYS}
+    arrays['signs'] = arrays['signs'].astype(np.int8)
+    arrays['q_contigs'] = arrays['q_contigs'].astype(np.int32)
+    return ChainIndex(contigs, query_contigs, np.array(contig_starts, dtype=np.int64), arrays)
+
+
+def get_interval_tree_levels(blocks: List[Tuple[int, int, int, int, int]]) -> List[int]:
+    """
+    For blocks sorted by their start, returns the level of the node each of them is stored in,
+    in the interval tree the `liftover` package builds for a source chromosome.
+    The package returns matches of a position in the order of visiting the tree from the root,
+    intervals of a node in the order of their start.
+    """
+    levels = [0] * len(blocks)
+    # (indices of the blocks in the node, level of the node)
+    nodes = [(list(range(len(blocks))), 0)]
+    while nodes:
+        node, level = nodes.pop()
+        if not node:
+            continue
+        # intervals of the tree include their end
+        center = (min(blocks[i][0] for i in node) + max(blocks[i][1] for i in node)) // 2
+        if level + 1 == INTERVAL_TREE_MAX_DEPTH or len(node) < INTERVAL_TREE_MIN_BUCKET:
+            for i in node:
+                levels[i] = level
+            continue
+        lefts, rights = [], []
+        for i in node:
+            if blocks[i][1] < center:
+                lefts.append(i)
+            elif blocks[i][0] > center:
+                rights.append(i)
+            else:
+                levels[i] = level
+        nodes.append((lefts, level + 1))
+        nodes.append((rights, level + 1))
+    return levels
+
+
+def cut_overlapping_blocks(blocks: List[Tuple[int, int, int, int, int]]) -> List[Tuple[int, int, int, int, int]]:
+    """
+    Sorts blocks of a source chromosome by their start (keeping the order of the chain file for blocks with the same start).
+    Where blocks overlap, they are cut, so that each position is covered by the block
+    the `liftover` package would return first for it
+    (except for overlapping blocks with the same start, which the package takes in no particular order)
+    """
+    blocks = sorted(blocks, key=lambda block: block[0])
+    if all(blocks[i][0] >= blocks[i-1][1] for i in range(1, len(blocks))):
+        return [block for block in blocks if block[0] < block[1]]
+
+    levels = get_interval_tree_levels(blocks)
+    boundaries = sorted({block[0] for block in blocks} | {block[1] for block in blocks})
+    cut_blocks: List[Tuple[int, int, int, int, int]] = []
+    # blocks that cover the current position, by the order the `liftover` package returns them
+    covering: List[Tuple[int, int, int]] = []
+    block_i = 0
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        while block_i < len(blocks) and blocks[block_i][0] == start:
+            heapq.heappush(covering, (levels[block_i], block_i, blocks[block_i][1]))
+            block_i += 1
+        while covering and covering[0][2] <= start:
+            heapq.heappop(covering)
+        if not covering:
+            continue
+        block_start, _, q_base, sign, q_contig = blocks[covering[0][1]]
+        cut_blocks.append((start, end, q_base + sign * (start - block_start), sign, q_contig))
+    return cut_blocks
+
+
+def read_chain_index(CHAIN_FILE: str) -> ChainIndex:
+    """
+    Reads the index of the chain file saved next to it, or parses the chain file and saves the index
+    (unless it can't be written there), so that the chain file is parsed only once
+    """
+    INDEX_FILE = CHAIN_FILE + CHAIN_INDEX_SUFFIX
+    if os.path.isfile(INDEX_FILE):
+        with np.load(INDEX_FILE) as index:
+            if json.loads(str(index["source"])) == get_file_stat(CHAIN_FILE):
+                return ChainIndex(
+                    index["contigs"].tolist(),
+                    index["query_contigs"].tolist(),
+                    index["contig_starts"],
+                    {name: index[name] for name in CHAIN_INDEX_ARRAYS},
+                )
+
+    chain_index = parse_chain_file(CHAIN_FILE)
+    try:
+        # np.savez adds ".npz" to the name, unless it's already there
+        TMP_FILE = INDEX_FILE + '.tmp.npz'
+        np.savez(
+            TMP_FILE,
+            contigs=np.array(chain_index.contigs, dtype=str),
+            query_contigs=np.array(chain_index.query_contigs, dtype=str),
+            contig_starts=chain_index.contig_starts,
+            source=np.array(json.dumps(get_file_stat(CHAIN_FILE))),
+            **chain_index.arrays,
+        )
+        os.replace(TMP_FILE, INDEX_FILE)
+    except OSError:
+        print(f"The index of the chain file couldn't be saved at: {INDEX_FILE}")
+    return chain_index
+
+
+
+if __name__ == "__main__":
+    CHAIN_FILE = sys.argv[1]
+
+    read_chain_index(CHAIN_FILE)
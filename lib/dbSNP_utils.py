@@ -0,0 +1,553 @@
+# standard library
+import sys
+import os
+import json
+import gzip
+import shutil
+from bisect import bisect_left
+from contextlib import ExitStack
+from typing import Any, AnyStr, Dict, Iterable, Iterator, List, Literal, Tuple, Union
+
+# third-party libraries
+import numpy as np
+
+# local
+from lib.file import (
+    read_chunks_of_lines, is_bgzf, get_file_stat,
+    compress_bgzf_block, BGZF_MAX_BLOCK_DATA, BGZF_EOF,
+)
+from lib.math_utils import clip_float
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    CONSTANTS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+# the index of dbSNP1 is saved next to it, with this suffix added to the file name
+DB1_INDEX_SUFFIX = '.idx.npz'
+
+# size of chunks of lines the dbSNP1 is compressed by
+DB1_CHUNK_SIZE = 4 * 1024 * 1024
+
+# the order of chromosomes in the prepared dbSNP1, the same as CHR_ORDER in loop_fix.
+# SNPs on other chromosomes are never matched with the GWAS SS file, so they aren't indexed
+CHR_ORDER: Dict[str, int] = {
+    **{str(i): i for i in range(1, 24)},
+    **{f"0{i}": i for i in range(1, 10)},
+    'X': 25, 'x': 25,
+    'Y': 26, 'y': 26,
+    'M': 27, 'm': 27,
+}
+
+# the key of a locus in the index is chromosome's order in the high 32 bits and the base pair position in the low 32 bits
+MAX_BP = (1 << 32) - 1
+
+DB1Index = Tuple[List[int], List[int]]
+
+# the binary dbSNP is saved next to the dbSNP file, in the directory with this suffix added to the file name
+DB_BINARY_SUFFIX = '.bin'
+
+# columns of the binary dbSNP, each in its own file that can be memory-mapped:
+#  - chromosomes as codes in the list of chromosomes of the dbSNP,
+#  - rsIDs as numbers after "rs" (0 if the rsID isn't "rs" followed by a number),
+#  - alleles ("REF\tALT") and frequencies as bytes of all SNPs one after another, and the offsets of the end of each SNP's bytes
+DB_BINARY_COLUMNS: Dict[str, Any] = {
+    'chr': np.uint16,
+    'bp': np.uint32,
+    'rsid': np.uint64,
+    'alleles': np.uint8,
+    'alleles_ends': np.uint64,
+    'freq': np.uint8,
+    'freq_ends': np.uint64,
+}
+
+# number of SNPs gathered at once while sorting the binary dbSNP by rsID
+DB_BINARY_GATHER_SIZE = 1000000
+
+# if allele frequencies of dbSNP were pre-parsed (see `preparse_freqs`), the list of their frequency databases
+# is saved next to the dbSNP, with this suffix added to the file name
+DB_FREQ_SUFFIX = '.freq.json'
+
+# dbSNP2 sorted by the numbers of rsIDs (see `parse_rsID`) has a file next to it, with this suffix added to the file name.
+# Older versions sorted dbSNP2 by rsIDs as strings
+DB2_SORTING_SUFFIX = '.sorting.json'
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    FUNCTIONS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def get_locus_key(chr_order: int, bp: int) -> int:
+    return (chr_order << 32) | min(max(bp, 0), MAX_BP)
+
+
+def write_dbSNP1(chunks: Iterable[bytes], OUTPUT_FILE: str) -> bool:
+    """
+    Writes dbSNP1 as BGZF, and its index of loci (see `read_dbSNP1_index`) into `OUTPUT_FILE` + DB1_INDEX_SUFFIX.
+
+    Each BGZF block starts at the beginning of a line (unless a line doesn't fit into a block),
+    and the index has the locus of the first line of each block.
+    The index is only written if the SNPs are sorted by Chr and BP the same way loop_fix expects them to be
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        chunks of whole lines of dbSNP1 (Chr, BP, rsID, REF, ALT, freq)
+
+    OUTPUT_FILE : str
+        path for the dbSNP1
+
+    Returns
+    -------
+    bool
+        whether the index was written
+    """
+    keys: List[int] = []
+    offsets: List[int] = []
+    is_sorted = True
+
+    with open(OUTPUT_FILE, 'wb') as OUTPUT_FILE_o:
+        for chunk in chunks:
+            start = 0
+            while start < len(chunk):
+                end = start + BGZF_MAX_BLOCK_DATA
+                if end < len(chunk):
+                    line_end = chunk.rfind(b'\n', start, end) + 1
+                    if line_end > start:
+                        end = line_end
+                else:
+                    end = len(chunk)
+
+                if start == 0 or chunk[start-1] == ord('\n'):
+                    first_fields = chunk[start:end].split(b'\t', 2)
+                    chr_order = CHR_ORDER.get(first_fields[0].decode('utf-8', 'replace'))
+                    if chr_order is not None and len(first_fields) > 1 and first_fields[1].isdigit():
+                        key = get_locus_key(chr_order, int(first_fields[1]))
+                        if keys and key < keys[-1]:
+                            is_sorted = False
+                        keys.append(key)
+                        offsets.append(OUTPUT_FILE_o.tell() << 16)
+
+                OUTPUT_FILE_o.write(compress_bgzf_block(chunk[start:end]))
+                start = end
+        OUTPUT_FILE_o.write(BGZF_EOF)
+
+    INDEX_FILE = OUTPUT_FILE + DB1_INDEX_SUFFIX
+    if not is_sorted:
+        print("SNPs in dbSNP1 aren't sorted by Chr and BP, so it isn't indexed")
+        if os.path.isfile(INDEX_FILE):
+            os.remove(INDEX_FILE)
+        return False
+
+    np.savez(
+        INDEX_FILE,
+        keys=np.array(keys, dtype=np.int64),
+        offsets=np.array(offsets, dtype=np.int64),
+        source=np.array(json.dumps(get_file_stat(OUTPUT_FILE))),
+    )
+    return True
+
+
+def read_dbSNP1_index(DB1_FILE: str) -> Union[DB1Index, None]:
+    """
+    Reads the index of loci of the dbSNP1 made by `write_dbSNP1`:
+    sorted keys of loci (see `get_locus_key`) and virtual offsets of lines with these loci in the BGZF file.
+
+    Returns None if there's no index, or it was made for another version of the file
+    """
+    INDEX_FILE = DB1_FILE + DB1_INDEX_SUFFIX
+    if not os.path.isfile(DB1_FILE) or not os.path.isfile(INDEX_FILE) or not is_bgzf(DB1_FILE):
+        return None
+    with np.load(INDEX_FILE) as index:
+        if json.loads(str(index["source"])) != get_file_stat(DB1_FILE):
+            return None
+        return index["keys"].tolist(), index["offsets"].tolist()
+
+
+def find_in_dbSNP1_index(index: DB1Index, chr_order: int, bp: int) -> Union[int, None]:
+    """
+    Virtual offset of the last indexed line with the locus before the given one,
+    i.e. where to start reading dbSNP1 to find all SNPs at the locus. None if there's no such line
+    """
+    keys, offsets = index
+    i = bisect_left(keys, get_locus_key(chr_order, bp)) - 1
+    return offsets[i] if i >= 0 else None
+
+
+def parse_freq_field(freq_field: str, FREQ_DATABASE_SLUG: str) -> List[str]:
+    """
+    Allele frequencies (of REF, and then of each allele in ALT) from the given frequency database,
+    in the "freq" field of a SNP, e.g.:
+        "freq=1000Genomes:0.9988,.,0.001198|GnomAD:0.9943,0.005747,." -> ["0.9943", "0.005747", "0"] for "gnomad".
+
+    Missing frequencies are inferred from the frequencies of other alleles, the same way `resolve_EAF` in loop_fix does.
+    If they can't be inferred, they are "."
+
+    Raises ValueError if there's no such frequency database in the field
+    """
+    freqs = freq_field.replace('freq=','').replace('|',':').split(':')
+    freqs = [f.lower() for f in freqs]
+    the_freq_db_i = freqs.index(FREQ_DATABASE_SLUG)
+    if the_freq_db_i + 1 >= len(freqs):
+        raise ValueError(f"no allele frequencies for {FREQ_DATABASE_SLUG}")
+    SNP_freqs = freqs[the_freq_db_i+1].split(',')
+
+    allele_freqs = []
+    for allele_i in range(len(SNP_freqs)):
+        if SNP_freqs[allele_i] in ['.','-','']:
+            # try inferring from other values
+            try:
+                one_minus_all_other_freqs = 1
+                for i in range(len(SNP_freqs)):
+                    if i == allele_i:
+                        continue
+                    one_minus_all_other_freqs -= float(SNP_freqs[i])
+                allele_freqs.append(str( clip_float(one_minus_all_other_freqs,(0,1)) ))
+            except ValueError:
+                allele_freqs.append('.')
+        else:
+            allele_freqs.append(SNP_freqs[allele_i])
+    return allele_freqs
+
+
+def preparse_freqs(chunks: Iterable[bytes], FREQ_DATABASE_SLUGS: List[str]) -> Iterator[bytes]:
+    """
+    Replaces the "freq" field in chunks of lines of dbSNP1 with a column for each of the frequency databases,
+    which has allele frequencies from the database separated by comma (see `parse_freq_field`), or "." if there are none.
+
+    This way, the field isn't parsed on every run of loop_fix, and the frequency databases that aren't needed are dropped
+    """
+    slugs = [slug.lower() for slug in FREQ_DATABASE_SLUGS]
+    for chunk in chunks:
+        lines = []
+        for line in chunk.decode('utf-8').splitlines():
+            words = line.split('\t')
+            if len(words) < 6:
+                lines.append(line)
+                continue
+            columns = []
+            for slug in slugs:
+                try:
+                    columns.append(','.join(parse_freq_field(words[5], slug)))
+                except ValueError:
+                    columns.append('.')
+            lines.append('\t'.join(words[:5] + columns))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def write_dbSNP_freq_databases(DB_FILE: str, FREQ_DATABASE_SLUGS: List[str]):
+    """Saves the list of frequency databases, which columns the dbSNP has after `preparse_freqs`"""
+    with open(DB_FILE + DB_FREQ_SUFFIX, 'w') as FREQ_FILE_o:
+        json.dump({"freq_databases": [slug.lower() for slug in FREQ_DATABASE_SLUGS]}, FREQ_FILE_o)
+
+
+def read_dbSNP_freq_databases(DB_FILE: str) -> Union[List[str], None]:
+    """
+    Frequency databases which columns the dbSNP has (lowercase), or None if it has the original "freq" field
+    """
+    if not os.path.isfile(DB_FILE + DB_FREQ_SUFFIX):
+        return None
+    with open(DB_FILE + DB_FREQ_SUFFIX, 'r') as FREQ_FILE_o:
+        return json.load(FREQ_FILE_o)["freq_databases"]
+
+
+def parse_rsID(rsID: AnyStr) -> int:
+    """
+    The number of a rsID (bytes or str), or 0 if it isn't "rs" followed by a number (in ASCII digits, without leading zeros).
+    rsIDs are keyed and sorted by their numbers: in the binary dbSNPs, in dbSNP2, and in GWAS SS files sorted by rsID
+    """
+    digits = rsID[2:]
+    if rsID[:2] not in (b'rs', 'rs') or not digits.isascii() or not digits.isdigit() or digits[:1] in (b'0', '0'):
+        return 0
+    return int(digits)
+
+
+def write_dbSNP2_sorting(DB2_FILE: str):
+    """Marks the dbSNP2 as sorted by the numbers of rsIDs (see `parse_rsID`), for this very version of the file"""
+    with open(DB2_FILE + DB2_SORTING_SUFFIX, 'w') as SORTING_FILE_o:
+        json.dump({"sorted_by": "rsID number", "source": get_file_stat(DB2_FILE)}, SORTING_FILE_o)
+
+
+def is_dbSNP2_sorted_by_rsID_number(DB2_FILE: str) -> bool:
+    """Whether the dbSNP2 is sorted by the numbers of rsIDs (see `write_dbSNP2_sorting`), rather than by rsIDs as strings"""
+    if not os.path.isfile(DB2_FILE + DB2_SORTING_SUFFIX):
+        return False
+    with open(DB2_FILE + DB2_SORTING_SUFFIX, 'r') as SORTING_FILE_o:
+        return json.load(SORTING_FILE_o)["source"] == get_file_stat(DB2_FILE)
+
+
+def write_dbSNP1_binary(DB1_FILE: str) -> bool:
+    """
+    Writes the binary dbSNP1 (see `BinaryDBSNP`) into `DB1_FILE` + DB_BINARY_SUFFIX.
+
+    The binary dbSNP1 is only written if SNPs of each chromosome are all together and are sorted by BP,
+    as SNPs are looked up in it with binary search
+
+    Returns
+    -------
+    bool
+        whether the binary dbSNP1 was written
+    """
+    STORE_DIR = DB1_FILE + DB_BINARY_SUFFIX
+    TMP_DIR = STORE_DIR + '.tmp'
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+    os.makedirs(TMP_DIR)
+
+    chrs: List[str] = []
+    chr_codes: Dict[bytes, int] = {}
+    n = 0
+    alleles_size = 0
+    freq_size = 0
+    # the last SNP's chromosome and BP, to check that the SNPs are sorted
+    prev_key = -1
+    is_sorted = True
+
+    with ExitStack() as stack:
+        files = {col: stack.enter_context(open(os.path.join(TMP_DIR, col), 'wb')) for col in DB_BINARY_COLUMNS}
+        DB1_FILE_o = stack.enter_context(gzip.open(DB1_FILE, 'rb'))
+        for chunk in read_chunks_of_lines(DB1_FILE_o, DB1_CHUNK_SIZE): # type: ignore # GzipFile is a binary file object
+            rows = [words for words in (line.split() for line in chunk.splitlines()) if len(words) >= 6]
+            if not rows:
+                continue
+
+            for words in rows:
+                if words[0] not in chr_codes:
+                    chr_codes[words[0]] = len(chrs)
+                    chrs.append(words[0].decode('utf-8', 'replace'))
+            if len(chrs) > np.iinfo(DB_BINARY_COLUMNS['chr']).max + 1:
+                # too many chromosomes, which isn't a dbSNP1 prepared for loop_fix anyway
+                is_sorted = False
+                break
+            codes = np.array([chr_codes[words[0]] for words in rows], dtype=DB_BINARY_COLUMNS['chr'])
+            bps = np.array([int(words[1]) for words in rows], dtype=DB_BINARY_COLUMNS['bp'])
+            alleles = [words[3] + b'\t' + words[4] for words in rows]
+            # a dbSNP with pre-parsed allele frequencies has several columns of them (see `preparse_freqs`)
+            freqs = [b'\t'.join(words[5:]) for words in rows]
+
+            keys = (codes.astype(np.int64) << 32) | bps
+            if keys[0] < prev_key or (keys[1:] < keys[:-1]).any():
+                is_sorted = False
+                break
+            prev_key = keys[-1]
+
+            files['chr'].write(codes.tobytes())
+            files['bp'].write(bps.tobytes())
+            files['rsid'].write(np.array([parse_rsID(words[2]) for words in rows], dtype=DB_BINARY_COLUMNS['rsid']).tobytes())
+            files['alleles'].write(b''.join(alleles))
+            files['alleles_ends'].write((alleles_size + np.cumsum([len(a) for a in alleles], dtype=np.uint64)).tobytes())
+            files['freq'].write(b''.join(freqs))
+            files['freq_ends'].write((freq_size + np.cumsum([len(f) for f in freqs], dtype=np.uint64)).tobytes())
+            alleles_size += sum(len(a) for a in alleles)
+            freq_size += sum(len(f) for f in freqs)
+            n += len(rows)
+
+    if not is_sorted:
+        print("SNPs in dbSNP1 aren't sorted by Chr and BP, so the binary dbSNP1 isn't written")
+        shutil.rmtree(TMP_DIR)
+        return False
+
+    with open(os.path.join(TMP_DIR, 'meta.json'), 'w') as META_FILE_o:
+        json.dump({"n": n, "chrs": chrs, "sorted_by": "ChrBP", "source": get_file_stat(DB1_FILE)}, META_FILE_o)
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+    os.replace(TMP_DIR, STORE_DIR)
+    return True
+
+
+def write_dbSNP2_binary(DB1_FILE: str, DB2_FILE: str) -> bool:
+    """
+    Writes the binary dbSNP2 into `DB2_FILE` + DB_BINARY_SUFFIX, sorting SNPs of the binary dbSNP1 by rsID numerically.
+    SNPs with the same rsID keep their order in dbSNP1.
+
+    Sorting takes about 16 bytes of memory per SNP
+
+    Returns
+    -------
+    bool
+        whether the binary dbSNP2 was written, which requires the binary dbSNP1
+    """
+    DB1 = read_dbSNP_binary(DB1_FILE)
+    if DB1 is None:
+        return False
+
+    STORE_DIR = DB2_FILE + DB_BINARY_SUFFIX
+    TMP_DIR = STORE_DIR + '.tmp'
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+    os.makedirs(TMP_DIR)
+
+    def gather_bytes(blob: np.ndarray, ends: np.ndarray, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Bytes of the SNPs at `idx` one after another, and the lengths of each SNP's bytes"""
+        starts = np.where(idx > 0, ends[np.maximum(idx, 1) - 1], 0).astype(np.int64)
+        lengths = ends[idx].astype(np.int64) - starts
+        positions = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(lengths.sum())
+        return blob[positions], lengths
+
+    order = np.argsort(DB1.columns['rsid'], kind='stable')
+    alleles_size = 0
+    freq_size = 0
+    with ExitStack() as stack:
+        files = {col: stack.enter_context(open(os.path.join(TMP_DIR, col), 'wb')) for col in DB_BINARY_COLUMNS}
+        for start in range(0, len(order), DB_BINARY_GATHER_SIZE):
+            idx = order[start : start + DB_BINARY_GATHER_SIZE]
+            for col in ('chr', 'bp', 'rsid'):
+                files[col].write(DB1.columns[col][idx].tobytes())
+
+            alleles, alleles_lengths = gather_bytes(DB1.columns['alleles'], DB1.columns['alleles_ends'], idx)
+            files['alleles'].write(alleles.tobytes())
+            files['alleles_ends'].write((alleles_size + np.cumsum(alleles_lengths)).astype(np.uint64).tobytes())
+            alleles_size += len(alleles)
+
+            freqs, freq_lengths = gather_bytes(DB1.columns['freq'], DB1.columns['freq_ends'], idx)
+            files['freq'].write(freqs.tobytes())
+            files['freq_ends'].write((freq_size + np.cumsum(freq_lengths)).astype(np.uint64).tobytes())
+            freq_size += len(freqs)
+
+    with open(os.path.join(TMP_DIR, 'meta.json'), 'w') as META_FILE_o:
+        json.dump({"n": DB1.n, "chrs": DB1.chrs, "sorted_by": "rsID", "source": get_file_stat(DB2_FILE)}, META_FILE_o)
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+    os.replace(TMP_DIR, STORE_DIR)
+    return True
+
+
+class BinaryDBSNP:
+    """
+    A dbSNP in the binary columnar format (see `write_dbSNP1_binary`), with columns memory-mapped from the disk,
+    so that they aren't parsed on every run, and their pages are shared by the processes using the dbSNP.
+
+    Looks up SNPs by loci if it's the binary dbSNP1 (sorted by Chr and BP), or by rsIDs if it's the binary dbSNP2 (sorted by rsID),
+    with binary search. The same way as with the hash join in loop_fix, `get_all` finds all SNPs with the key, and `get` the first of them.
+    They take the keys of the hash join, so the binary dbSNP can be used in place of SNPs read by it
+    """
+    def __init__(self, STORE_DIR: str):
+        with open(os.path.join(STORE_DIR, 'meta.json'), 'r') as META_FILE_o:
+            meta = json.load(META_FILE_o)
+        self.n: int = meta["n"]
+        self.chrs: List[str] = meta["chrs"]
+        self.sorted_by: Literal['ChrBP', 'rsID'] = meta["sorted_by"]
+        self.source: Dict[str, Any] = meta["source"]
+        self.columns: Dict[str, np.ndarray] = {
+            # an empty file can't be memory-mapped
+            col: np.memmap(os.path.join(STORE_DIR, col), dtype=dtype, mode='r').view(np.ndarray) if os.path.getsize(os.path.join(STORE_DIR, col)) else np.zeros(0, dtype=dtype)
+                for col, dtype in DB_BINARY_COLUMNS.items()
+        }
+
+        # chromosomes' codes by their order in CHR_ORDER, or by their names if they aren't there
+        self.chr_codes: Dict[Union[int, str], int] = {}
+        for code, chr in enumerate(self.chrs):
+            self.chr_codes.setdefault(CHR_ORDER.get(chr, chr), code)
+        # ranges of SNPs of each chromosome in the dbSNP1
+        self.chr_ranges: Dict[int, Tuple[int, int]] = {}
+        # which of the columns of allele frequencies to take (see `preparse_freqs`), or None to take none
+        self.freq_column: Union[int, None] = 0
+
+    def get_row(self, i: int) -> Tuple[str, int, str, str, str, str]:
+        """The SNP number `i` as a row of dbSNP1: Chr, BP, rsID, REF, ALT, freq"""
+        cols = self.columns
+        alleles_start = int(cols['alleles_ends'][i-1]) if i > 0 else 0
+        freq_start = int(cols['freq_ends'][i-1]) if i > 0 else 0
+        ref, alt = cols['alleles'][alleles_start : int(cols['alleles_ends'][i])].tobytes().decode().split('\t')
+        rsid = int(cols['rsid'][i])
+        freqs = cols['freq'][freq_start : int(cols['freq_ends'][i])].tobytes().decode()
+        return (
+            self.chrs[cols['chr'][i]],
+            int(cols['bp'][i]),
+            f"rs{rsid}" if rsid else '.',
+            ref,
+            alt,
+            freqs.split('\t')[self.freq_column] if self.freq_column is not None else '.',
+        )
+
+    def find_by_locus(self, chr_order: Union[int, str], bp: int) -> Union[int, None]:
+        """Number of the first SNP at the locus in the binary dbSNP1. `chr_order` is as in CHR_ORDER, or the chromosome's name"""
+        code = self.chr_codes.get(chr_order)
+        if code is None or not 0 <= bp <= MAX_BP:
+            return None
+        # values are searched with the type of the column, otherwise the whole column is converted for the search
+        if code not in self.chr_ranges:
+            self.chr_ranges[code] = (
+                int(np.searchsorted(self.columns['chr'], DB_BINARY_COLUMNS['chr'](code), 'left')),
+                int(np.searchsorted(self.columns['chr'], DB_BINARY_COLUMNS['chr'](code), 'right')),
+            )
+        start, end = self.chr_ranges[code]
+        i = start + int(np.searchsorted(self.columns['bp'][start:end], DB_BINARY_COLUMNS['bp'](bp), 'left'))
+        return i if i < end and self.columns['bp'][i] == bp else None
+
+    def find_by_rsID(self, rsid: int) -> Union[int, None]:
+        """Number of the first SNP with the rsID (its number, see `parse_rsID`) in the binary dbSNP2"""
+        if not rsid:
+            return None
+        i = int(np.searchsorted(self.columns['rsid'], DB_BINARY_COLUMNS['rsid'](rsid), 'left'))
+        return i if i < self.n and self.columns['rsid'][i] == rsid else None
+
+    def get(self, key: Union[Tuple[Union[int, str], int], int]) -> Union[Tuple[str, Union[int, str], str, str, str, str], None]:
+        """
+        The first SNP with the key: a locus (chromosome's order and BP) for the binary dbSNP1,
+        or the number of an rsID (see `parse_rsID`) for the binary dbSNP2.
+        As with dbSNP2, BP of SNPs found by rsID is a string
+        """
+        SNPs = self.get_all(key)
+        return SNPs[0] if SNPs else None
+
+    def get_all(self, key: Union[Tuple[Union[int, str], int], int]) -> List[Tuple[str, Union[int, str], str, str, str, str]]:
+        """All SNPs with the key (see `get`), e.g. at a multi-allelic site. They go one after another, as they are sorted by the key"""
+        cols = self.columns
+        if self.sorted_by == 'ChrBP':
+            i = self.find_by_locus(*key) # type: ignore # a locus for the dbSNP1
+            same_key_columns = ('chr', 'bp')
+        else:
+            i = self.find_by_rsID(key) # type: ignore # the number of an rsID for the dbSNP2
+            same_key_columns = ('rsid',)
+        if i is None:
+            return []
+        end = i + 1
+        while end < self.n and all(cols[col][end] == cols[col][i] for col in same_key_columns):
+            end += 1
+        SNPs = [self.get_row(j) for j in range(i, end)]
+        if self.sorted_by == 'rsID':
+            return [(chr, str(bp), rsid, ref, alt, freq) for chr, bp, rsid, ref, alt, freq in SNPs]
+        return SNPs # type: ignore # BP is an int for the dbSNP1
+
+
+def read_dbSNP_binary(DB_FILE: str) -> Union[BinaryDBSNP, None]:
+    """
+    Opens the binary dbSNP made for the dbSNP file. Returns None if there's none, or it was made for another version of the file
+    """
+    STORE_DIR = DB_FILE + DB_BINARY_SUFFIX
+    if not os.path.isfile(DB_FILE) or not os.path.isfile(os.path.join(STORE_DIR, 'meta.json')):
+        return None
+    DB = BinaryDBSNP(STORE_DIR)
+    if DB.source != get_file_stat(DB_FILE):
+        return None
+    return DB
+
+
+def index_dbSNP1(DB1_FILE: str):
+    """
+    Recompresses a dbSNP1 prepared with an older version (as a regular gzip) into BGZF, and indexes it
+    """
+    TMP_FILE = DB1_FILE + '.tmp'
+    with gzip.open(DB1_FILE, 'rb') as DB1_FILE_o:
+        indexed = write_dbSNP1(read_chunks_of_lines(DB1_FILE_o, DB1_CHUNK_SIZE), TMP_FILE) # type: ignore # GzipFile is a binary file object
+    # renaming keeps the size and the modification time, so the index stays valid
+    os.replace(TMP_FILE, DB1_FILE)
+    if indexed:
+        os.replace(TMP_FILE + DB1_INDEX_SUFFIX, DB1_FILE + DB1_INDEX_SUFFIX)
+    return indexed
+
+
+
+if __name__ == "__main__":
+    DB1_FILE = sys.argv[1]
+    DB2_FILE = sys.argv[2] if len(sys.argv) > 2 else None
+
+    # with both dbSNPs passed, writes the binary dbSNPs for them, otherwise indexes dbSNP1
+    if DB2_FILE is not None:
+        if write_dbSNP1_binary(DB1_FILE):
+            write_dbSNP2_binary(DB1_FILE, DB2_FILE)
+    else:
+        index_dbSNP1(DB1_FILE)
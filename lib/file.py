@@ -1,9 +1,17 @@
 # standard library
-from typing import Union, List
+from typing import Any, BinaryIO, Deque, Dict, Iterable, Iterator, Union, List, Tuple
 import os
+import codecs
+import queue
+import threading
 import shutil
 import gzip
+import struct
+import hashlib
+import zlib
 from zipfile import ZipFile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # third-party libraries
 import requests
@@ -16,6 +24,25 @@ def file_exists(path: str):
 def get_file_size_bytes(path: str) -> int:
     return os.path.getsize(path)
 
+def get_file_stat(path: str) -> Dict[str, int]:
+    """Size and modification time of the file, to tell whether a file made from it is up to date"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def get_file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Hashes the contents of the file (BLAKE2b), reading it by blocks
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
 
 def file_size_human(size_in_B: int, verbose: bool = True):
     """
@@ -71,6 +98,629 @@ def open_maybe_gz(path: str):
 
 
 
+def read_chunks_of_lines(FILE_o: BinaryIO, chunk_size: int, size: Union[int, None] = None) -> Iterator[bytes]:
+    """
+    Reads a file opened in binary mode by chunks of about `chunk_size` bytes, each having only whole lines.
+
+    Line endings are translated the same way as in the text mode with universal newlines ("\\r\\n" and "\\r" to "\\n"),
+    and the last line gets "\\n" at the end if it's missing.
+
+    If `size` is set, reads at most `size` bytes from the current position of the file
+    """
+    rest = b''
+    while True:
+        if size is not None:
+            block = FILE_o.read(min(chunk_size, size))
+            size -= len(block)
+        else:
+            block = FILE_o.read(chunk_size)
+        if not block:
+            break
+        data = rest + block
+
+        # "\r" at the end of the block may be the first half of "\r\n"
+        trailing_cr = data.endswith(b'\r')
+        if trailing_cr:
+            data = data[:-1]
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+        cut = data.rfind(b'\n') + 1
+        if cut > 0:
+            yield data[:cut]
+        rest = data[cut:] + (b'\r' if trailing_cr else b'')
+
+    rest = rest.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if rest:
+        yield rest if rest.endswith(b'\n') else rest + b'\n'
+
+
+
+def split_into_ranges_of_lines(path: str, n: int) -> List[Tuple[int, int]]:
+    """
+    Splits a plain text file into at most `n` byte ranges of about the same size.
+
+    Each range is a tuple (start, end), and consists of whole lines:
+    it starts either at the beginning of the file or right after a "\\n", and ends right after a "\\n" or at the end of the file
+    """
+    file_size = get_file_size_bytes(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, n):
+            pos = max(file_size*i // n, bounds[-1])
+            f.seek(pos)
+            f.readline() # skip to the end of the line
+            if f.tell() >= file_size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(file_size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+
+def read_line_at_offset(FILE_o: BinaryIO, offset: int, start: int = 0, block_size: int = 4096) -> bytes:
+    """
+    Reads the whole line that contains the byte at `offset` in a file opened in binary mode,
+    including its line ending (if any).
+
+    Line endings are recognized the same way as in `read_chunks_of_lines` ("\\n", "\\r\\n", or "\\r"),
+    and the byte at `offset` may be a part of the line ending.
+    `start` is the offset of the first byte of the first line that may be returned (e.g. right after the header)
+    """
+    # "\n" of "\r\n" belongs to the line ending with "\r"
+    if offset > start:
+        FILE_o.seek(offset - 1)
+        if FILE_o.read(2) == b'\r\n':
+            offset -= 1
+
+    # look back for the end of the previous line
+    line_start = start
+    pos = offset
+    while pos > start:
+        read_from = max(start, pos - block_size)
+        FILE_o.seek(read_from)
+        block = FILE_o.read(pos - read_from)
+        newline_i = max(block.rfind(b'\n'), block.rfind(b'\r'))
+        if newline_i != -1:
+            line_start = read_from + newline_i + 1
+            break
+        pos = read_from
+
+    # read forward up to the end of this line
+    FILE_o.seek(line_start)
+    line = b''
+    while True:
+        block = FILE_o.read(block_size)
+        if not block:
+            return line
+        line_end_i = min(i for i in (block.find(b'\n'), block.find(b'\r'), len(block)) if i != -1)
+        line += block[:line_end_i+1]
+        if line_end_i < len(block):
+            if block[line_end_i:line_end_i+1] == b'\r':
+                # "\r" may be followed by "\n", possibly in the next block
+                next_byte = block[line_end_i+1:line_end_i+2] or FILE_o.read(1)
+                if next_byte == b'\n':
+                    line += next_byte
+            return line
+
+
+
+BGZF_HEADER_SIZE = 12
+
+def read_bgzf_block_size(FILE_o: BinaryIO) -> Union[int, None]:
+    """
+    Reads the header of a BGZF block at the current position of the file and returns the size of the whole block in bytes.
+
+    Returns None if there's no BGZF block at the current position (e.g. end of the file or a regular gzip member)
+    """
+    header = FILE_o.read(BGZF_HEADER_SIZE)
+    if len(header) < BGZF_HEADER_SIZE or header[:4] != b'\x1f\x8b\x08\x04':
+        return None
+    xlen: int = struct.unpack('<H', header[10:12])[0]
+    extra = FILE_o.read(xlen)
+
+    # look for the "BC" subfield holding the block size minus 1
+    i = 0
+    while i + 4 <= len(extra):
+        slen: int = struct.unpack('<H', extra[i+2:i+4])[0]
+        if extra[i:i+2] == b'BC' and slen == 2:
+            return struct.unpack('<H', extra[i+4:i+6])[0] + 1
+        i += 4 + slen
+    return None
+
+
+def is_bgzf(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return read_bgzf_block_size(f) is not None
+
+
+def get_bgzf_blocks(path: str) -> List[Tuple[int, int]]:
+    """
+    Lists all BGZF blocks in the file as tuples (offset, uncompressed size)
+    """
+    blocks: List[Tuple[int, int]] = []
+    offset = 0
+    with open(path, 'rb') as f:
+        while True:
+            f.seek(offset)
+            block_size = read_bgzf_block_size(f)
+            if block_size is None:
+                break
+            f.seek(offset + block_size - 4)
+            isize: int = struct.unpack('<I', f.read(4))[0]
+            blocks.append((offset, isize))
+            offset += block_size
+    return blocks
+
+
+def split_bgzf_into_ranges(path: str, n: int) -> List[Tuple[int, int, int]]:
+    """
+    Splits a BGZF file into at most `n` ranges of whole BGZF blocks of about the same compressed size.
+
+    Each range is a tuple (lookbehind, start, end) of offsets in the compressed file,
+    where `lookbehind` is the offset of the non-empty block preceding the range (equals `start` for the first range).
+    Lines crossing the boundaries of ranges are handled by `read_bgzf_range_of_lines`
+    """
+    file_size = get_file_size_bytes(path)
+    blocks = get_bgzf_blocks(path)
+
+    ranges: List[Tuple[int, int, int]] = []
+    lookbehind = start = 0
+    block_i = 1
+    for i in range(1, n):
+        target = file_size*i // n
+        while block_i < len(blocks) and (blocks[block_i][0] < target or blocks[block_i-1][1] == 0):
+            block_i += 1
+        if block_i >= len(blocks):
+            break
+        ranges.append((lookbehind, start, blocks[block_i][0]))
+        lookbehind, start = blocks[block_i-1][0], blocks[block_i][0]
+    ranges.append((lookbehind, start, file_size))
+    return ranges
+
+
+def read_bgzf_range_of_lines(path: str, lookbehind: int, start: int, end: int) -> bytes:
+    """
+    Decompresses lines that begin within the given range of BGZF blocks (see `split_bgzf_into_ranges`).
+
+    The line that begins in the previous range is skipped,
+    and the last line is read up to its end from the blocks following the range
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = gzip.decompress(f.read(end - start))
+
+        if lookbehind != start:
+            f.seek(lookbehind)
+            previous = gzip.decompress(f.read(start - lookbehind))
+            if not previous.endswith(b'\n'):
+                data = data[data.find(b'\n')+1:] if b'\n' in data else b''
+
+        if data and not data.endswith(b'\n'):
+            f.seek(end)
+            with gzip.GzipFile(fileobj=f) as rest_o: # type: ignore # a binary file object works here
+                while True:
+                    piece = rest_o.read(64 * 1024)
+                    if not piece:
+                        break
+                    newline_i = piece.find(b'\n')
+                    if newline_i != -1:
+                        data += piece[:newline_i+1]
+                        break
+                    data += piece
+    return data
+
+
+
+# the largest amount of data in a BGZF block, the same as in bgzip
+BGZF_MAX_BLOCK_DATA = 0xff00
+
+# the empty block that marks the end of a BGZF file
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+def compress_bgzf_block(data: bytes, level: int = 6) -> bytes:
+    """
+    Compresses at most BGZF_MAX_BLOCK_DATA bytes into a BGZF block:
+    a gzip member with the "BC" extra subfield holding the size of the block
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = BGZF_HEADER_SIZE + 6 + len(cdata) + 8
+    return (
+        b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00' +
+        b'BC' + struct.pack('<HH', 2, block_size - 1) +
+        cdata +
+        struct.pack('<II', zlib.crc32(data), len(data))
+    )
+
+
+# output files with these extensions are compressed as BGZF
+BGZF_OUTPUT_EXTENSIONS = ('.gz', '.bgz')
+
+# the default compression level of BGZF output files, the same as in bgzip
+BGZF_DEFAULT_LEVEL = 6
+
+def is_bgzf_output(path: str) -> bool:
+    return path.endswith(BGZF_OUTPUT_EXTENSIONS)
+
+class BgzfWriter:
+    """
+    Writes a BGZF file (the same as `bgzip`), which can be read with gzip.open as well,
+    from texts or bytes passed to `write`, like a file opened for writing.
+
+    Blocks are independent of each other, so they are compressed by a pool of `threads` threads
+    (by default, one for each CPU). zlib releases the GIL, so the threads compress in parallel.
+    At most a few blocks for each thread are kept in memory.
+    `flush` ends the current block early, and writes all blocks so far to the file
+    """
+    def __init__(self, path: str, level: int = BGZF_DEFAULT_LEVEL, threads: Union[int, None] = None):
+        if not threads:
+            threads = os.cpu_count() or 1
+        self.level = level
+        self.FILE_o = open(path, 'wb')
+        self.pool = ThreadPoolExecutor(threads)
+        # blocks being compressed, in the order of the file
+        self.pending: Deque[Future] = deque()
+        self.max_pending = 4 * threads
+        # data that doesn't fill a block yet
+        self.buffer = bytearray()
+
+    def write(self, data: Union[str, bytes]):
+        self.buffer += data.encode() if isinstance(data, str) else data
+        while len(self.buffer) >= BGZF_MAX_BLOCK_DATA:
+            self.submit_block(bytes(self.buffer[:BGZF_MAX_BLOCK_DATA]))
+            del self.buffer[:BGZF_MAX_BLOCK_DATA]
+
+    def writelines(self, texts: Iterable[Union[str, bytes]]):
+        for text in texts:
+            self.write(text)
+
+    def submit_block(self, data: bytes):
+        self.pending.append(self.pool.submit(compress_bgzf_block, data, self.level))
+        if len(self.pending) >= self.max_pending:
+            self.FILE_o.write(self.pending.popleft().result())
+
+    def flush(self):
+        if self.buffer:
+            self.submit_block(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self.FILE_o.write(self.pending.popleft().result())
+        self.FILE_o.flush()
+
+    def close(self):
+        try:
+            self.flush()
+            self.FILE_o.write(BGZF_EOF)
+        finally:
+            self.pool.shutdown()
+            self.FILE_o.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_output(path: str, level: int = BGZF_DEFAULT_LEVEL):
+    """Opens the output file for writing texts, as a BGZF file if it's a .gz or .bgz file (see `BgzfWriter`)"""
+    return BgzfWriter(path, level) if is_bgzf_output(path) else open(path, 'w')
+
+
+def compress_into_bgzf(path: str, OUTPUT_FILE: str, level: int = BGZF_DEFAULT_LEVEL, threads: Union[int, None] = None):
+    """
+    Compresses the file into a BGZF file, see `BgzfWriter`
+    """
+    with open(path, 'rb') as FILE_o, BgzfWriter(OUTPUT_FILE, level, threads) as OUTPUT_FILE_o:
+        shutil.copyfileobj(FILE_o, OUTPUT_FILE_o, BGZF_MAX_BLOCK_DATA)
+
+
+def read_bgzf_blocks(path: str, end: Union[int, None] = None) -> Iterator[bytes]:
+    """
+    Decompresses BGZF blocks of the file one by one, up to the `end` offset in the file (a boundary of blocks)
+    """
+    with open(path, 'rb') as FILE_o:
+        offset = 0
+        while end is None or offset < end:
+            block_size = read_bgzf_block_size(FILE_o)
+            if block_size is None:
+                break
+            FILE_o.seek(offset)
+            yield gzip.decompress(FILE_o.read(block_size))
+            offset += block_size
+
+
+class BgzfLineReader:
+    """
+    Reads lines of a BGZF file, like a text file opened for reading, and can seek to a virtual offset:
+    the offset of a BGZF block in the file shifted left by 16 bits, plus the offset in the decompressed block
+    """
+    def __init__(self, path: str):
+        self.FILE_o = open(path, 'rb')
+        # offset of the block with the lines that are being read, and of the block after it
+        self.block_offset = 0
+        self.next_block_offset = 0
+        self.lines: List[str] = []
+        self.line_i = 0
+        # the beginning of a line that continues in the next block
+        self.rest = b''
+
+    def decompress_next_block(self) -> Union[bytes, None]:
+        self.FILE_o.seek(self.next_block_offset)
+        block_size = read_bgzf_block_size(self.FILE_o)
+        if block_size is None:
+            return None
+        self.FILE_o.seek(self.next_block_offset)
+        data = gzip.decompress(self.FILE_o.read(block_size))
+        self.block_offset = self.next_block_offset
+        self.next_block_offset += block_size
+        return data
+
+    def set_lines(self, data: bytes):
+        """Splits whole lines of the data, and keeps the rest until the next block"""
+        cut = data.rfind(b'\n') + 1
+        self.lines = data[:cut].decode('utf-8').splitlines(True)
+        self.line_i = 0
+        self.rest = data[cut:]
+
+    def readline(self) -> str:
+        while self.line_i >= len(self.lines):
+            data = self.decompress_next_block()
+            if data is None:
+                # the last line may not end with a newline
+                line, self.rest = self.rest.decode('utf-8'), b''
+                return line
+            self.set_lines(self.rest + data)
+        line = self.lines[self.line_i]
+        self.line_i += 1
+        return line
+
+    def seek(self, virtual_offset: int):
+        self.next_block_offset = virtual_offset >> 16
+        data = self.decompress_next_block()
+        self.set_lines(data[virtual_offset & 0xffff:] if data is not None else b'')
+
+    def close(self):
+        self.FILE_o.close()
+
+
+def read_batches_of_lines(FILE_o: BinaryIO, block_size: int = 1 << 20) -> Iterator[List[str]]:
+    """
+    Reads lines of a file opened in binary mode (e.g. with gzip.open) by blocks of `block_size` bytes,
+    the same way as they're read in the text mode with universal newlines. Yields the lines that end in each block
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    rest = ''
+    while True:
+        block = FILE_o.read(block_size)
+        data = rest + decoder.decode(block, final=not block)
+        if not block:
+            break
+        # "\r" at the end of the block may be the first half of "\r\n"
+        trailing_cr = data.endswith('\r')
+        if trailing_cr:
+            data = data[:-1]
+        if '\r' in data:
+            data = data.replace('\r\n', '\n').replace('\r', '\n')
+        lines = data.split('\n')
+        rest = lines.pop() + ('\r' if trailing_cr else '')
+        yield [line + '\n' for line in lines]
+    if data:
+        # the last line may not end with a newline
+        yield [data.replace('\r', '\n')]
+
+
+
+# the number of batches of lines (or BGZF blocks) read ahead by a background thread, and of texts waiting to be written by one
+THREADS_QUEUE_SIZE = 8
+
+class ThreadedLineReader:
+    """
+    Reads lines of a file opened in binary mode like a text file opened for reading,
+    while a background thread reads batches of lines ahead (see `read_batches_of_lines`) into a bounded queue.
+    zlib releases the GIL, so a gzipped file is decompressed at the same time as its lines are worked on.
+
+    The file object is closed with the reader
+    """
+    def __init__(self, FILE_o: BinaryIO, queue_size: int = THREADS_QUEUE_SIZE):
+        self.FILE_o = FILE_o
+        self.lines: List[str] = []
+        self.line_i = 0
+        self.ended = False
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.read_ahead, daemon=True)
+        self.thread.start()
+
+    def read_ahead(self):
+        item: Any = None # the end of the file
+        try:
+            for lines in read_batches_of_lines(self.FILE_o):
+                self.queue.put(lines)
+                if self.stopped.is_set():
+                    return
+        except Exception as e:
+            item = e
+        self.queue.put(item)
+
+    def readline(self) -> str:
+        while self.line_i >= len(self.lines):
+            if self.ended:
+                return ''
+            item = self.queue.get()
+            if item is None or isinstance(item, Exception):
+                self.ended = True
+                if item is not None:
+                    raise item
+                return ''
+            self.lines = item
+            self.line_i = 0
+        line = self.lines[self.line_i]
+        self.line_i += 1
+        return line
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def close(self):
+        stop_thread(self.thread, self.stopped, self.queue)
+        self.FILE_o.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ThreadedBgzfLineReader(BgzfLineReader):
+    """
+    BgzfLineReader with a background thread that decompresses the following blocks ahead into a bounded queue.
+
+    Seeking to one of the blocks that have already been decompressed takes it from the queue,
+    otherwise the thread is restarted from the block
+    """
+    def __init__(self, path: str, queue_size: int = THREADS_QUEUE_SIZE):
+        super().__init__(path)
+        self.path = path
+        self.queue_size = queue_size
+        self.start(0)
+
+    def start(self, block_offset: int):
+        self.next_block_offset = block_offset
+        # the end of the blocks that have been decompressed by the thread
+        self.decompressed_until = block_offset
+        self.ended = False
+        self.queue: queue.Queue = queue.Queue(self.queue_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.decompress_ahead, args=(block_offset, self.queue, self.stopped), daemon=True)
+        self.thread.start()
+
+    def decompress_ahead(self, block_offset: int, blocks: queue.Queue, stopped: threading.Event):
+        item: Any = None # the end of the file
+        try:
+            with open(self.path, 'rb') as FILE_o:
+                while not stopped.is_set():
+                    FILE_o.seek(block_offset)
+                    block_size = read_bgzf_block_size(FILE_o)
+                    if block_size is None:
+                        break
+                    FILE_o.seek(block_offset)
+                    data = gzip.decompress(FILE_o.read(block_size))
+                    self.decompressed_until = block_offset + block_size
+                    blocks.put((block_offset, block_size, data))
+                    block_offset += block_size
+        except Exception as e:
+            item = e
+        blocks.put(item)
+
+    def decompress_next_block(self) -> Union[bytes, None]:
+        if self.ended:
+            return None
+        item = self.queue.get()
+        if item is None or isinstance(item, Exception):
+            self.ended = True
+            if item is not None:
+                raise item
+            return None
+        self.block_offset, block_size, data = item
+        self.next_block_offset = self.block_offset + block_size
+        return data
+
+    def seek(self, virtual_offset: int):
+        block_offset = virtual_offset >> 16
+        if not self.next_block_offset <= block_offset < self.decompressed_until:
+            stop_thread(self.thread, self.stopped, self.queue)
+            self.start(block_offset)
+        # the blocks before it are skipped
+        data = self.decompress_next_block()
+        while data is not None and self.block_offset < block_offset:
+            data = self.decompress_next_block()
+        self.set_lines(data[virtual_offset & 0xffff:] if data is not None else b'')
+
+    def close(self):
+        stop_thread(self.thread, self.stopped, self.queue)
+        super().close()
+
+
+def stop_thread(thread: threading.Thread, stopped: threading.Event, thread_queue: queue.Queue):
+    """Stops the thread that reads ahead, taking everything from its queue so that it isn't blocked on the full queue"""
+    stopped.set()
+    while thread.is_alive():
+        try:
+            while True:
+                thread_queue.get_nowait()
+        except queue.Empty:
+            pass
+        thread.join(0.01)
+
+
+class ThreadedWriter:
+    """
+    Writes to the file object in a background thread: texts passed to `write` are put into a bounded queue,
+    and the thread writes everything that's in the queue at once with `writelines`.
+    `flush` waits for everything written so far to be written, and `close` also closes the file object.
+
+    An error in the thread is raised by the next `write`, `flush`, or `close`
+    """
+    def __init__(self, FILE_o, queue_size: int = THREADS_QUEUE_SIZE):
+        self.FILE_o = FILE_o
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.error: Union[Exception, None] = None
+        self.thread = threading.Thread(target=self.write_behind, daemon=True)
+        self.thread.start()
+
+    def write_behind(self):
+        done = False
+        while not done:
+            texts = [self.queue.get()]
+            try:
+                while True:
+                    texts.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            n = len(texts)
+            if texts[-1] is None:
+                texts.pop()
+                done = True
+            if self.error is None:
+                try:
+                    self.FILE_o.writelines(texts)
+                except Exception as e:
+                    self.error = e
+            for _ in range(n):
+                self.queue.task_done()
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def write(self, text: str):
+        self.raise_error()
+        if text:
+            self.queue.put(text)
+
+    def flush(self):
+        self.queue.join()
+        self.raise_error()
+        self.FILE_o.flush()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.FILE_o.close()
+        self.raise_error()
+
+
+
 def resolve_bare_text_file(maybe_archive_path: str, unpacked_text_file_path: str):
     """
     Returns the path for the bare (unpacked) dataset file.
@@ -0,0 +1,273 @@
+# standard library
+import sys
+import os
+import gzip
+import json
+import shutil
+from typing import BinaryIO, Dict, List, Tuple, Union
+
+# third-party libraries
+import numpy as np
+import magic
+from tqdm import tqdm
+
+# local
+from lib.chain_utils import ChainIndex, read_chain_index
+from lib.file import read_chunks_of_lines
+from lib.standard_column_order import STANDARD_COLUMN_ORDER
+from lib.validation_utils import CATEGORY_CHR
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    CONSTANTS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+# rows are lifted over by chunks of about this many bytes
+CHUNK_SIZE = 2 * 1024 * 1024
+
+Chr_i = STANDARD_COLUMN_ORDER.index('Chr')
+BP_i = STANDARD_COLUMN_ORDER.index('BP')
+
+# order of chromosomes in the sorted output, same as in sort_GWASSS_by_ChrBP.
+# Other chromosomes go after these, in the alphabetical order
+CHR_SORT_ORDER: Dict[str, int] = {str(n): n for n in range(1, 27)}
+CHR_SORT_ORDER.update({'X': 27, 'Y': 28, 'M': 29})
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    FUNCTIONS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def normalize_Chr(chr: str) -> str:
+    """'chr01' -> '1', 'x' -> 'X'"""
+    if chr[:3].lower() == 'chr':
+        chr = chr[3:]
+    return str(int(chr)) if chr.isdigit() else chr.upper()
+
+
+def get_Chr_sort_key(chr: str) -> Tuple[int, str]:
+    return (CHR_SORT_ORDER[chr], '') if chr in CHR_SORT_ORDER else (len(CHR_SORT_ORDER) + 1, chr)
+
+
+def parse_ChrBP(fields: List[str]) -> Union[Tuple[str, int], None]:
+    """
+    Returns Chr and BP from the row if they are valid (as in the validation of entries), otherwise None
+    """
+    if len(fields) <= max(Chr_i, BP_i):
+        return None
+    chr = fields[Chr_i]
+    if chr not in CATEGORY_CHR and chr[3:] not in CATEGORY_CHR:
+        return None
+    try:
+        bp = int(float(fields[BP_i])) # using float allows sci notation string
+    except (ValueError, OverflowError):
+        return None
+    if bp < 0:
+        return None
+    return normalize_Chr(chr), bp
+
+
+def lift_over_chunk_of_lines(chunk: bytes, converter: ChainIndex) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Lifts over Chr and BP of rows in the chunk at once.
+
+    Returns lifted rows with their new chromosome, and rows that couldn't be lifted over as they are
+    """
+    lines = chunk.decode().split('\n')[:-1]
+    # only the fields up to Chr and BP are split, the rest of the row is kept as it is
+    rows = [line.split('\t', max(Chr_i, BP_i) + 1) for line in lines]
+
+    to_lift: List[int] = []
+    chrs: List[str] = []
+    bps: List[int] = []
+    unmapped: List[str] = []
+    for i, fields in enumerate(rows):
+        ChrBP = parse_ChrBP(fields)
+        if ChrBP is None:
+            unmapped.append(lines[i])
+        else:
+            to_lift.append(i)
+            chrs.append(ChrBP[0])
+            bps.append(ChrBP[1])
+
+    lifted: List[Tuple[str, str]] = []
+    new_chrs, new_bps = converter.lift_over(chrs, bps)
+    for i, new_chr, new_bp in zip(to_lift, new_chrs, new_bps.tolist()):
+        if new_chr is None:
+            unmapped.append(lines[i])
+            continue
+        fields = rows[i]
+        fields[Chr_i] = new_chr.replace('chr', '')
+        fields[BP_i] = str(new_bp)
+        lifted.append((fields[Chr_i], '\t'.join(fields)))
+
+    return lifted, unmapped
+
+
+def sort_buckets(BUCKETS_DIR: str, buckets: Dict[str, int], OUTPUT_FILE_o):
+    """
+    Writes the buckets of lifted rows to the output file in the order of chromosomes,
+    sorting rows of each bucket by BP
+    """
+    for chr in sorted(buckets.keys(), key=get_Chr_sort_key):
+        with open(os.path.join(BUCKETS_DIR, str(buckets[chr])), 'r') as BUCKET_o:
+            lines = BUCKET_o.readlines()
+        bps = np.array([int(line.split('\t', BP_i + 1)[BP_i]) for line in lines], dtype=np.int64)
+        for i in np.argsort(bps, kind='stable').tolist():
+            OUTPUT_FILE_o.write(lines[i])
+
+
+def write_standard_config(GWAS_FILE: str, header: str, build: str):
+    """
+    Writes the .json config for a file in the internal "standard" format,
+    with columns after the standard ones kept as "other" columns
+    """
+    n_cols = len(header.rstrip('\n').split('\t'))
+    config: Dict[str, Union[int, str, List[int]]] = {col: i for i, col in enumerate(STANDARD_COLUMN_ORDER)}
+    if n_cols > len(STANDARD_COLUMN_ORDER):
+        config["other"] = list(range(len(STANDARD_COLUMN_ORDER), n_cols))
+    config["build"] = build
+    with open(GWAS_FILE + '.json', 'w') as CONFIG_o:
+        json.dump(config, CONFIG_o, indent=4)
+
+
+def liftover_GWASSS(
+    GWAS_FILE: str,
+    CHAIN_FILE: str,
+    OUTPUT_FILE: str,
+    UNMAPPED_FILE: str,
+    SORT: bool = False,
+    BUILD: Union[str, None] = None,
+) -> Tuple[int, int]:
+    """
+    Lifts over Chr and BP of the formatted GWAS summary stats file with the chain file, streaming it by chunks of rows.
+    Doesn't validate or restore anything else, so it doesn't need dbSNPs.
+
+    Parameters
+    ----------
+    GWAS_FILE : str
+        GWAS summary statistics file in the internal \"standard\" tsv format (bare or gzipped)
+
+    CHAIN_FILE : str
+        chain file for liftover from the build of the GWAS SS file to any other build
+
+    OUTPUT_FILE : str
+        output file name, GWAS summary statistics file with lifted over Chr and BP
+
+    UNMAPPED_FILE : str
+        file name for rows which Chr and BP are invalid or can't be lifted over. These rows are kept as they are
+
+    SORT : bool
+        If True, the output file is sorted by Chr and BP, as with sort_GWASSS_by_ChrBP.
+        The lifted rows are then collected in buckets by chromosomes, and each bucket is sorted in memory
+
+    BUILD : None | str
+        The build the chain file lifts over to. If set, a .json config with this build is written for the output file,
+        so that it can be passed to `fix`
+
+    Returns
+    -------
+    the number of lifted rows, and the number of rows that couldn't be lifted over
+    """
+
+    if not os.path.isfile(GWAS_FILE):
+        raise ValueError(f"passed GWAS SS file doesn't exist at path {GWAS_FILE}")
+
+    mime: str = magic.from_file(GWAS_FILE, mime=True)
+    if mime == 'application/gzip' or mime == 'application/x-gzip':
+        GWAS_FILE_o: BinaryIO = gzip.open(GWAS_FILE, 'rb')  # type: ignore # GzipFile is a binary file object
+    elif mime == 'text/plain':
+        GWAS_FILE_o = open(GWAS_FILE, 'rb')
+    elif mime == 'inode/x-empty':
+        raise FileNotFoundError('The input file is empty!')
+    else:
+        raise ValueError(f"Got unexpected type of file: {mime}")
+
+    converter = read_chain_index(CHAIN_FILE)
+
+    BUCKETS_DIR = OUTPUT_FILE + '_buckets'
+    # bucket (file name in the BUCKETS_DIR) of each chromosome
+    buckets: Dict[str, int] = {}
+    if SORT:
+        os.makedirs(BUCKETS_DIR, exist_ok=True)
+
+    def write_to_buckets(lifted: List[Tuple[str, str]]):
+        rows_by_chr: Dict[str, List[str]] = {}
+        for chr, line in lifted:
+            rows_by_chr.setdefault(chr, []).append(line)
+        for chr, lines in rows_by_chr.items():
+            bucket = buckets.setdefault(chr, len(buckets))
+            with open(os.path.join(BUCKETS_DIR, str(bucket)), 'a') as BUCKET_o:
+                BUCKET_o.write('\n'.join(lines) + '\n')
+
+
+    #
+    # STEP #1
+    #    Lift over the rows chunk by chunk,
+    #    writing the lifted rows to the output file (or to the buckets to sort them),
+    #    and the rest to the file with unmapped rows
+    #
+    lifted_count = 0
+    unmapped_count = 0
+    header = ''
+    OUTPUT_FILE_o = open(OUTPUT_FILE, 'w')
+    UNMAPPED_FILE_o = open(UNMAPPED_FILE, 'w')
+    pbar = tqdm(desc="lifting over entries ")
+    try:
+        for chunk_i, chunk in enumerate(read_chunks_of_lines(GWAS_FILE_o, CHUNK_SIZE)):
+            if chunk_i == 0:
+                # the header goes to both files
+                header_end = chunk.index(b'\n')+1
+                header = chunk[:header_end].decode()
+                OUTPUT_FILE_o.write(header)
+                UNMAPPED_FILE_o.write(header)
+                chunk = chunk[header_end:]
+
+            lifted, unmapped = lift_over_chunk_of_lines(chunk, converter)
+            if SORT:
+                write_to_buckets(lifted)
+            else:
+                OUTPUT_FILE_o.write(''.join(line + '\n' for _, line in lifted))
+            UNMAPPED_FILE_o.write(''.join(line + '\n' for line in unmapped))
+
+            lifted_count += len(lifted)
+            unmapped_count += len(unmapped)
+            pbar.update(len(lifted) + len(unmapped))
+        pbar.close()
+
+
+        #
+        # STEP #2
+        #    Sort the lifted rows, if requested
+        #
+        if SORT:
+            sort_buckets(BUCKETS_DIR, buckets, OUTPUT_FILE_o)
+
+    finally:
+        GWAS_FILE_o.close()
+        OUTPUT_FILE_o.close()
+        UNMAPPED_FILE_o.close()
+        if SORT:
+            shutil.rmtree(BUCKETS_DIR, ignore_errors=True)
+
+    if BUILD is not None:
+        write_standard_config(OUTPUT_FILE, header, BUILD)
+
+    return lifted_count, unmapped_count
+
+
+
+
+if __name__ == "__main__":
+    GWAS_FILE = sys.argv[1]
+    CHAIN_FILE = sys.argv[2]
+    OUTPUT_FILE = sys.argv[3]
+    UNMAPPED_FILE = sys.argv[4]
+
+    liftover_GWASSS(GWAS_FILE, CHAIN_FILE, OUTPUT_FILE, UNMAPPED_FILE)
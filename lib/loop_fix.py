@@ -2,29 +2,46 @@
 import io
 import sys
 import re
-from typing import Dict, Literal, Union, Tuple
+import json
+import codecs
+from typing import Any, Callable, Deque, Dict, List, Literal, Sequence, Union, Tuple
 import os
 import time
+import shutil
+import multiprocessing
 from math import isnan
 import gzip
+from itertools import islice
+from collections import deque
 
 # third-party libraries
-from liftover import ChainFile as get_lifter_from_ChainFile # type: ignore # pylance mistakenly doesn't recognize ChainFile
+import numpy as np
 from tqdm import tqdm
 
 # local
-from lib.math_utils import normal_p_area_two_tailed, normal_z_score_two_tailed
+from lib.math_utils import normal_p_areas_two_tailed, normal_z_scores_two_tailed, clip_float
 from lib.standard_column_order import STANDARD_COLUMN_ORDER
-from lib.report_utils import read_report_from_dir
+from lib.report_utils import read_report_from_dir, read_issues_bitmask_from_dir
+from lib.validation_utils import (
+    INVALID_ROW, INVALID_RSID, INVALID_CHR, INVALID_BP, INVALID_EA, INVALID_OA, INVALID_EAF, INVALID_SE, INVALID_ES,
+    INVALID_PVAL_BIT,
+    check_rows, get_issues_from_bitmask,
+)
 from lib.env import GWASSS_BUILD_NUMBER_ENV, get_build, set_build
+from lib.file import BGZF_DEFAULT_LEVEL, BgzfLineReader, ThreadedBgzfLineReader, ThreadedLineReader, ThreadedWriter, get_file_hash, get_file_stat, is_bgzf_output, open_output, read_bgzf_blocks
+from lib.dbSNP_utils import (
+    DB1Index, read_dbSNP1_index, find_in_dbSNP1_index,
+    BinaryDBSNP, read_dbSNP_binary,
+    read_dbSNP_freq_databases,
+    parse_rsID, is_dbSNP2_sorted_by_rsID_number,
+)
+from lib.chain_utils import ChainIndex, read_chain_index
+from lib.validate_GWASSS_entries import ValidatingWriter
 
 
 def file_exists(path: str):
         return os.path.isfile(path)
 
-def clip_float(val: float, range: Tuple[float, float] = (0, 1)):
-    return min(range[1], max(val, range[0]))
-
 class defaultTrueDict(dict):
     def __missing__(self, key):
         return True
@@ -36,6 +53,194 @@ class kukdefaultdict(dict):
     def __missing__(self, key):
         return key
 
+# a row of a preprocessed dbSNP: Chr, BP, rsID, REF, ALT, freq
+DBSNP_ROW = Tuple[str, Union[int, str], str, str, str, str]
+
+# checkpoints of loop_fix are written next to the output file, with this extension
+CHECKPOINT_EXT = '.checkpoint.json'
+# a checkpoint is written at most once in this many seconds
+CHECKPOINT_INTERVAL = 5 * 60
+
+class ChunkOfRows:
+    """
+    Rows of a chunk of the GWAS SS file for the chunked engine of loop_fix,
+    with masks of rows where each of the columns is valid (as in the field validators of loop_fix).
+
+    Rows are split into fields only when a resolver needs them.
+    Masks are only set for well-formed rows (see INVALID_ROW), malformed rows are resolved row by row
+    """
+    def __init__(self, lines: List[str], valid: Dict[str, np.ndarray], malformed: np.ndarray):
+        self.lines = lines
+        self.fields: List[Union[None, List[str]]] = [None] * len(lines)
+        self.valid = valid
+        self.malformed = malformed
+        # rows starting from this one aren't written, as the row engine would've stopped at it
+        self.end = len(lines)
+        # rows where Chr and BP couldn't be lifted over
+        self.lost_in_liftover: List[int] = []
+
+    def get_fields(self, i: int) -> List[str]:
+        fields = self.fields[i]
+        if fields is None:
+            fields = self.fields[i] = self.lines[i].split("\t")
+        return fields
+
+    def rows_to_resolve(self, mask: np.ndarray):
+        """Yields indices of rows in the mask, and of malformed rows, in order"""
+        for i in np.flatnonzero(mask | self.malformed).tolist():
+            if i >= self.end:
+                return
+            yield i
+
+    def text(self) -> str:
+        return "".join(
+            self.lines[i] if self.fields[i] is None else "\t".join(self.fields[i]) # type: ignore
+                for i in range(self.end)
+        )
+
+
+class SNPsByKey(dict):
+    """SNPs read by the hash join: lists of all SNPs with each key, with the same `get_all` as `BinaryDBSNP` has"""
+    def get_all(self, key) -> Sequence[DBSNP_ROW]:
+        return self.get(key, ())
+
+class SNPsCursor:
+    """
+    Goes through a dbSNP sorted by a key (locus or rsID) along with the GWAS SS file sorted by the same key.
+
+    Looking up a key reads the dbSNP up to the first SNP after the key, which is kept for the next key,
+    and keeps all SNPs with the key in a window. So rows with the same key (e.g. at a multi-allelic site)
+    all get the same SNPs to choose from, without reading the dbSNP again
+    """
+    def __init__(self, SNPs_FILE_o, read_SNP: Callable[[Any], DBSNP_ROW], compare: Callable[[DBSNP_ROW, Any], int]):
+        """
+        `read_SNP(SNPs_FILE_o)` reads the next SNP, and raises IndexError at the end of the file (or at a malformed line),
+        or EOFError if the file is cut short.
+        `compare(SNP, key)` is negative if the SNP goes before the key, 0 if it has the key, and positive if it goes after it
+        """
+        self.SNPs_FILE_o = SNPs_FILE_o
+        self.read_SNP = read_SNP
+        self.compare = compare
+        self.key: Any = None
+        self.window: Deque[DBSNP_ROW] = deque()
+        # the first SNP after the window, which is read ahead
+        self.next_SNP: Union[DBSNP_ROW, None] = None
+        self.last_read_SNP: Union[DBSNP_ROW, None] = None
+        self.reached_end = False
+        # position in the dbSNP: the offset of the last seek (None if it's read from the beginning), and the number of lines read since
+        self.offset: Union[int, None] = None
+        self.lines_read = 0
+
+    def seek(self, offset: int):
+        """Skips to the offset in the dbSNP (see `BgzfLineReader`), which has to go before the SNPs with the next key"""
+        self.SNPs_FILE_o.seek(offset)
+        self.next_SNP = None
+        self.offset = offset
+        self.lines_read = 0
+
+    def get_state(self) -> Dict[str, Any]:
+        """State of the cursor for a checkpoint of loop_fix"""
+        return {
+            "key": self.key, "window": list(self.window), "next_SNP": self.next_SNP,
+            "last_read_SNP": self.last_read_SNP, "reached_end": self.reached_end,
+            "offset": self.offset, "lines_read": self.lines_read,
+        }
+
+    def resume(self, state: Dict[str, Any]):
+        """
+        Restores the state from a checkpoint (see `get_state`) of the same dbSNP, and moves back to the same position in it:
+        seeks to the offset, if there is one, and skips the lines read since
+        """
+        as_tuple = lambda value: tuple(value) if isinstance(value, list) else value
+        self.key = as_tuple(state["key"])
+        self.window = deque(tuple(SNP) for SNP in state["window"])
+        self.next_SNP = as_tuple(state["next_SNP"])
+        self.last_read_SNP = as_tuple(state["last_read_SNP"])
+        self.reached_end = state["reached_end"]
+        self.offset = state["offset"]
+        self.lines_read = state["lines_read"]
+        if self.offset is not None:
+            self.SNPs_FILE_o.seek(self.offset)
+        for _ in range(self.lines_read):
+            self.SNPs_FILE_o.readline()
+
+    def find(self, key) -> Deque[DBSNP_ROW]:
+        """SNPs with the key. Keys are looked up in the order of the dbSNP, otherwise SNPs of a key that goes back aren't found"""
+        if key == self.key:
+            return self.window
+        self.key = key
+        self.window = deque()
+        while True:
+            SNP = self.next_SNP
+            self.next_SNP = None
+            if SNP is None:
+                self.lines_read += 1
+                try:
+                    SNP = self.last_read_SNP = self.read_SNP(self.SNPs_FILE_o)
+                except (IndexError, EOFError):
+                    self.reached_end = True
+                    break
+            order = self.compare(SNP, key)
+            if order == 0:
+                self.window.append(SNP)
+            elif order > 0:
+                self.next_SNP = SNP
+                break
+        return self.window
+
+
+# hashes of GWAS SS files by their paths, with the size and modification time of the file when it was hashed
+GWAS_FILES_HASHES: Dict[str, Tuple[Dict[str, int], str]] = {}
+
+def get_GWASSS_hash(GWAS_FILE: str) -> str:
+    """Hash of the contents of the GWAS SS file (see `get_file_hash`), which is only computed again once the file changes"""
+    path = os.path.realpath(GWAS_FILE)
+    stat = get_file_stat(path)
+    if path not in GWAS_FILES_HASHES or GWAS_FILES_HASHES[path][0] != stat:
+        GWAS_FILES_HASHES[path] = (stat, get_file_hash(path))
+    return GWAS_FILES_HASHES[path][1]
+
+
+def get_checkpoint_run(FILES: List[str], **params) -> Dict[str, Any]:
+    """
+    What a checkpoint of loop_fix is valid for: the other files the GWAS SS file is fixed with (compared by size and modification time),
+    the parameters that change the output, and the build.
+    The contents of the GWAS SS file are added as "GWAS_FILE" (see `get_GWASSS_hash`) once a checkpoint is read or written,
+    so that the file isn't hashed by runs that don't get to a checkpoint
+    """
+    return {
+        "files": {FILE: get_file_stat(FILE) if file_exists(FILE) else None for FILE in FILES},
+        "params": params,
+        "build": get_build(),
+    }
+
+
+def read_checkpoint(CHECKPOINT_FILE: str, run: Dict[str, Any], OUTPUT_FILE: str) -> Union[Dict[str, Any], None]:
+    """
+    Reads the checkpoint of loop_fix, if there is one that is valid for the run (see `get_checkpoint_run`),
+    and the output file still has everything that was written before it. Otherwise returns None
+    """
+    if not file_exists(CHECKPOINT_FILE):
+        return None
+    with open(CHECKPOINT_FILE, 'r') as CHECKPOINT_FILE_o:
+        checkpoint = json.load(CHECKPOINT_FILE_o)
+    if checkpoint["run"] != json.loads(json.dumps(run)):
+        print(f"the checkpoint {CHECKPOINT_FILE} is for another input or parameters, so the file is fixed from the start")
+        return None
+    if not file_exists(OUTPUT_FILE) or os.path.getsize(OUTPUT_FILE) < checkpoint["output_offset"]:
+        print(f"the output file {OUTPUT_FILE} is shorter than at the checkpoint, so the file is fixed from the start")
+        return None
+    return checkpoint
+
+
+def write_checkpoint(CHECKPOINT_FILE: str, checkpoint: Dict[str, Any]):
+    """Writes the checkpoint of loop_fix into a temporary file first, so that an interrupted write doesn't break the previous one"""
+    with open(CHECKPOINT_FILE + '.tmp', 'w') as CHECKPOINT_FILE_o:
+        json.dump(checkpoint, CHECKPOINT_FILE_o)
+        CHECKPOINT_FILE_o.flush()
+        os.fsync(CHECKPOINT_FILE_o.fileno())
+    os.replace(CHECKPOINT_FILE + '.tmp', CHECKPOINT_FILE)
+
 
 ResolverName = Literal["ChrBP","rsID","OA","EA","EAF","beta","SE","pval"]
 resolvers_names =     ["ChrBP","rsID","OA","EA","EAF","beta","SE","pval"]
@@ -59,7 +264,17 @@ def loop_fix(
         "beta":  False,
         "SE":    True,
         "pval":  True,
-    }
+    },
+    ENGINE: Literal['rows', 'chunks'] = 'rows',
+    JOIN: Literal['merge', 'hash'] = 'merge',
+    PROCESSES: int = 1,
+    OUTPUT_REPORT_DIR: Union[str, None] = None,
+    OUTPUT_REPORT_PLOTS: bool = False,
+    PIPELINE: bool = False,
+    CHECKPOINTS: bool = False,
+    RESUME: bool = False,
+    COMPRESS_LEVEL: int = BGZF_DEFAULT_LEVEL,
+    RUN_INFO: Union[Dict[str, Any], None] = None,
 ):
     """
     Loop through the GWAS_FILE file once and try fixing some.
@@ -74,7 +289,8 @@ def loop_fix(
         directory with the report about the GWAS summary statistics file
     
     OUTPUT_GWAS_FILE : str
-        OUTPUT: filename for GWAS summary statistics with fixes
+        OUTPUT: filename for GWAS summary statistics with fixes.
+        If it ends with .gz or .bgz, the file is compressed as BGZF as it's written (see `BgzfWriter`)
     
     SNPs_FILE : str
         preprocessed dbSNP1 file, or "None"
@@ -89,7 +305,9 @@ def loop_fix(
         frequency database slug (e.g.: "GnomAD", "dbGaP_PopFreq", "TOMMO"), "None", or None
     
     GWAS_SORTING : None | 'rsID' | 'ChrBP'
-        (optional) Either "rsID" or "ChrBP". Denotes the sorting of the input GWAS SS file
+        (optional) Either "rsID" or "ChrBP". Denotes the sorting of the input GWAS SS file.
+        rsIDs are sorted by their numbers, see `sort_GWASSS_by_rsID`.
+        With the hash join, denotes by which key SNPs are looked up: "rsID" in dbSNP2, or "ChrBP" in dbSNP1
 
     ACTIVATED_RESOLVERS : Dict[str, bool]
         Dictionary that assigns boolean value to restorable columns to activate/deactivate restoration of a particular column.
@@ -98,8 +316,67 @@ def loop_fix(
         Keys are the same as the column keys used in json config for the file,
         except columns 'Chr' and 'BP' are always restored together, so 'ChrBP' should be used here instead.
         To deactivate liftover resolver, set CHAIN_FILE to None
+
+    ENGINE : 'rows' | 'chunks'
+        Either:
+         - "rows": each row is read, checked, and fixed one by one
+         - "chunks": rows are read in chunks, each chunk is checked at once (or the bitmask of issues from the report is used),
+           and each resolver only runs for rows that it may change. The output is exactly the same
+
+    JOIN : 'merge' | 'hash'
+        Either:
+         - "merge": the GWAS SS file is sorted by the key in GWAS_SORTING, and is merged with the dbSNP sorted by the same key
+         - "hash": the GWAS SS file may be in any order. Keys of rows that need a SNP are collected first,
+           then SNPs with these keys are read from the dbSNP in a single pass and kept in memory
+        Either way, if there are several SNPs with the key of a row, the row is restored from the first of them that has its alleles
+        (see `choose_SNP`), and the rows with the same key all choose from the same SNPs.
+        dbSNP2 prepared by an older version, which is sorted by rsIDs as strings, is always read as with "hash".
+        If there's the binary dbSNP next to the dbSNP file (see `write_dbSNP1_binary`), SNPs are looked up in it as with "hash",
+        but without reading them from the dbSNP
+
+    PROCESSES : int
+        Number of processes. With more than one, a GWAS SS file sorted by Chr and BP is split into parts by chromosomes,
+        which are merged with the indexed dbSNP1 (see `write_dbSNP1`) in parallel. The output is the same as with one process.
+        Otherwise, the file is fixed in this process
+
+    OUTPUT_REPORT_DIR : None | str
+        (optional) If set, entries of the output file are validated as they are written,
+        and the same report as with `validate_GWASSS_entries` (with the bitmask of issues) is saved into this dir,
+        so that the output file doesn't have to be validated again
+
+    OUTPUT_REPORT_PLOTS : bool
+        If True, plots are also saved into the OUTPUT_REPORT_DIR
+
+    PIPELINE : bool
+        If True, the GWAS SS file and the dbSNPs are read (and decompressed) ahead by background threads,
+        and the output file is written (and validated) by another thread, while rows are being fixed.
+        The output is the same
+
+    CHECKPOINTS : bool
+        If True, every few minutes (see CHECKPOINT_INTERVAL), once all rows read so far are written,
+        a checkpoint is saved into OUTPUT_GWAS_FILE + ".checkpoint.json". It has the line and the position in the GWAS SS file,
+        the size of the output file, the state of each dbSNP merged with the file (its SNPs at hand, and the offset
+        of the last seek in the indexed dbSNP1 and the number of lines read since), and the counters of the run.
+        The checkpoint is removed once the file is fixed. Checkpoints aren't saved when the file is fixed by parts (see PROCESSES).
+        The GWAS SS file is hashed for the first checkpoint, so a run that ends before it doesn't read the file once more
+
+    RESUME : bool
+        If True, and there's a checkpoint from a run with the same GWAS SS file (by its contents), dbSNPs, and parameters,
+        the run continues from it instead of starting over: the output before the checkpoint is kept,
+        and the GWAS SS file and the dbSNPs are read from where they were. The output is the same as of an uninterrupted run
+
+    COMPRESS_LEVEL : int
+        compression level of a .gz or .bgz output file
+
+    RUN_INFO : None | Dict[str, Any]
+        (optional) Is filled with information about the run that's needed to fix a file by parts, see `fix_part_of_GWASSS`
     """
 
+    if ENGINE not in ('rows', 'chunks'):
+        raise ValueError(f"unknown loop_fix engine: {ENGINE}")
+    if JOIN not in ('merge', 'hash'):
+        raise ValueError(f"unknown loop_fix join: {JOIN}")
+
     ACTIVATED_RESOLVERS = ActivatedResolvers(ACTIVATED_RESOLVERS)
 
     if FREQ_DATABASE_SLUG == 'None' or FREQ_DATABASE_SLUG is None:
@@ -111,8 +388,37 @@ def loop_fix(
         raise ValueError(f"passed gwas file doesn't exist at path: {GWAS_FILE}")
 
 
-    GWAS_FILE_o = open(GWAS_FILE, 'r')
-    OUTPUT_GWAS_FILE_o = open(OUTPUT_GWAS_FILE, 'w')
+    def open_GWASSS() -> Union[io.TextIOWrapper, ThreadedLineReader]:
+        return ThreadedLineReader(open(GWAS_FILE, 'rb')) if PIPELINE else open(GWAS_FILE, 'r')
+
+    def open_dbSNP(DB_FILE: str) -> Union[io.TextIOWrapper, ThreadedLineReader]:
+        DB_FILE_o_gz: io.RawIOBase = gzip.open(DB_FILE, 'r')  # type: ignore # GzipFile and RawIOBase _are_ in fact compatible
+        return ThreadedLineReader(DB_FILE_o_gz) if PIPELINE else io.TextIOWrapper(io.BufferedReader(DB_FILE_o_gz))
+
+    CHECKPOINT_FILE = OUTPUT_GWAS_FILE + CHECKPOINT_EXT
+    # the output file of the interrupted run is moved here, and what was written before the checkpoint is written again (see STEP #2)
+    RESUMED_OUTPUT_FILE = OUTPUT_GWAS_FILE + '.resumed'
+    checkpoint_run: Union[Dict[str, Any], None] = None
+    checkpoint: Union[Dict[str, Any], None] = None
+    if (CHECKPOINTS or RESUME) and RUN_INFO is None:
+        checkpoint_run = get_checkpoint_run(
+            [SNPs_FILE, SNPs_rsID_FILE, str(CHAIN_FILE)],
+            FREQ_DATABASE_SLUG=FREQ_DATABASE_SLUG, GWAS_SORTING=GWAS_SORTING, ACTIVATED_RESOLVERS=dict(ACTIVATED_RESOLVERS), JOIN=JOIN,
+        )
+        if RESUME and file_exists(CHECKPOINT_FILE):
+            checkpoint_run["GWAS_FILE"] = get_GWASSS_hash(GWAS_FILE)
+            checkpoint = read_checkpoint(CHECKPOINT_FILE, checkpoint_run, OUTPUT_GWAS_FILE)
+        if checkpoint is not None:
+            os.replace(OUTPUT_GWAS_FILE, RESUMED_OUTPUT_FILE)
+
+    GWAS_FILE_o = open_GWASSS()
+    OUTPUT_GWAS_FILE_o: Union[io.TextIOWrapper, ValidatingWriter, ThreadedWriter]
+    if OUTPUT_REPORT_DIR is not None:
+        OUTPUT_GWAS_FILE_o = ValidatingWriter(OUTPUT_GWAS_FILE, OUTPUT_REPORT_DIR, PLOTS=OUTPUT_REPORT_PLOTS, ISSUES_BITMASK=True, COMPRESS_LEVEL=COMPRESS_LEVEL)
+    else:
+        OUTPUT_GWAS_FILE_o = open_output(OUTPUT_GWAS_FILE, COMPRESS_LEVEL)
+    if PIPELINE:
+        OUTPUT_GWAS_FILE_o = ThreadedWriter(OUTPUT_GWAS_FILE_o)
     line_i=0
 
 
@@ -126,6 +432,17 @@ def loop_fix(
     #                                                 #
     # # # # # # # # # # # # # # # # # # # # # # # # # #
 
+    # number of rows kept in memory before they are written to the output file,
+    # which is also the largest number of rows for which SE, beta, or p-value are restored at once
+    OUTPUT_BUFFER_SIZE = 1 << 16
+
+    # number of rows in a chunk for the chunked engine
+    ROWS_PER_CHUNK = 100000
+
+    # the least number of rows in a part of the file fixed in parallel (except for the last part),
+    # so that a file with many small runs of chromosomes isn't split into too many parts
+    MIN_ROWS_PER_PART = 10000
+
     NUCLEOTIDES = ['a', 't', 'c', 'g']
     NO_NUCLEOTIDE = '-'
 
@@ -238,13 +555,36 @@ def loop_fix(
 
     ##### read/write #####
 
-    def get_next_line_in_GWASSS():
+    def read_next_line_in_GWASSS():
         line = GWAS_FILE_o.readline()
         if line == '': raise EOFError('attempt to read beyond the end of GWAS SS file')
-        return line.split("\t")
+        return line
+
+    def get_next_line_in_GWASSS():
+        return read_next_line_in_GWASSS().split("\t")
+
+    # rows that are yet to be written: either lines copied as is, or lists of fields
+    output_buffer: List[Union[str, List[str]]] = []
 
     def write_line_to_GWASSS(fields):
-        OUTPUT_GWAS_FILE_o.write("\t".join(fields))
+        output_buffer.append(fields)
+        if len(output_buffer) >= OUTPUT_BUFFER_SIZE:
+            flush_output_buffer()
+            save_checkpoint_if_due()
+
+    def copy_line_to_GWASSS(line):
+        output_buffer.append(line)
+        if len(output_buffer) >= OUTPUT_BUFFER_SIZE:
+            flush_output_buffer()
+            save_checkpoint_if_due()
+
+    def flush_output_buffer():
+        nonlocal rows_written
+        # buffered rows may still wait for their SE, beta, or p-value
+        restore_stats_batches()
+        OUTPUT_GWAS_FILE_o.write("".join(row if isinstance(row, str) else "\t".join(row) for row in output_buffer))
+        rows_written += len(output_buffer)
+        output_buffer.clear()
 
 
     def read_dbSNP1_data_row(FILE_o: io.TextIOWrapper):
@@ -257,7 +597,7 @@ def loop_fix(
             words[2], # rsID
             words[3], # REF
             words[4], # ALT
-            words[5], # freq
+            words[5 + DB1_freq_i] if DB1_freq_i is not None else '.', # freq
         )
 
     def read_dbSNP2_data_row(FILE_o: io.TextIOWrapper):
@@ -270,7 +610,7 @@ def loop_fix(
             words[0], # rsID
             words[3], # REF
             words[4], # ALT
-            words[5], # freq
+            words[5 + DB2_freq_i] if DB2_freq_i is not None else '.', # freq
         )
 
     def gt(val1, val2):
@@ -318,18 +658,23 @@ def loop_fix(
                     z = qnorm(1 - p/2),
     where:
         qnorm - inverse cumulative function for normal distribution
+
+    Each function accepts arrays of values for many rows, and returns an array (with nan where a value can't be computed)
     """
-    def get_StdErr_from_beta_pval(beta, p):
-        z = normal_z_score_two_tailed(p)
-        return abs(beta)/z if z != 0 else 'nan'
+    def get_StdErr_from_beta_pval(beta: np.ndarray, p: np.ndarray) -> np.ndarray:
+        z = normal_z_scores_two_tailed(p)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(z != 0, np.abs(beta)/z, np.nan)
 
-    def get_beta_from_StdErr_pval(se, p):
-        z = normal_z_score_two_tailed(p)
-        return se*z
+    def get_beta_from_StdErr_pval(se: np.ndarray, p: np.ndarray) -> np.ndarray:
+        z = normal_z_scores_two_tailed(p)
+        with np.errstate(invalid='ignore'):
+            return se*z
 
-    def get_pval_from_beta_StdErr(beta, se):
-        z = abs(beta)/se if se != 0 else 'nan'
-        return normal_p_area_two_tailed(z)
+    def get_pval_from_beta_StdErr(beta: np.ndarray, se: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(se != 0, np.abs(beta)/se, np.nan)
+        return normal_p_areas_two_tailed(z)
 
 
     ##### Field validators #####
@@ -507,6 +852,9 @@ def loop_fix(
         1. Tries to find the allele by exact match in REF or ALT;
         2. Checks if frequency entry from the given database slug is present;
         3. Takes the allele frequency for the corresponding allele
+
+        If the dbSNP has allele frequencies pre-parsed, `SNP_freq_field` has the frequencies of each allele (e.g. "0.9943,0.005747,0"),
+        and the frequency of the allele is taken by its index
         """
 
         """
@@ -524,7 +872,14 @@ def loop_fix(
             "GnomAD"
         """
 
-        if not is_valid_EAF(fields) and is_valid_EA(fields):
+        if not is_valid_EAF(fields) and is_valid_EA(fields) and not SNP_freq_field.startswith('freq='):
+            # allele frequencies from FREQ_DATABASE_SLUG, pre-parsed when the dbSNP was prepared (see `preparse_freqs`)
+            try:
+                fields[cols_i['EAF']] = SNP_freq_field.split(',')[(REF+','+ALT).split(',').index(fields[cols_i['EA']])]
+            except:
+                fields[cols_i['EAF']] = '.'
+
+        elif not is_valid_EAF(fields) and is_valid_EA(fields):
             try:
                 freqs = SNP_freq_field.replace('freq=','').replace('|',':').split(':') # ["1000Genomes", "0.9988,.,0.001198", "GnomAD", "0.9943,0.005747,."]
                 freqs = [f.lower() for f in freqs]  # ["1000genomes", "0.9988,.,0.001198", "gnomad", "0.9943,0.005747,."]
@@ -566,132 +921,369 @@ def loop_fix(
         from the build specified by the user to build38 (with 'chr' prefix)
         """
         if is_valid_Chr(fields) and is_valid_BP(fields):
-            chr_gwas = CHR_LIFTOVER[fields[cols_i['Chr']]]
-            bp_gwas  = int(float(fields[cols_i['BP']])) # using float allows sci notation string
-            try:
-                new_chr, new_bp, _ = converter[chr_gwas][bp_gwas][0]
-                fields[cols_i["Chr"]] = new_chr.replace('chr', '')
-                fields[cols_i["BP"]] = str(new_bp)
-            # if it can't liftover
-            except:
-                fields[cols_i["Chr"]] = '.'
-                fields[cols_i["BP"]] = '.'
+            if not lift_over_ChrBP(fields, converter):
                 nonlocal ChrBP_lost_because_of_liftover
                 ChrBP_lost_because_of_liftover += 1
 
+    def lift_over_ChrBP(fields, converter: ChainIndex) -> bool:
+        """Lifts over valid Chr and BP in the row. Returns False if they can't be lifted over"""
+        chr_gwas = CHR_LIFTOVER[fields[cols_i['Chr']]]
+        bp_gwas  = int(float(fields[cols_i['BP']])) # using float allows sci notation string
+        new_locus = converter.lift_over_one(chr_gwas, bp_gwas)
+        return set_lifted_over_ChrBP(fields, new_locus[0] if new_locus else None, new_locus[1] if new_locus else 0)
+
+    def set_lifted_over_ChrBP(fields, new_chr: Union[str, None], new_bp: int) -> bool:
+        if new_chr is not None:
+            fields[cols_i["Chr"]] = new_chr.replace('chr', '')
+            fields[cols_i["BP"]] = str(new_bp)
+            return True
+        # if it can't liftover
+        else:
+            fields[cols_i["Chr"]] = '.'
+            fields[cols_i["BP"]] = '.'
+            return False
+
 
-    def resolve_rsID(fields, SNPs_FILE_o):
+    def resolve_rsID(fields, SNPs, find_SNP):
         """
-        Loops through the SNPs file entries until it finds the current SNP in GWAS SS file
+        Finds the current SNP in GWAS SS file in the SNPs file
         Current SNP is defined by Chr and BP from the passed `fields`, which is one row of GWAS SS
-        Therefore, rsID is restored by Chr and BP, which won't always work for biallelic sites
+        Therefore, rsID is restored by Chr and BP. At a multi-allelic site, the SNP is chosen by the alleles of the row (see `choose_SNP`)
 
-        Assumes given GWAS SS file is sorted by Chr and BP, in the same way SNPs file is.
-
-        `SNPs_FILE_o`
-            opened SNPs file object
+        `SNPs`, `find_SNP`
+            either the cursor of the SNPs file (see `SNPsCursor`) and `find_SNP_by_ChrBP`,
+            which assumes given GWAS SS file is sorted by Chr and BP, in the same way SNPs file is;
+            or SNPs by their loci (see `read_SNPs_by_ChrBP`) and `look_up_SNP_by_ChrBP`
         """
-        if is_valid_Chr(fields) and is_valid_BP(fields) and not all([
+        if needs_SNP_by_ChrBP(fields):
+            find_SNP(fields, SNPs, is_valid_rsID(fields))
+
+    def needs_SNP_by_ChrBP(fields) -> bool:
+        return is_valid_Chr(fields) and is_valid_BP(fields) and not all([
             is_valid_rsID(fields),
             is_valid_OA(fields), is_valid_EA(fields),
             is_valid_EAF(fields),
-        ]):
-            try:
-                chr_gwas = fields[cols_i['Chr']]
-                bp_gwas  = int(float(fields[cols_i['BP']]))
+        ])
 
-                while True:
-                    chr_snps, bp_snps, rsid, ref, alt, freq = read_dbSNP1_data_row(SNPs_FILE_o)
-                    # SNPs_FILE_line_i += 1
+    def choose_SNP(fields, SNPs: Sequence[DBSNP_ROW]) -> Union[DBSNP_ROW, None]:
+        """
+        Of the SNPs with the key of the row (e.g. at a multi-allelic site, or with an rsID at several loci),
+        chooses the first one that has the alleles of the row among its REF and ALT.
+        If there's no such SNP, or the row has no valid alleles, chooses the first SNP
+        """
+        if len(SNPs) > 1:
+            alleles = [
+                fields[cols_i[col]] for col, is_valid in (('EA', is_valid_EA), ('OA', is_valid_OA))
+                    if is_valid(fields) and fields[cols_i[col]] != NO_NUCLEOTIDE
+            ]
+            if alleles:
+                for SNP in SNPs:
+                    SNP_alleles = (SNP[3] + ',' + SNP[4]).split(',')
+                    if all(allele in SNP_alleles for allele in alleles):
+                        return SNP
+        return SNPs[0] if SNPs else None
+
+    # the lowest order of chromosomes looked up in dbSNP1, and the highest order of chromosomes read from it.
+    # Unknown chromosomes go after the known ones, and the end of the file goes after all of them. See `fix_by_parts`
+    DB1_min_looked_up_chr_order = sys.maxsize
+    DB1_max_read_chr_order = 0
+
+    def get_known_chr_order(chr: str) -> int:
+        chr_order = CHR_ORDER[chr]
+        return chr_order if isinstance(chr_order, int) else sys.maxsize
+
+    def compare_SNP_by_ChrBP(SNP: DBSNP_ROW, locus: Tuple[Union[int, str], int]) -> int:
+        """Whether the SNP goes before (-1), at (0), or after (1) the locus (chromosome's order and BP) in dbSNP1"""
+        chr_order, bp = locus
+        chr_order_snps = CHR_ORDER[SNP[0]]
+        if chr_order_snps == chr_order:
+            return (SNP[1] > bp) - (SNP[1] < bp) # type: ignore # BP is an int in dbSNP1
+        return 1 if gt(chr_order_snps, chr_order) else -1
+
+    def compare_SNP_by_rsID(SNP: DBSNP_ROW, rsid: int) -> int:
+        """Whether the SNP goes before (-1), at (0), or after (1) the rsID (its number, see `parse_rsID`) in dbSNP2"""
+        SNP_rsid = parse_rsID(SNP[2])
+        return (SNP_rsid > rsid) - (SNP_rsid < rsid)
+
+    def find_SNP_by_ChrBP(fields, SNPs: SNPsCursor, valid_rsID: bool):
+        """
+        Moves the cursor of the SNPs file to the SNPs with Chr and BP of the row, and restores the row from one of them.
+        `valid_rsID` tells whether the rsID in the row is valid
+        """
+        nonlocal DB1_min_looked_up_chr_order, DB1_max_read_chr_order
+        try:
+            chr_gwas = fields[cols_i['Chr']]
+            bp_gwas  = int(float(fields[cols_i['BP']]))
+            locus = (CHR_ORDER[chr_gwas], bp_gwas)
+            DB1_min_looked_up_chr_order = min(DB1_min_looked_up_chr_order, get_known_chr_order(chr_gwas))
+
+            if DB1_index is not None and locus != SNPs.key:
+                # skip the blocks of SNPs that all go before the locus, instead of reading them
+                offset = find_in_dbSNP1_index(DB1_index, locus[0], bp_gwas)
+                if offset is not None and offset >> 16 > SNPs.SNPs_FILE_o.block_offset:
+                    SNPs.seek(offset)
+
+            restore_from_SNP_by_ChrBP(fields, choose_SNP(fields, SNPs.find(locus)), valid_rsID)
+
+        except Exception as e:
+            if isinstance(e, IndexError):
+                # the row doesn't have some of the columns, and is left partially restored
+                pass
+            else:
+                print(f'An error occured while looping through the SNPs file (see below)')
+                raise e
+
+        if SNPs.reached_end:
+            DB1_max_read_chr_order = sys.maxsize
+        elif SNPs.last_read_SNP is not None:
+            DB1_max_read_chr_order = max(DB1_max_read_chr_order, get_known_chr_order(SNPs.last_read_SNP[0]))
+
+    def look_up_SNP_by_ChrBP(fields, SNPs_by_ChrBP: Union[SNPsByKey, BinaryDBSNP], valid_rsID: bool):
+        """The same as `find_SNP_by_ChrBP`, but takes the SNPs from the SNPs by their loci"""
+        try:
+            restore_from_SNP_by_ChrBP(fields, choose_SNP(fields, SNPs_by_ChrBP.get_all(get_locus(fields))), valid_rsID)
+        except IndexError:
+            # the row doesn't have some of the columns, and is left partially restored, as with `find_SNP_by_ChrBP`
+            pass
 
-                    if CHR_ORDER[chr_gwas] == CHR_ORDER[chr_snps]:
-                        if bp_snps < bp_gwas:
-                            continue
-                        elif bp_gwas == bp_snps:
-                            fields[cols_i['rsID']] = rsid
-                            resolve_allele(fields, ref, alt)
-                            resolve_EAF(fields, ref, alt, freq)
-                            break # after this a new line of GWAS SS should be read and index incremented
-                        else: #bp_snps > bp_gwas:
-                            if not is_valid_rsID(fields):
-                                fields[cols_i['rsID']] = '.'
-                            break # after this a new line of GWAS SS should be read and index incremented
-                    elif gt(CHR_ORDER[chr_snps], CHR_ORDER[chr_gwas]):
-                        if not is_valid_rsID(fields):
-                            fields[cols_i['rsID']] = '.'
-                        break # after this a new line of GWAS SS should be read and index incremented
-
-            except Exception as e:
-                if isinstance(e, IndexError) or isinstance(e, EOFError):
-                    # it reached the end of an either file
-                    pass
-                else:
-                    # print(f'An error occured on line {SNPs_FILE_line_i} of the SNPs file (see below)')
-                    print(f'An error occured while looping through the SNPs file (see below)')
-                    raise e
+    def restore_from_SNP_by_ChrBP(fields, SNP: Union[DBSNP_ROW, None], valid_rsID: bool):
+        """Restores the row from the SNP at its Chr and BP, or, if there's no such SNP, marks an invalid rsID as missing"""
+        if SNP is not None:
+            _, _, rsid, ref, alt, freq = SNP
+            fields[cols_i['rsID']] = rsid
+            resolve_allele(fields, ref, alt)
+            resolve_EAF(fields, ref, alt, freq)
+        elif not valid_rsID:
+            fields[cols_i['rsID']] = '.'
 
 
-    def resolve_ChrBP(fields, SNPs_rsID_FILE_o):
+    def resolve_ChrBP(fields, SNPs, find_SNP):
         """
-        Loops through the SNPs file entries until it finds the current locus
-        Current locus is defined by rsID from the passed `fields`, which is one row of GWAS SS
-
-        Assumes given GWAS SS file is sorted by rsID, in the same way this processed SNPs file is.
-
-        `SNPs_rsID_FILE_o`
-            opened SNPs file object
+        Finds the current locus in the SNPs file
+        Current locus is defined by rsID from the passed `fields`, which is one row of GWAS SS.
+        If the rsID is at several loci, the SNP is chosen by the alleles of the row (see `choose_SNP`)
+
+        `SNPs`, `find_SNP`
+            either the cursor of the SNPs file (see `SNPsCursor`) and `find_SNP_by_rsID`,
+            which assumes given GWAS SS file is sorted by rsID, in the same way this processed SNPs file is;
+            or SNPs by their rsIDs (see `read_SNPs_by_rsID`) and `look_up_SNP_by_rsID`
         """
-        if is_valid_rsID(fields) and not all([
+        if needs_SNP_by_rsID(fields):
+            find_SNP(fields, SNPs, is_valid_Chr(fields) and is_valid_BP(fields))
+
+    def needs_SNP_by_rsID(fields) -> bool:
+        return is_valid_rsID(fields) and not all([
             is_valid_Chr(fields), is_valid_BP(fields),
             is_valid_OA(fields), is_valid_EA(fields),
             is_valid_EAF(fields),
-        ]):
-            try:
-                rsID_gwas = fields[cols_i['rsID']]
-
-                while True:
-                    chr_snps, bp_snps, rsid, ref, alt, freq = read_dbSNP2_data_row(SNPs_rsID_FILE_o)
-                    # SNPs_FILE_line_i += 1
-
-                    if rsid < rsID_gwas:
-                        continue
-                    elif rsID_gwas == rsid:
-                        fields[cols_i['Chr']] = chr_snps
-                        fields[cols_i['BP']] = bp_snps
-                        resolve_allele(fields, ref, alt)
-                        resolve_EAF(fields, ref, alt, freq)
-                        break # after this a new line of GWAS SS should be read and index incremented
-                    else: #rsid > bp_gwas:
-                        if not is_valid_Chr(fields) or not is_valid_BP(fields):
-                            fields[cols_i['Chr']] = '.'
-                            fields[cols_i['BP']] = '.'
-                        break # after this a new line of GWAS SS should be read and index incremented
-
-            except Exception as e:
-                if isinstance(e, IndexError) or isinstance(e, EOFError):
-                    # it reached the end of an either file
-                    pass
-                else:
-                    # print(f'An error occured on line {SNPs_FILE_line_i} of the SNPs file (see below)')
-                    print(f'An error occured while looping through the SNPs file (see below)')
-                    raise e
+        ])
+
+    def find_SNP_by_rsID(fields, SNPs: SNPsCursor, valid_ChrBP: bool):
+        """
+        Moves the cursor of the SNPs file to the SNPs with rsID of the row, and restores the row from one of them.
+        `valid_ChrBP` tells whether both Chr and BP in the row are valid
+        """
+        try:
+            rsid = get_rsID(fields)
+            # an rsID without a number (e.g. with leading zeros) isn't in dbSNP2
+            restore_from_SNP_by_rsID(fields, choose_SNP(fields, SNPs.find(rsid) if rsid else ()), valid_ChrBP)
+        except Exception as e:
+            if isinstance(e, IndexError):
+                # the row doesn't have some of the columns, and is left partially restored
+                pass
+            else:
+                print(f'An error occured while looping through the SNPs file (see below)')
+                raise e
+
+    def look_up_SNP_by_rsID(fields, SNPs_by_rsID: Union[SNPsByKey, BinaryDBSNP], valid_ChrBP: bool):
+        """The same as `find_SNP_by_rsID`, but takes the SNPs from the SNPs by their rsIDs"""
+        try:
+            restore_from_SNP_by_rsID(fields, choose_SNP(fields, SNPs_by_rsID.get_all(get_rsID(fields))), valid_ChrBP)
+        except IndexError:
+            # the row doesn't have some of the columns, and is left partially restored, as with `find_SNP_by_rsID`
+            pass
+
+    def restore_from_SNP_by_rsID(fields, SNP: Union[DBSNP_ROW, None], valid_ChrBP: bool):
+        """Restores the row from the SNP with its rsID, or, if there's no such SNP, marks invalid Chr and BP as missing"""
+        if SNP is not None:
+            chr_snps, bp_snps, _, ref, alt, freq = SNP
+            fields[cols_i['Chr']] = chr_snps
+            fields[cols_i['BP']] = bp_snps
+            resolve_allele(fields, ref, alt)
+            resolve_EAF(fields, ref, alt, freq)
+        elif not valid_ChrBP:
+            fields[cols_i['Chr']] = '.'
+            fields[cols_i['BP']] = '.'
+
+
+    ##### Batch resolvers #####
+    """
+    SE, beta, and p-value resolvers don't restore the value right away.
+    They add the row (which is still in the output buffer) to the batch for the column,
+    and the values for the whole batch are computed at once before the buffer is written.
+
+    Each of the three resolvers requires the other two values to be valid,
+    so a row gets into at most one of the batches.
+    """
+
+    # column -> (rows, values of the first argument, values of the second argument)
+    stats_batches: Dict[str, Tuple[List[List[str]], List[float], List[float]]] = {
+        "SE":   ([], [], []),
+        "beta": ([], [], []),
+        "pval": ([], [], []),
+    }
+    stats_batches_functions = {
+        "SE":   get_StdErr_from_beta_pval,
+        "beta": get_beta_from_StdErr_pval,
+        "pval": get_pval_from_beta_StdErr,
+    }
+
+    def add_to_stats_batch(col: str, fields, arg1: float, arg2: float):
+        if cols_i[col] >= len(fields):
+            # a row without the column fails right away, as it would if the value was restored in place
+            raise IndexError(f"the row doesn't have the {col} column")
+        rows, args1, args2 = stats_batches[col]
+        rows.append(fields)
+        args1.append(arg1)
+        args2.append(arg2)
+
+    def restore_stats_batches():
+        for col, (rows, args1, args2) in stats_batches.items():
+            if not rows:
+                continue
+            values = stats_batches_functions[col](np.array(args1), np.array(args2))
+            for fields, value in zip(rows, values.tolist()):
+                fields[cols_i[col]] = str(value)
+            rows.clear()
+            args1.clear()
+            args2.clear()
 
 
     def resolve_SE(fields):
         if not is_valid_SE(fields) and is_valid_beta(fields) and is_valid_pval(fields):
-            fields[cols_i["SE"]] = str(get_StdErr_from_beta_pval(
-                float(fields[cols_i["beta"]]), float(fields[cols_i["pval"]])
-            ))
+            add_to_stats_batch("SE", fields, float(fields[cols_i["beta"]]), float(fields[cols_i["pval"]]))
     def resolve_beta(fields):
         if not is_valid_beta(fields) and is_valid_SE(fields) and is_valid_pval(fields):
-            fields[cols_i["beta"]] = str(get_beta_from_StdErr_pval(
-                float(fields[cols_i["SE"]]), float(fields[cols_i["pval"]])
-            ))
+            add_to_stats_batch("beta", fields, float(fields[cols_i["SE"]]), float(fields[cols_i["pval"]]))
     def resolve_pval(fields):
         if not is_valid_pval(fields) and is_valid_beta(fields) and is_valid_SE(fields):
-            fields[cols_i["pval"]] = str(get_pval_from_beta_StdErr(
-                float(fields[cols_i["beta"]]), float(fields[cols_i["SE"]])
-            ))
+            add_to_stats_batch("pval", fields, float(fields[cols_i["beta"]]), float(fields[cols_i["SE"]]))
+
+
+    ##### CHUNK RESOLVERS #####
+    """
+    These void functions accept a chunk of rows (see `ChunkOfRows`) and may mutate rows in it.
+
+    Each of them does the same as the corresponding resolver does for each row of the chunk,
+    but selects rows to resolve with the masks of valid values, instead of validating fields of every row.
+    Malformed rows are passed to the resolver itself
+    """
+
+    def resolve_rows_in_chunk(chunk: ChunkOfRows, mask: np.ndarray, resolve_row):
+        """Calls `resolve_row(i)` for each row in the mask, and for each malformed row"""
+        for i in chunk.rows_to_resolve(mask):
+            try:
+                resolve_row(i)
+            except (IndexError, EOFError):
+                # the row engine stops at such a row
+                chunk.end = i
+                return
+
+    def resolve_build38_in_chunk(chunk: ChunkOfRows, converter: ChainIndex):
+        valid = chunk.valid
+        # well-formed rows with valid Chr and BP are lifted over at once
+        rows = [i for i in np.flatnonzero(valid["Chr"] & valid["BP"] & ~chunk.malformed).tolist() if i < chunk.end]
+        rows_fields = [chunk.get_fields(i) for i in rows]
+        new_chrs, new_bps = converter.lift_over(
+            [CHR_LIFTOVER[fields[cols_i['Chr']]] for fields in rows_fields],
+            [int(float(fields[cols_i['BP']])) for fields in rows_fields], # using float allows sci notation string
+        )
+        for i, fields, new_chr, new_bp in zip(rows, rows_fields, new_chrs, new_bps.tolist()):
+            if not set_lifted_over_ChrBP(fields, new_chr, new_bp):
+                # counted only when the chunk is written, since the row engine may stop before this row
+                chunk.lost_in_liftover.append(i)
+
+        def resolve_row(i):
+            fields = chunk.get_fields(i)
+            if not (is_valid_Chr(fields) and is_valid_BP(fields)):
+                return
+            if not lift_over_ChrBP(fields, converter):
+                chunk.lost_in_liftover.append(i)
+        # only malformed rows are left
+        resolve_rows_in_chunk(chunk, np.zeros(len(chunk.lines), dtype=bool), resolve_row)
+
+    def resolve_rsID_in_chunk(chunk: ChunkOfRows, SNPs, find_SNP):
+        valid = chunk.valid
+        def resolve_row(i):
+            if chunk.malformed[i]:
+                resolve_rsID(chunk.get_fields(i), SNPs, find_SNP)
+            else:
+                find_SNP(chunk.get_fields(i), SNPs, bool(valid["rsID"][i]))
+        resolve_rows_in_chunk(chunk, needs_SNP_by_ChrBP_mask(valid), resolve_row)
+
+    def resolve_ChrBP_in_chunk(chunk: ChunkOfRows, SNPs, find_SNP):
+        valid = chunk.valid
+        def resolve_row(i):
+            if chunk.malformed[i]:
+                resolve_ChrBP(chunk.get_fields(i), SNPs, find_SNP)
+            else:
+                find_SNP(chunk.get_fields(i), SNPs, bool(valid["Chr"][i] and valid["BP"][i]))
+        resolve_rows_in_chunk(chunk, needs_SNP_by_rsID_mask(valid), resolve_row)
+
+    def needs_SNP_by_ChrBP_mask(valid: Dict[str, np.ndarray]) -> np.ndarray:
+        """The same as `needs_SNP_by_ChrBP` for well-formed rows"""
+        return valid["Chr"] & valid["BP"] & ~(valid["rsID"] & valid["OA"] & valid["EA"] & valid["EAF"])
+
+    def needs_SNP_by_rsID_mask(valid: Dict[str, np.ndarray]) -> np.ndarray:
+        """The same as `needs_SNP_by_rsID` for well-formed rows"""
+        return valid["rsID"] & ~(valid["Chr"] & valid["BP"] & valid["OA"] & valid["EA"] & valid["EAF"])
+
+    def stats_resolver_in_chunk(col: str, col1: str, col2: str, resolver):
+        """Makes the chunk resolver for the column `col` that is restored from columns `col1` and `col2`"""
+        def resolve_in_chunk(chunk: ChunkOfRows):
+            valid = chunk.valid
+            def resolve_row(i):
+                if chunk.malformed[i]:
+                    resolver(chunk.get_fields(i))
+                else:
+                    fields = chunk.get_fields(i)
+                    add_to_stats_batch(col, fields, float(fields[cols_i[col1]]), float(fields[cols_i[col2]]))
+            resolve_rows_in_chunk(chunk, ~valid[col] & valid[col1] & valid[col2], resolve_row)
+        return resolve_in_chunk
+
+    resolve_SE_in_chunk   = stats_resolver_in_chunk("SE",   "beta", "pval", resolve_SE)
+    resolve_beta_in_chunk = stats_resolver_in_chunk("beta", "SE",   "pval", resolve_beta)
+    resolve_pval_in_chunk = stats_resolver_in_chunk("pval", "beta", "SE",   resolve_pval)
+
+
+    # issue of each of the columns in the bitmask of issues
+    COLUMNS_ISSUES = {
+        "rsID": INVALID_RSID,
+        "Chr":  INVALID_CHR,
+        "BP":   INVALID_BP,
+        "EA":   INVALID_EA,
+        "OA":   INVALID_OA,
+        "EAF":  INVALID_EAF,
+        "SE":   INVALID_SE,
+        "beta": INVALID_ES,
+    }
+
+    def read_chunk_of_rows(lines, chunk_bitmask: Union[np.ndarray, None]) -> ChunkOfRows:
+        """
+        Makes a chunk of rows with masks of valid columns.
+
+        Masks are taken from the bitmask of issues made with `check_rows`, which is computed for the chunk unless given.
+        For well-formed rows, the bitmask includes issues from `check_row_strictly`,
+        which makes it agree with the field validators of loop_fix
+        """
+        if chunk_bitmask is None:
+            _, _, _, chunk_bitmask = check_rows("".join(lines).encode('utf-8'), cols_i, "\t", with_bitmask=True)
+        chunk_bitmask = np.asarray(chunk_bitmask)
+        chunk_issues = get_issues_from_bitmask(chunk_bitmask)
+        malformed = chunk_issues[:, INVALID_ROW]
+        valid = {col: ~chunk_issues[:, issue] & ~malformed for col, issue in COLUMNS_ISSUES.items()}
+        valid["pval"] = ((chunk_bitmask >> INVALID_PVAL_BIT) & 1 == 0) & ~malformed
+        return ChunkOfRows(lines, valid, malformed)
 
 
     ##### FULL RESOLVER #####
@@ -705,11 +1297,252 @@ def loop_fix(
     """
     resolvers = [] # list of functions
     resolvers_args = [] # list of lists of arguments for these functions
+    chunk_resolvers = [] # the same resolvers for the chunked engine
+    # for each resolver, a bitmask of issues (see `get_issues_bitmask` in validation_utils) that it may resolve,
+    # or None if it has to run for every row
+    resolvers_issues = []
 
     def run_all(resolvers, fields, args):
         for res_i in range(len(resolvers)):
             resolvers[res_i](fields, *args[res_i])
 
+    def issues_bits(*issues):
+        # rows with missing columns may have any issue
+        return sum(1 << issue for issue in issues) | (1 << INVALID_ROW)
+
+    # the same few combinations of issues repeat throughout the file
+    resolvers_for_issues_cache = {}
+    def resolvers_for_issues(row_issues: int):
+        """Selects resolvers (and their arguments) that may change a row with the given bitmask of issues"""
+        if row_issues not in resolvers_for_issues_cache:
+            res_is = [
+                res_i for res_i in range(len(resolvers))
+                    if resolvers_issues[res_i] is None or row_issues & resolvers_issues[res_i]
+            ]
+            resolvers_for_issues_cache[row_issues] = (
+                [resolvers[res_i] for res_i in res_is],
+                [resolvers_args[res_i] for res_i in res_is],
+            )
+        return resolvers_for_issues_cache[row_issues]
+
+
+    ##### FIXING BY PARTS #####
+
+    def split_into_parts() -> Tuple[int, List[Tuple[int, int]]]:
+        """
+        Splits rows of the GWAS SS file into byte ranges of whole lines, between rows on different chromosomes.
+        Returns the end of the header, and the ranges.
+        If rows of a known chromosome aren't all together, the file isn't sorted by Chr, and all rows make one range
+        """
+        with open(GWAS_FILE, 'rb') as FILE_o:
+            header = FILE_o.readline()
+            # the header may end with "\r" as well, the same way as it's read in the text mode
+            cr_i = header.find(b'\r')
+            header_end = len(header) if cr_i == -1 else cr_i + 1 + (header[cr_i+1:cr_i+2] == b'\n')
+            FILE_o.seek(header_end)
+
+            ranges: List[Tuple[int, int]] = []
+            chr_orders: Dict[bytes, Any] = {}
+            seen_chr_orders = set()
+            start = pos = header_end
+            rows_in_part = 0
+            prev_chr_order = None
+            for line in FILE_o:
+                chr_field = line.split(b'\t', 1)[0]
+                if chr_field not in chr_orders:
+                    chr_orders[chr_field] = CHR_ORDER[chr_field.decode('utf-8', 'replace')]
+                chr_order = chr_orders[chr_field]
+                if chr_order != prev_chr_order:
+                    if isinstance(chr_order, int) and chr_order in seen_chr_orders:
+                        return header_end, [(header_end, FILE_o.seek(0, os.SEEK_END))]
+                    seen_chr_orders.add(chr_order)
+                    if rows_in_part >= MIN_ROWS_PER_PART:
+                        ranges.append((start, pos))
+                        start = pos
+                        rows_in_part = 0
+                prev_chr_order = chr_order
+                pos += len(line)
+                rows_in_part += 1
+            if pos > start:
+                ranges.append((start, pos))
+        return header_end, ranges
+
+    def fix_by_parts():
+        """
+        Fixes parts of the GWAS SS file (see `split_into_parts`) in parallel, and concatenates them into the output file.
+
+        Each part is merged with dbSNP1 from its beginning, and the index of dbSNP1 lets it skip right to the chromosome of the part.
+        This is the same as in the serial run, unless the previous parts read dbSNP1 up to a chromosome the part looks up
+        (e.g. when a SNP after the last one of its chromosome in dbSNP1 is looked up).
+        Then the part is fixed once more, together with the previous parts since the first one that read dbSNP1 that far.
+
+        The serial run stops at a row that can't be fixed, so the parts after the part with such a row are dropped
+        """
+        header_end, ranges = split_into_parts()
+        loop_fix_kwargs = dict(
+            REPORT_DIR=REPORT_DIR, SNPs_FILE=SNPs_FILE, SNPs_rsID_FILE=SNPs_rsID_FILE, CHAIN_FILE=None,
+            FREQ_DATABASE_SLUG=FREQ_DATABASE_SLUG, GWAS_SORTING=GWAS_SORTING, ACTIVATED_RESOLVERS=ACTIVATED_RESOLVERS,
+            ENGINE=ENGINE, JOIN=JOIN, PIPELINE=PIPELINE,
+        )
+        def get_part_files(part_i: int) -> Tuple[str, str]:
+            return f"{OUTPUT_GWAS_FILE}.part{part_i}.in.tsv", f"{OUTPUT_GWAS_FILE}.part{part_i}.tsv"
+
+        # fixed parts, or groups of consecutive parts fixed together: (start, end, output file, run info)
+        fixed_parts: List[Tuple[int, int, str, Dict[str, Any]]] = []
+        with multiprocessing.Pool(PROCESSES) as pool:
+            results = [
+                pool.apply_async(fix_part_of_GWASSS, (GWAS_FILE, header_end, start, end, *get_part_files(part_i), loop_fix_kwargs))
+                    for part_i, (start, end) in enumerate(ranges)
+            ]
+            pbar = tqdm(total=len(ranges), desc='  loop-fix by parts ')
+            for part_i, ((start, end), result) in enumerate(zip(ranges, results)):
+                run_info = result.get()
+                first_i = next((
+                    i for i, (_, _, _, prev_run_info) in enumerate(fixed_parts)
+                        if prev_run_info["DB1_max_read_chr_order"] >= run_info["DB1_min_looked_up_chr_order"]
+                ), None)
+                if first_i is not None:
+                    start = fixed_parts[first_i][0]
+                    for _, _, prev_output, _ in fixed_parts[first_i:]:
+                        os.remove(prev_output)
+                    del fixed_parts[first_i:]
+                    run_info = fix_part_of_GWASSS(GWAS_FILE, header_end, start, end, *get_part_files(part_i), loop_fix_kwargs)
+                fixed_parts.append((start, end, get_part_files(part_i)[1], run_info))
+                pbar.update(1)
+            pbar.close()
+
+        stopped_early = False
+        for _, _, output, run_info in fixed_parts:
+            if not stopped_early:
+                with open(output, 'r') as PART_FILE_o:
+                    PART_FILE_o.readline() # header
+                    shutil.copyfileobj(PART_FILE_o, OUTPUT_GWAS_FILE_o)
+                stopped_early = run_info["stopped_early"]
+            os.remove(output)
+
+
+    ##### HASH JOIN #####
+    """
+    Instead of merging the sorted GWAS SS file with a dbSNP,
+    SNPs needed by rows of the file are read from the dbSNP in a single pass, and are looked up by their keys.
+    Keys are loci (Chr order and BP) for dbSNP1, and rsIDs for dbSNP2
+    """
+
+    def get_locus(fields) -> Tuple[int, int]:
+        return CHR_ORDER[fields[cols_i['Chr']]], int(float(fields[cols_i['BP']]))
+
+    def get_rsID(fields) -> int:
+        return parse_rsID(fields[cols_i['rsID']])
+
+    def collect_keys_of_GWASSS(needs_SNP, needs_SNP_mask, get_key) -> set:
+        """
+        Collects keys of the rows of the GWAS SS file that need a SNP,
+        going through the file in chunks the same way the chunked engine does
+        """
+        keys = set()
+        with open_GWASSS() as FILE_o:
+            FILE_o.readline() # header
+            # rows before the checkpoint are already fixed
+            chunk_start = checkpoint["GWAS_line"] if checkpoint is not None else 0
+            for _ in range(chunk_start):
+                FILE_o.readline()
+            while True:
+                lines = list(islice(FILE_o, ROWS_PER_CHUNK))
+                if not lines:
+                    break
+                chunk = read_chunk_of_rows(
+                    lines,
+                    issues_bitmask[chunk_start : chunk_start + len(lines)] if issues_bitmask is not None else None,
+                )
+                for i in chunk.rows_to_resolve(needs_SNP_mask(chunk.valid)):
+                    fields = chunk.get_fields(i)
+                    if not chunk.malformed[i] or needs_SNP(fields):
+                        keys.add(get_key(fields))
+                chunk_start += len(lines)
+        return keys
+
+    def read_SNPs_by_ChrBP(loci: set) -> SNPsByKey:
+        """
+        Reads all SNPs at each of the loci from dbSNP1.
+        SNPs at a locus go one after another, so it stops after the SNPs at the last of the loci
+        """
+        SNPs_by_ChrBP = SNPsByKey()
+        with open_dbSNP(SNPs_FILE) as SNPs_FILE_o:
+            for line in SNPs_FILE_o:
+                words = line.split()
+                if len(words) < 6:
+                    continue
+                locus = (CHR_ORDER[words[0]], int(words[1]))
+                if locus in loci:
+                    SNPs_by_ChrBP.setdefault(locus, []).append(
+                        (words[0], int(words[1]), words[2], words[3], words[4], words[5 + DB1_freq_i] if DB1_freq_i is not None else '.')
+                    )
+                elif len(SNPs_by_ChrBP) == len(loci):
+                    break
+        return SNPs_by_ChrBP
+
+    def read_SNPs_by_rsID(rsids: set) -> SNPsByKey:
+        """
+        Reads all SNPs with each of the rsIDs (their numbers, see `parse_rsID`) from dbSNP2.
+        SNPs with an rsID go one after another, so it stops after the SNPs with the last of the rsIDs
+        """
+        # rows without a number in rsID aren't looked up, and rsIDs of SNPs are matched as strings, which is faster than parsing each of them
+        rsids.discard(0)
+        rsIDs = {f"rs{rsid}" for rsid in rsids}
+        SNPs_by_rsID = SNPsByKey()
+        with open_dbSNP(SNPs_rsID_FILE) as SNPs_rsID_FILE_o:
+            for line in SNPs_rsID_FILE_o:
+                words = line.split()
+                if len(words) < 6:
+                    continue
+                if words[0] in rsIDs:
+                    SNPs_by_rsID.setdefault(int(words[0][2:]), []).append(
+                        (words[1], words[2], words[0], words[3], words[4], words[5 + DB2_freq_i] if DB2_freq_i is not None else '.')
+                    )
+                elif len(SNPs_by_rsID) == len(rsIDs):
+                    break
+        return SNPs_by_rsID
+
+
+    ##### CHECKPOINTS #####
+    """
+    A checkpoint is saved once all rows read so far are written to the output file, see CHECKPOINTS
+    """
+
+    # cursors of the dbSNPs merged with the file, in the order of the resolvers
+    cursors: List[SNPsCursor] = []
+    # number of rows (after the header) written to the output file
+    rows_written = 0
+    last_checkpoint_time = time.time()
+
+    def get_GWASSS_offset() -> Union[int, None]:
+        """Position in the GWAS SS file, unless the file can't tell it: when it's iterated over by lines, or read by a thread"""
+        try:
+            return GWAS_FILE_o.tell() # type: ignore # ThreadedLineReader doesn't have it
+        except (OSError, AttributeError):
+            return None
+
+    def save_checkpoint_if_due():
+        nonlocal last_checkpoint_time
+        if not CHECKPOINTS or checkpoint_run is None or time.time() - last_checkpoint_time < CHECKPOINT_INTERVAL:
+            return
+        # the output has to be on the disk before the checkpoint that refers to it
+        OUTPUT_GWAS_FILE_o.flush()
+        with open(OUTPUT_GWAS_FILE, 'rb') as OUTPUT_GWAS_FILE_o_sync:
+            os.fsync(OUTPUT_GWAS_FILE_o_sync.fileno())
+        checkpoint_run["GWAS_FILE"] = get_GWASSS_hash(GWAS_FILE)
+        write_checkpoint(CHECKPOINT_FILE, {
+            "run": checkpoint_run,
+            "GWAS_line": rows_written,
+            "GWAS_offset": get_GWASSS_offset(),
+            "output_offset": os.path.getsize(OUTPUT_GWAS_FILE),
+            "dbSNPs": [cursor.get_state() for cursor in cursors],
+            "ChrBP_lost_because_of_liftover": ChrBP_lost_because_of_liftover,
+            "DB1_min_looked_up_chr_order": DB1_min_looked_up_chr_order,
+            "DB1_max_read_chr_order": DB1_max_read_chr_order,
+        })
+        last_checkpoint_time = time.time()
+
 
 
     # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -743,7 +1576,37 @@ def loop_fix(
 
 
 
+    # if the report has the bitmask of issues for each row of this very file,
+    # rows are only passed to the resolvers that may change them, and valid rows are copied as is
+    issues_bitmask = read_issues_bitmask_from_dir(REPORT_DIR, GWAS_FILE)
+    if issues_bitmask is not None and len(issues_bitmask) != total_entries:
+        issues_bitmask = None
+
+
     DOING_LIFTOVER: bool = False
+    # index of loci of dbSNP1, if it's available
+    DB1_index: Union[DB1Index, None] = None
+    # whether rows are restored by merging with dbSNP1, which can be done by parts in parallel (see `fix_by_parts`)
+    merging_by_ChrBP: bool = False
+    # dbSNPs opened for merging
+    dbSNP_FILES_o: List[Union[io.TextIOWrapper, BgzfLineReader, ThreadedLineReader]] = []
+
+    def get_freq_column(DB_FILE: str) -> Union[int, None]:
+        """
+        Which of the columns of allele frequencies in the dbSNP is from FREQ_DATABASE_SLUG (see `preparse_freqs`),
+        or None if there's no such column. The original "freq" field is the only column, which has all frequency databases
+        """
+        freq_databases = read_dbSNP_freq_databases(DB_FILE)
+        if freq_databases is None:
+            return 0
+        if FREQ_DATABASE_SLUG in freq_databases:
+            return freq_databases.index(FREQ_DATABASE_SLUG)
+        if FREQ_DATABASE_SLUG is not None and RUN_INFO is None:
+            print(f"dbSNP {DB_FILE} doesn't have allele frequencies from {FREQ_DATABASE_SLUG}, only from: {', '.join(freq_databases)}")
+        return None
+
+    DB1_freq_i = get_freq_column(SNPs_FILE)
+    DB2_freq_i = get_freq_column(SNPs_rsID_FILE)
 
     current_build = get_build()
     converter = None
@@ -751,10 +1614,12 @@ def loop_fix(
         DOING_LIFTOVER = True
 
     if DOING_LIFTOVER:
-        converter = get_lifter_from_ChainFile(CHAIN_FILE, current_build, 'hg38')
+        converter = read_chain_index(CHAIN_FILE)
         set_build('hg38')
         resolvers.append(resolve_build38)
+        chunk_resolvers.append(resolve_build38_in_chunk)
         resolvers_args.append([converter])
+        resolvers_issues.append(None)
 
 
     if not DOING_LIFTOVER and GWAS_SORTING == 'rsID' and (
@@ -765,14 +1630,29 @@ def loop_fix(
             gonna_resolve('EAF')
         ) and file_exists(SNPs_rsID_FILE):
         """
-        This ChrBP resolver assumes GWAS SS file is sorted by rsID
+        This ChrBP resolver assumes GWAS SS file is sorted by rsID, unless it's the hash join or there's the binary dbSNP2
         """
-        # open files here
-        SNPs_rsID_FILE_o_gz: io.RawIOBase = gzip.open(SNPs_rsID_FILE, 'r')  # type: ignore # GzipFile and RawIOBase _are_ in fact compatible
-        SNPs_rsID_FILE_o = io.TextIOWrapper(io.BufferedReader(SNPs_rsID_FILE_o_gz))
+        DB2_binary = read_dbSNP_binary(SNPs_rsID_FILE)
+        DB2_sorted_by_rsID_number = is_dbSNP2_sorted_by_rsID_number(SNPs_rsID_FILE)
+        if DB2_binary is None and JOIN == 'merge' and not DB2_sorted_by_rsID_number and RUN_INFO is None:
+            print("dbSNP2 is sorted by rsIDs as strings (it was prepared by an older version), so it's read with the hash join instead")
+        if DB2_binary is not None:
+            # SNPs are looked up in the binary dbSNP2 (see `write_dbSNP2_binary`)
+            DB2_binary.freq_column = DB2_freq_i
+            resolvers_args.append([DB2_binary, look_up_SNP_by_rsID])
+        elif JOIN == 'hash' or not DB2_sorted_by_rsID_number:
+            SNPs_by_rsID = read_SNPs_by_rsID(collect_keys_of_GWASSS(needs_SNP_by_rsID, needs_SNP_by_rsID_mask, get_rsID))
+            resolvers_args.append([SNPs_by_rsID, look_up_SNP_by_rsID])
+        else:
+            # open files here
+            SNPs_rsID_FILE_o = open_dbSNP(SNPs_rsID_FILE)
+            dbSNP_FILES_o.append(SNPs_rsID_FILE_o)
+            cursors.append(SNPsCursor(SNPs_rsID_FILE_o, read_dbSNP2_data_row, compare_SNP_by_rsID))
+            resolvers_args.append([cursors[-1], find_SNP_by_rsID])
 
         resolvers.append(resolve_ChrBP)
-        resolvers_args.append([SNPs_rsID_FILE_o])
+        chunk_resolvers.append(resolve_ChrBP_in_chunk)
+        resolvers_issues.append(issues_bits(INVALID_CHR, INVALID_BP, INVALID_OA, INVALID_EA, INVALID_EAF))
 
 
     if not DOING_LIFTOVER and GWAS_SORTING == 'ChrBP' and (
@@ -782,26 +1662,50 @@ def loop_fix(
             gonna_resolve('EAF')
         ) and file_exists(SNPs_FILE):
         """
-        These resolvers assumes GWAS SS file is sorted by Chr and BP in accord to the SNPs file
+        These resolvers assumes GWAS SS file is sorted by Chr and BP in accord to the SNPs file, unless it's the hash join or there's the binary dbSNP1
         """
-        SNPs_FILE_o_gz: io.RawIOBase = gzip.open(SNPs_FILE, 'r')  # type: ignore # GzipFile and RawIOBase _are_ in fact compatible
-        SNPs_FILE_o = io.TextIOWrapper(io.BufferedReader(SNPs_FILE_o_gz))
+        DB1_binary = read_dbSNP_binary(SNPs_FILE)
+        if DB1_binary is not None:
+            # SNPs are looked up in the binary dbSNP1 (see `write_dbSNP1_binary`)
+            DB1_binary.freq_column = DB1_freq_i
+            resolvers_args.append([DB1_binary, look_up_SNP_by_ChrBP])
+        elif JOIN == 'hash':
+            SNPs_by_ChrBP = read_SNPs_by_ChrBP(collect_keys_of_GWASSS(needs_SNP_by_ChrBP, needs_SNP_by_ChrBP_mask, get_locus))
+            resolvers_args.append([SNPs_by_ChrBP, look_up_SNP_by_ChrBP])
+        else:
+            DB1_index = read_dbSNP1_index(SNPs_FILE)
+            if DB1_index is not None:
+                # indexed BGZF, see `write_dbSNP1`
+                SNPs_FILE_o = ThreadedBgzfLineReader(SNPs_FILE) if PIPELINE else BgzfLineReader(SNPs_FILE)
+            else:
+                SNPs_FILE_o = open_dbSNP(SNPs_FILE)
+            dbSNP_FILES_o.append(SNPs_FILE_o)
+            cursors.append(SNPsCursor(SNPs_FILE_o, read_dbSNP1_data_row, compare_SNP_by_ChrBP))
+            resolvers_args.append([cursors[-1], find_SNP_by_ChrBP])
+            merging_by_ChrBP = True
 
         resolvers.append(resolve_rsID)
-        resolvers_args.append([SNPs_FILE_o])
+        chunk_resolvers.append(resolve_rsID_in_chunk)
+        resolvers_issues.append(issues_bits(INVALID_RSID, INVALID_OA, INVALID_EA, INVALID_EAF))
 
 
     if gonna_resolve('SE')   and issues['beta']<total_entries and issues['pval']<total_entries:
         resolvers.append(resolve_SE)
+        chunk_resolvers.append(resolve_SE_in_chunk)
         resolvers_args.append([])
+        resolvers_issues.append(issues_bits(INVALID_SE))
 
     if gonna_resolve('beta') and issues['SE']<total_entries   and issues['pval']<total_entries:
         resolvers.append(resolve_beta)
+        chunk_resolvers.append(resolve_beta_in_chunk)
         resolvers_args.append([])
+        resolvers_issues.append(issues_bits(INVALID_ES))
 
     if gonna_resolve('pval') and issues['beta']<total_entries and issues['SE']<total_entries:
         resolvers.append(resolve_pval)
+        chunk_resolvers.append(resolve_pval_in_chunk)
         resolvers_args.append([])
+        resolvers_issues.append(issues_bits(INVALID_PVAL_BIT))
 
 
     #
@@ -810,39 +1714,174 @@ def loop_fix(
     #     For each row, run all assembled resolvers, and FINALLY save the row to the output file
     #
 
-    # copy the first line that is the header
-    line_i = copy_line(line_i)
+    if checkpoint is not None and len(checkpoint["dbSNPs"]) != len(cursors):
+        print(f"dbSNPs are merged with the file not as before the checkpoint, so the file is fixed from the start")
+        checkpoint = None
+        os.remove(RESUMED_OUTPUT_FILE)
+
+    if checkpoint is None:
+        # copy the first line that is the header
+        line_i = copy_line(line_i)
+    else:
+        # write the output from before the checkpoint again, so that it's validated as well if OUTPUT_REPORT_DIR is set
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        if is_bgzf_output(OUTPUT_GWAS_FILE):
+            # blocks are flushed before a checkpoint, so the checkpoint is at the end of a block
+            for block in read_bgzf_blocks(RESUMED_OUTPUT_FILE, checkpoint["output_offset"]):
+                OUTPUT_GWAS_FILE_o.write(decoder.decode(block))
+        else:
+            with open(RESUMED_OUTPUT_FILE, 'rb') as RESUMED_OUTPUT_FILE_o:
+                size_left = checkpoint["output_offset"]
+                while size_left > 0:
+                    block = RESUMED_OUTPUT_FILE_o.read(min(size_left, 1 << 20))
+                    size_left -= len(block)
+                    OUTPUT_GWAS_FILE_o.write(decoder.decode(block))
+        OUTPUT_GWAS_FILE_o.write(decoder.decode(b'', final=True))
+        os.remove(RESUMED_OUTPUT_FILE)
+
+        # continue reading the GWAS SS file and the dbSNPs from where they were at the checkpoint
+        if checkpoint["GWAS_offset"] is not None and isinstance(GWAS_FILE_o, io.TextIOWrapper):
+            GWAS_FILE_o.seek(checkpoint["GWAS_offset"])
+        else:
+            for _ in range(1 + checkpoint["GWAS_line"]):
+                GWAS_FILE_o.readline()
+        for cursor, cursor_state in zip(cursors, checkpoint["dbSNPs"]):
+            cursor.resume(cursor_state)
+
+        rows_written = checkpoint["GWAS_line"]
+        ChrBP_lost_because_of_liftover = checkpoint["ChrBP_lost_because_of_liftover"]
+        DB1_min_looked_up_chr_order = checkpoint["DB1_min_looked_up_chr_order"]
+        DB1_max_read_chr_order = checkpoint["DB1_max_read_chr_order"]
+        print(f"resumed from the checkpoint at row {rows_written} of the GWAS SS file")
+
+    # a run resumed from a checkpoint goes on in this process
+    if PROCESSES > 1 and RUN_INFO is None and merging_by_ChrBP and checkpoint is None:
+        if DB1_index is not None:
+            fix_by_parts()
+            GWAS_FILE_o.close()
+            OUTPUT_GWAS_FILE_o.close()
+            for dbSNP_FILE_o in dbSNP_FILES_o:
+                dbSNP_FILE_o.close()
+            return ChrBP_lost_because_of_liftover
+        print("dbSNP1 isn't indexed, so the file is fixed in one process")
 
     if DOING_LIFTOVER:
         pbar_desc = '    lifting over   '
     else:
         pbar_desc = '     loop-fix      '
-    pbar = tqdm(total=total_entries, desc=pbar_desc)
+    # parts of the file that are fixed in parallel don't show their progress
+    pbar = tqdm(total=total_entries, initial=rows_written, desc=pbar_desc, disable=RUN_INFO is not None)
+    # whether it stopped at a row that can't be fixed, before the end of the file
+    stopped_early = False
     try:
-        while True:
-            fields = get_next_line_in_GWASSS()
-            run_all(resolvers, fields, resolvers_args)
-            write_line_to_GWASSS(fields)
-            pbar.update(1)
+        if ENGINE == 'chunks':
+            chunk_start = rows_written
+            while True:
+                lines = list(islice(GWAS_FILE_o, ROWS_PER_CHUNK))
+                if not lines:
+                    break
+                chunk = read_chunk_of_rows(
+                    lines,
+                    issues_bitmask[chunk_start : chunk_start + len(lines)] if issues_bitmask is not None else None,
+                )
+                for res_i in range(len(chunk_resolvers)):
+                    chunk_resolvers[res_i](chunk, *resolvers_args[res_i])
+                restore_stats_batches()
+                OUTPUT_GWAS_FILE_o.write(chunk.text())
+                ChrBP_lost_because_of_liftover += sum(i < chunk.end for i in chunk.lost_in_liftover)
+                pbar.update(chunk.end)
+                if chunk.end < len(lines):
+                    stopped_early = True
+                    break
+                chunk_start += len(lines)
+                rows_written = chunk_start
+                save_checkpoint_if_due()
+        elif issues_bitmask is None:
+            while True:
+                fields = get_next_line_in_GWASSS()
+                run_all(resolvers, fields, resolvers_args)
+                write_line_to_GWASSS(fields)
+                pbar.update(1)
+        else:
+            # the bitmask is memory-mapped, and is read by slices
+            for slice_start in range(rows_written, len(issues_bitmask), 1 << 16):
+                for row_issues in issues_bitmask[slice_start : slice_start + (1 << 16)].tolist():
+                    line = read_next_line_in_GWASSS()
+                    row_resolvers, row_resolvers_args = resolvers_for_issues(row_issues)
+                    if row_resolvers:
+                        fields = line.split("\t")
+                        run_all(row_resolvers, fields, row_resolvers_args)
+                        write_line_to_GWASSS(fields)
+                    else:
+                        copy_line_to_GWASSS(line)
+                    pbar.update(1)
 
     except Exception as e:
         if isinstance(e, IndexError) or isinstance(e, EOFError):
             # it reached the end of the file
-            pass
+            stopped_early = isinstance(e, IndexError)
         else:
             print(f'An error occured on line {line_i} of the GWAS SS file (see below)')
             raise e
+    flush_output_buffer()
     pbar.close()
 
 
     GWAS_FILE_o.close()
     OUTPUT_GWAS_FILE_o.close()
+    for dbSNP_FILE_o in dbSNP_FILES_o:
+        dbSNP_FILE_o.close()
 
+    if file_exists(CHECKPOINT_FILE) and checkpoint_run is not None:
+        os.remove(CHECKPOINT_FILE)
+
+    if RUN_INFO is not None:
+        RUN_INFO["stopped_early"] = stopped_early
+        RUN_INFO["DB1_min_looked_up_chr_order"] = DB1_min_looked_up_chr_order
+        RUN_INFO["DB1_max_read_chr_order"] = DB1_max_read_chr_order
 
     return ChrBP_lost_because_of_liftover
 
 
 
+def fix_part_of_GWASSS(
+    GWAS_FILE: str,
+    header_end: int,
+    start: int,
+    end: int,
+    PART_FILE: str,
+    OUTPUT_PART_FILE: str,
+    loop_fix_kwargs: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Copies the header and the rows between `start` and `end` bytes of the GWAS SS file into PART_FILE,
+    and fixes them with loop_fix into OUTPUT_PART_FILE. Is run in a separate process for each part of the file.
+
+    Returns the information about the run:
+     - "stopped_early": whether it stopped at a row that can't be fixed
+     - "DB1_min_looked_up_chr_order": the lowest order of chromosomes looked up in dbSNP1
+     - "DB1_max_read_chr_order": the highest order of chromosomes read from dbSNP1
+    """
+    with open(GWAS_FILE, 'rb') as GWAS_FILE_o, open(PART_FILE, 'wb') as PART_FILE_o:
+        PART_FILE_o.write(GWAS_FILE_o.read(header_end))
+        GWAS_FILE_o.seek(start)
+        size = end - start
+        while size > 0:
+            block = GWAS_FILE_o.read(min(size, 1 << 20))
+            if not block:
+                break
+            PART_FILE_o.write(block)
+            size -= len(block)
+
+    run_info: Dict[str, Any] = {}
+    try:
+        loop_fix(GWAS_FILE=PART_FILE, OUTPUT_GWAS_FILE=OUTPUT_PART_FILE, RUN_INFO=run_info, **loop_fix_kwargs)
+    finally:
+        os.remove(PART_FILE)
+    return run_info
+
+
+
 if __name__ == "__main__":
     GWAS_FILE = sys.argv[1]
     REPORT_DIR = sys.argv[2]
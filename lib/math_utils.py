@@ -1,10 +1,18 @@
 # standard library
 from functools import lru_cache
+from math import sqrt
+from typing import Tuple
 
 # third-party libraries
+import numpy as np
+from scipy.special import ndtr, ndtri # type: ignore # pylance doesn't see ufuncs in scipy.special
 from scipy.stats import norm as normal_distribution, binom as binomial_distribution # type: ignore # mistakenly, pylance doesn't recognize scipy.stats.norm and scipy.stats.binom
 
 
+def clip_float(val: float, range: Tuple[float, float] = (0, 1)):
+    return min(range[1], max(val, range[0]))
+
+
 @lru_cache(10000)
 def normal_z_score(p: float = 0.95) -> float:
     """
@@ -52,3 +60,39 @@ def normal_p_area_two_tailed(z: float) -> float:
     return (-normal_distribution.cdf(z)+1) * 2  # (2*z)-1  is a more concervative formula
 
 
+def normal_z_scores_two_tailed(p: np.ndarray) -> np.ndarray:
+    """
+    `normal_z_score_two_tailed` for an array of values at once.
+
+    It's computed from the lower tail, as -qnorm(p/2), since 1-(p/2) rounds to 1 for p below ~1e-16,
+    which would give an infinite z-score for very small p-values common in GWAS
+    """
+    return -ndtri(p/2)
+
+def normal_p_areas_two_tailed(z: np.ndarray) -> np.ndarray:
+    """
+    `normal_p_area_two_tailed` for an array of values at once.
+
+    It's computed from the lower tail, as 2*pnorm(-z), since 1-pnorm(z) rounds to 0 for z above ~8.3
+    """
+    return ndtr(-z) * 2
+
+
+
+def binomial_confidence_interval(p: float, n: float, confidence: float = 0.95) -> Tuple[float, float]:
+    """
+    Answers the question: "Within what range the true proportion lies with the given `confidence`,
+    if the proportion `p` was observed in a sample of `n` trials"
+
+    Uses the Wilson score interval, which stays within [0, 1] and behaves well for proportions close to 0 or 1.
+    `n` doesn't have to be an integer (e.g. effective size of a weighted sample)
+
+    https://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval#Wilson_score_interval
+    """
+    if n <= 0:
+        return 0., 1.
+    z = normal_z_score(1 - (1-confidence)/2)
+    denominator = 1 + z*z/n
+    center = (p + z*z/(2*n)) / denominator
+    half_width = z * sqrt(p*(1-p)/n + z*z/(4*n*n)) / denominator
+    return max(0., center - half_width), min(1., center + half_width)
@@ -2,9 +2,18 @@
 import sys
 import os
 import time
+from subprocess import Popen, PIPE
+from typing import List, Union
 
 # local
 from lib.utils import run_bash, run_bash_rich
+from lib.file import read_chunks_of_lines
+from lib.dbSNP_utils import (
+    write_dbSNP1, DB1_CHUNK_SIZE,
+    write_dbSNP1_binary, write_dbSNP2_binary,
+    preparse_freqs, write_dbSNP_freq_databases,
+    write_dbSNP2_sorting,
+)
 
 class BcftoolsQueryError(Exception):
     pass
@@ -13,7 +22,15 @@ def remove_last_ext(filename: str):
     return filename.rsplit(".", 1)[0] # passed 1 means do max 1 split; _rightmost_ splits first
 
 
-def prepare_two_dbSNPs(SNPs_FILE: str, gzsort: str, bcftools: str, buffer_size: str, OUTPUT_FILE: str):
+def prepare_two_dbSNPs(
+    SNPs_FILE: str,
+    gzsort: str,
+    bcftools: str,
+    buffer_size: str,
+    OUTPUT_FILE: str,
+    BINARY: bool = False,
+    FREQ_DATABASE_SLUGS: Union[List[str], None] = None,
+):
     """
     Takes a dbSNP dataset and turns it into two datasets for later use in the FIX command.
 
@@ -33,6 +50,14 @@ def prepare_two_dbSNPs(SNPs_FILE: str, gzsort: str, bcftools: str, buffer_size:
 
     OUTPUT_FILE : str
         base path for output file names of two prepared DBs
+
+    BINARY : bool
+        whether to also write the binary DBs next to the two prepared DBs (see `write_dbSNP1_binary`)
+
+    FREQ_DATABASE_SLUGS : None | List[str]
+        (optional) frequency databases (e.g.: "GnomAD", "dbGaP_PopFreq", "TOMMO") to keep allele frequencies from.
+        If set, allele frequencies from each of them are pre-parsed into a column (see `preparse_freqs`),
+        and frequencies from the other databases are dropped. Otherwise, the "freq" field is kept as is
     """
 
     if not os.path.isfile(SNPs_FILE):
@@ -40,7 +65,8 @@ def prepare_two_dbSNPs(SNPs_FILE: str, gzsort: str, bcftools: str, buffer_size:
 
     buffer_size = buffer_size.strip().replace(' ', '')
     SNPs_FILE_DATA = OUTPUT_FILE + ".1.tsv.gz"
-    SNPs_FILE_DATA_RSID_SORTED_TMP = OUTPUT_FILE + ".2.unsorted.tsv.gz"
+    SNPs_FILE_DATA_RSID_UNSORTED_TMP = OUTPUT_FILE + ".2.unsorted.tsv.gz"
+    SNPs_FILE_DATA_RSID_SORTED_TMP = OUTPUT_FILE + ".2.sorted.tsv.gz"
     SNPs_FILE_DATA_RSID_SORTED = OUTPUT_FILE + ".2.tsv.gz"
 
 
@@ -236,8 +262,19 @@ def prepare_two_dbSNPs(SNPs_FILE: str, gzsort: str, bcftools: str, buffer_size:
             print ($1 in chrs) ? chrs[$1]"\t"$2"\t"$3"\t"$4"\t"$5"\t"$6 : $1"\t"$2"\t"$3"\t"$4"\t"$5"\t"$6
         }}
     }}'"""
-    gzip = f"gzip"
-    run_bash(f"{query_fields} | {format_fields} | {gzip} > \"{SNPs_FILE_DATA}\"")
+    # DB1 is compressed as BGZF and indexed by Chr and BP, so that loop_fix can jump to the SNPs it needs
+    process = Popen(['bash', '-c', f"{query_fields} | {format_fields}"], stdout=PIPE)
+    chunks = read_chunks_of_lines(process.stdout, DB1_CHUNK_SIZE) # type: ignore # stdout is a binary pipe
+    if FREQ_DATABASE_SLUGS:
+        chunks = preparse_freqs(chunks, FREQ_DATABASE_SLUGS)
+    indexed = write_dbSNP1(chunks, SNPs_FILE_DATA)
+    if process.wait() != 0:
+        raise ChildProcessError(f"querying fields from the SNPs file finished with exit code: {process.returncode}")
+    if indexed:
+        print("  DB1 is indexed by Chr and BP")
+    if FREQ_DATABASE_SLUGS:
+        write_dbSNP_freq_databases(SNPs_FILE_DATA, FREQ_DATABASE_SLUGS)
+        print(f"  DB1 has allele frequencies from: {', '.join(FREQ_DATABASE_SLUGS)}")
 
     print(f"  Preparing DB1 finished in {(time.time() - start_time)} seconds\n")
 
@@ -245,20 +282,49 @@ def prepare_two_dbSNPs(SNPs_FILE: str, gzsort: str, bcftools: str, buffer_size:
     #
     # STEP #2
     #    FINALLY, sort the formatted table data by rsID, creating dbSNP2,
-    #     and remove the intermediate file
+    #     and remove the intermediate files
     #
     print("=== Preparing DB2 ===")
     start_time = time.time()
 
-    get_rsID_col = f"gunzip -c \"{SNPs_FILE_DATA}\" | cut -d$'\t' -f3"
-    get_other_cols = f"gunzip -c \"{SNPs_FILE_DATA}\" | cut -d$'\t' -f1-2,4-6"
-    run_bash(f"paste -d$'\t' <({get_rsID_col}) <({get_other_cols}) | gzip > \"{SNPs_FILE_DATA_RSID_SORTED_TMP}\"")
-    run_bash(f"\"{gzsort}\" -S {buffer_size} \"{SNPs_FILE_DATA_RSID_SORTED_TMP}\" \"{SNPs_FILE_DATA_RSID_SORTED}\"")
-    run_bash(f"rm \"{SNPs_FILE_DATA_RSID_SORTED_TMP}\"")
+    """
+    Rows are sorted by the numbers of their rsIDs (see `parse_rsID`), and rows with the same rsID keep their order in DB1,
+    the same way as in the binary dbSNP2. gz-sort compares whole lines as strings, so each row is prefixed with a key:
+    the number of the rsID zero-padded to 20 digits (0 if the rsID isn't "rs" followed by a number),
+    and the number of the row in DB1 zero-padded to 12 digits. The key is cut off after sorting
+    """
+    # DB1 has more than one column of allele frequencies if they were pre-parsed
+    add_sort_key = """awk -F $'\\t' '{
+        rsid = ($3 ~ /^rs[1-9][0-9]*$/) ? substr($3, 3) : ""
+        row = $3"\\t"$1"\\t"$2
+        for (i = 4; i <= NF; i++) row = row"\\t"$i
+        printf "%s%s%012.0f\\t%s\\n", substr("00000000000000000000", 1, 20 - length(rsid)), rsid, NR, row
+    }'"""
+    run_bash(f"gunzip -c \"{SNPs_FILE_DATA}\" | {add_sort_key} | gzip > \"{SNPs_FILE_DATA_RSID_UNSORTED_TMP}\"")
+    run_bash(f"\"{gzsort}\" -S {buffer_size} \"{SNPs_FILE_DATA_RSID_UNSORTED_TMP}\" \"{SNPs_FILE_DATA_RSID_SORTED_TMP}\"")
+    run_bash(f"gunzip -c \"{SNPs_FILE_DATA_RSID_SORTED_TMP}\" | cut -d$'\t' -f2- | gzip > \"{SNPs_FILE_DATA_RSID_SORTED}\"")
+    run_bash(f"rm \"{SNPs_FILE_DATA_RSID_UNSORTED_TMP}\" \"{SNPs_FILE_DATA_RSID_SORTED_TMP}\"")
+    write_dbSNP2_sorting(SNPs_FILE_DATA_RSID_SORTED)
+    if FREQ_DATABASE_SLUGS:
+        write_dbSNP_freq_databases(SNPs_FILE_DATA_RSID_SORTED, FREQ_DATABASE_SLUGS)
 
     print(f"  Preparing DB2 finished in {(time.time() - start_time)} seconds\n")
 
 
+    #
+    # STEP #3
+    #    (optional) Write both DBs in the binary format
+    #
+    if BINARY:
+        print("=== Preparing binary DBs ===")
+        start_time = time.time()
+
+        if write_dbSNP1_binary(SNPs_FILE_DATA):
+            write_dbSNP2_binary(SNPs_FILE_DATA, SNPs_FILE_DATA_RSID_SORTED)
+
+        print(f"  Preparing binary DBs finished in {(time.time() - start_time)} seconds\n")
+
+
 
 if __name__ == "__main__":
     SNPs_FILE = sys.argv[1]
@@ -266,5 +332,7 @@ if __name__ == "__main__":
     bcftools = sys.argv[3]
     buffer_size = sys.argv[4]
     OUTPUT_FILE = sys.argv[5]
+    BINARY = len(sys.argv) > 6 and sys.argv[6] == 'binary'
+    FREQ_DATABASE_SLUGS = sys.argv[7].split(',') if len(sys.argv) > 7 else None
 
-    prepare_two_dbSNPs(SNPs_FILE, gzsort, bcftools, buffer_size, OUTPUT_FILE)
+    prepare_two_dbSNPs(SNPs_FILE, gzsort, bcftools, buffer_size, OUTPUT_FILE, BINARY, FREQ_DATABASE_SLUGS)
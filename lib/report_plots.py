@@ -0,0 +1,240 @@
+# standard library
+import os
+import multiprocessing
+from typing import Any, Callable, Dict, List, Tuple
+
+# third-party libraries
+import numpy as np
+# matplotlib is imported only inside the functions below,
+# so that it isn't loaded unless plots are requested
+
+# local
+from lib.validation_utils import ISSUES, ISSUES_LABELS
+
+
+
+ISSUES_COLORS=[
+    "#ff0000", # format
+    "#777ae5", # rsID
+    "#cf44a1", # Chr
+    "#ff4481", # BP
+    "#ffa121", # EA
+    "#ff9191", # OA
+    "#fdbc64", # EAF
+    "#563E3E", # std. err.
+    "#175a63", # beta
+
+]
+
+
+def histogram_image_name(summary: Dict[str, Any]) -> str:
+    return summary["file"]
+
+def bin_image_name(summary: Dict[str, Any], i: int) -> str:
+    x = summary["tick_labels"]
+    return f'bin_{i}__{x[i-1]}—{x[i]}'
+
+
+
+def draw_histogram(fig, summary: Dict[str, Any], ticks_loc: List[float], bars_widths: List[float]):
+    """
+    Draws the stacked histogram of valid/invalid SNPs by p-value bins on the matplotlib figure.
+
+    `summary` is the report summary made by `validate_GWASSS_entries` (see `write_summary_to_dir`),
+    `ticks_loc` and `bars_widths` are locations of ticks and widths of bars on the x axis
+    """
+    x = summary["tick_labels"]
+    num_of_snps = summary["total_entries"]
+    missing_pval_bins = summary["bins"]["missing_pval"]
+    good_entry_bins = summary["bins"]["valid"]
+    invalid_entry_bins = summary["bins"]["invalid"]
+    negative_bars_widths = list(-np.array(bars_widths))
+
+    ### CALC: proportion of invalid entries in total ###
+
+    invalid_entries_totally = sum(invalid_entry_bins) + sum(missing_pval_bins)
+    proportion_of_invalid_entries_totally = invalid_entries_totally / num_of_snps if num_of_snps else 0.
+    percentage_of_invalid_entries_totally = proportion_of_invalid_entries_totally * 100
+    percentage_of_invalid_entries_totally_str = str(np.round(percentage_of_invalid_entries_totally, 1)) + "%"
+
+
+    ### PLOT: the figure, labels, ticks, bars ###
+
+    ax = fig.subplots()
+
+    ax.set_title(
+        f"invalid SNPs: {invalid_entries_totally}/{num_of_snps} ({percentage_of_invalid_entries_totally_str})")
+
+    # # Hide the right and top spines
+    # ax.spines['right'].set_visible(False)
+    # ax.spines['top'].set_visible(False)
+
+    ax.tick_params(axis='x', labelsize=9)
+
+    ax.set_xticks(ticks_loc)
+    ax.set_xticklabels(x)
+    ax.bar(ticks_loc, missing_pval_bins, negative_bars_widths, color='#7f7f7f', align='edge')
+    ax.bar(ticks_loc, good_entry_bins, negative_bars_widths, color='#0000ff', align='edge', label="valid SNPs")
+    ax.bar(ticks_loc, invalid_entry_bins, negative_bars_widths, color='#ff0000', align='edge', bottom=good_entry_bins, label="invalid SNPs")
+    ax.set_xlabel("p-value", fontweight="heavy", fontsize=14)
+    ax.set_ylabel("N of SNPs", fontweight="heavy", fontsize=14)
+    ax.set_xlim([ticks_loc[0]+negative_bars_widths[0], ticks_loc[-1]])
+
+    max_bar_height = max(
+        np.array(missing_pval_bins) + np.array(good_entry_bins) + np.array(invalid_entry_bins) # np arrays add element-wise
+    )
+
+    plt_bottom, plt_top = ax.set_ylim(0, max_bar_height*1.15 if max_bar_height else 1)
+    plt_height = plt_top - plt_bottom
+
+
+    ### CALC: points right at the middle of each bin ###
+    bins_mid_points = list(np.array(ticks_loc) - np.array(bars_widths)/2)
+
+
+    ### PLOT: caption for "no p-value" bin ###
+    ax.text(x=bins_mid_points[0], y=plt_top*-0.08, s="no\np-value",
+        horizontalalignment='center',
+    )
+
+
+    ### CALC: total entries, proportion and percentage of invalid entries  ###
+
+    total_p_value_entries_bins = [good_entry_bins[i]+invalid_entry_bins[i] for i in range(len(good_entry_bins))]
+
+    proportion_of_invalid_entries_bins = [0.] + [
+        invalid_entry_bins[i]/total_p_value_entries_bins[i] if total_p_value_entries_bins[i] else 0.
+                    for i in range(1, len(good_entry_bins))]
+
+    percentage_of_invalid_entries_bins = np.round(np.array(proportion_of_invalid_entries_bins)*100).astype(int)
+    percentage_of_invalid_entries_bins_str = [f"{percentage}%" for percentage in percentage_of_invalid_entries_bins]
+
+
+
+    ### PLOT: representation of the percentage of invalid entries for each bin ###
+    # the bottom and the top spines of the plot represent 0% and 100%
+    # skipping the first, "no p-value" bin
+
+    ax.plot(
+        # X: points right at the mid of bins (except the no p-value bin)
+        bins_mid_points[1:],
+
+        # Y: how much proportion -> that much height within the plot
+        np.array(proportion_of_invalid_entries_bins[1:]) * plt_height + plt_bottom,
+
+        linestyle='-',
+        color="red",
+        alpha=0.5,
+        linewidth=2,
+    )
+
+
+    ### PLOT: Captions above the points of the plot ###
+    # shows percentage of invalid entries for each bin in text
+    # skipping the first, "no p-value" bin
+
+    # points right at the mid of bins
+    X = bins_mid_points
+    # how much proportion -> that much height within the plot, also lifted 5%
+    Y = (np.array(proportion_of_invalid_entries_bins) * plt_height) + plt_height*0.05 + plt_bottom
+
+    for i in range(1, len(percentage_of_invalid_entries_bins_str)):
+        if proportion_of_invalid_entries_bins[i] > 0.15:
+            ax.text(X[i], Y[i], s=percentage_of_invalid_entries_bins_str[i],
+                horizontalalignment='center',
+                color="#bf3f3f", # caption may overlap with the red stuff from stacked bar
+                fontsize=10,
+                fontweight="demibold",
+            )
+        else:
+            ax.text(X[i], Y[i], s=percentage_of_invalid_entries_bins_str[i],
+                horizontalalignment='center',
+                color="#ff0000",
+                fontsize=10,
+            )
+
+
+def draw_bin_issues(fig, summary: Dict[str, Any], i: int):
+    """
+    Draws the bar chart for issues in the p-value bin `i` on the matplotlib figure
+    """
+    x = summary["tick_labels"]
+    good_entry_bins = summary["bins"]["valid"]
+    invalid_entry_bins = summary["bins"]["invalid"]
+    invalid_entry_bin_reasons = [summary["bins"]["issues"][label][i] for label in ISSUES_LABELS]
+
+    ax = fig.subplots()
+
+    issues_proportions = [0] * len(ISSUES)
+    total_invalids = invalid_entry_bins[i]
+    total_snps = invalid_entry_bins[i] + good_entry_bins[i]
+
+    proportion_of_invalids = total_invalids / total_snps if total_snps else 0
+    percentage_of_invalids = proportion_of_invalids * 100
+    percentage_of_invalids_str = str(np.round(percentage_of_invalids, 1)) + "%"
+
+    ax.set_title(f'issues in p-value: {x[i-1]} — {x[i]}\ninvalid SNPs: {total_invalids}/{total_snps} ({percentage_of_invalids_str})')
+    ax.set_ylim(0, total_invalids if total_invalids > 0 else 1)
+    ax.set_ylabel("N of invalid SNPs", fontweight="demibold", fontsize=14)
+
+    if total_invalids == 0:
+        ax.bar(ISSUES_LABELS, height=issues_proportions, width=1, color=ISSUES_COLORS)
+    else:
+        ax.bar(ISSUES_LABELS, height=invalid_entry_bin_reasons, width=1, color=ISSUES_COLORS)
+
+
+
+def list_figures(summary: Dict[str, Any], ticks_loc: List[float], bars_widths: List[float]) -> List[Tuple[str, Callable, tuple]]:
+    """
+    Lists all figures of the report as tuples (image name, draw function, arguments for the draw function after the figure)
+    """
+    figures: List[Tuple[str, Callable, tuple]] = [
+        (histogram_image_name(summary), draw_histogram, (summary, ticks_loc, bars_widths))
+    ]
+    for i in range(1, len(summary["tick_labels"])):
+        figures.append((bin_image_name(summary, i), draw_bin_issues, (summary, i)))
+    return figures
+
+
+def render_figure(draw: Callable, args: tuple, path: str):
+    """
+    Draws a figure with the Agg renderer and saves it to the path.
+    Doesn't use pyplot, so it's safe to run in any process and without a display
+    """
+    from matplotlib.figure import Figure
+    fig = Figure()
+    draw(fig, *args)
+    fig.savefig(path)
+
+
+def save_plots(REPORT_DIR: str, summary: Dict[str, Any], ticks_loc: List[float], bars_widths: List[float]):
+    """
+    Renders all figures of the report into PNG files in the REPORT_DIR, each in a separate process if there are multiple CPUs
+    """
+    figures = list_figures(summary, ticks_loc, bars_widths)
+    tasks = [(draw, args, os.path.join(REPORT_DIR, image_name+'.png')) for image_name, draw, args in figures]
+
+    processes = min(len(tasks), os.cpu_count() or 1)
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            pool.starmap(render_figure, tasks)
+    else:
+        for task in tasks:
+            render_figure(*task)
+
+
+def show_plots(summary: Dict[str, Any], ticks_loc: List[float], bars_widths: List[float]):
+    """
+    Pops up all figures of the report in matplotlib windows
+    """
+    import matplotlib.pyplot as plt
+
+    for image_name, draw, args in list_figures(summary, ticks_loc, bars_widths):
+        fig = plt.figure(num=image_name)
+        if fig.canvas.manager is not None:
+            fig.canvas.manager.set_window_title(image_name) # sets the window title to the image name
+        draw(fig, *args)
+
+    plt.show()
+    input("")
+    input("")
@@ -1,11 +1,26 @@
 # standard library
 import csv
+import json
 import os
-from typing import Dict
+import hashlib
+import zipfile
+from typing import Any, Dict, Iterator, Union
+
+# third-party libraries
+import numpy as np
+
+# local
+from lib.file import get_file_hash
 
 
 
 INVALID_ENTRIES_REPORT_FILENAME = 'invalid_entries.csv'
+SUMMARY_REPORT_FILENAME = 'summary.json'
+ISSUES_BITMASK_FILENAME = 'issues_bitmask.npy'
+SAMPLE_SUMMARY_FILENAME = 'sample_summary.json'
+
+# bumped whenever the contents of the entries cache change
+ENTRIES_CACHE_VERSION = 1
 
 
 def read_report_from_dir(REPORT_DIR: str):
@@ -24,3 +39,160 @@ def write_report_to_dir(issues: Dict[str, int], REPORT_DIR: str):
         w = csv.DictWriter(f, issues.keys())
         w.writeheader()
         w.writerow(issues)
+
+
+def read_summary_from_dir(REPORT_DIR: str) -> Dict[str, Any]:
+    with open(os.path.join(REPORT_DIR, SUMMARY_REPORT_FILENAME), 'r') as f:
+        return json.load(f)
+
+
+def write_summary_to_dir(summary: Dict[str, Any], REPORT_DIR: str):
+    """
+    Saves the summary of the report: total numbers of issues, as well as numbers of entries by p-value bins
+    """
+    with open(os.path.join(REPORT_DIR, SUMMARY_REPORT_FILENAME), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+def write_sample_summary_to_dir(sample_summary: Dict[str, Any], REPORT_DIR: str):
+    """
+    Saves the proportions of issues estimated from a sample of entries, with their confidence intervals
+    """
+    with open(os.path.join(REPORT_DIR, SAMPLE_SUMMARY_FILENAME), 'w') as f:
+        json.dump(sample_summary, f, indent=2)
+
+
+def get_file_signature(path: str) -> Dict[str, Any]:
+    """
+    Identifies the exact version of a file, so that a report can be matched against the file it was made for
+    """
+    stat = os.stat(path)
+    return {
+        "path": os.path.realpath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+
+class IssuesBitmaskWriter:
+    """
+    Writes bitmasks of issues for each row (see `get_issues_bitmask` in validation_utils)
+    into a .npy file in the report dir, chunk by chunk
+    """
+    DTYPE = np.dtype('<u2')
+
+    def __init__(self, REPORT_DIR: str):
+        self.FILE_o = open(os.path.join(REPORT_DIR, ISSUES_BITMASK_FILENAME), 'wb')
+        self.num_of_rows = 0
+        self.write_header()
+        self.data_offset = self.FILE_o.tell()
+
+    def write_header(self):
+        # numpy reserves space in the header for the shape to grow, so it can be rewritten in place
+        np.lib.format.write_array_header_1_0(self.FILE_o, {
+            'descr': np.lib.format.dtype_to_descr(self.DTYPE),
+            'fortran_order': False,
+            'shape': (self.num_of_rows,),
+        })
+
+    def write(self, bitmask: np.ndarray):
+        self.FILE_o.write(bitmask.astype(self.DTYPE).tobytes())
+        self.num_of_rows += len(bitmask)
+
+    def close(self):
+        self.FILE_o.seek(0)
+        self.write_header()
+        assert self.FILE_o.tell() == self.data_offset, "header of the issues bitmask file has to keep its size"
+        self.FILE_o.close()
+
+
+def read_issues_bitmask_from_dir(REPORT_DIR: str, GWAS_FILE: str) -> Union[np.ndarray, None]:
+    """
+    Returns the bitmasks of issues for each row of the GWAS_FILE (memory-mapped),
+    or None if the report dir doesn't have them or they were made for another file (or another version of the file)
+    """
+    if not os.path.isfile(os.path.join(REPORT_DIR, ISSUES_BITMASK_FILENAME)) or \
+       not os.path.isfile(os.path.join(REPORT_DIR, SUMMARY_REPORT_FILENAME)):
+        return None
+    if read_summary_from_dir(REPORT_DIR).get("source") != get_file_signature(GWAS_FILE):
+        return None
+    return np.load(os.path.join(REPORT_DIR, ISSUES_BITMASK_FILENAME), mmap_mode='r')
+
+
+
+def get_entries_cache_path(CACHE_DIR: str, GWAS_FILE: str, cols_i: Dict[str, Any]) -> str:
+    """
+    Path to the cache of validated entries of the GWAS_FILE in the CACHE_DIR.
+    The cache is unique for the path of the file and the columns config the file is validated with
+    """
+    key = json.dumps([os.path.realpath(GWAS_FILE), cols_i], sort_keys=True)
+    return os.path.join(CACHE_DIR, f"entries_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz")
+
+
+class EntriesCacheWriter:
+    """
+    Writes validated entries into a .npz file chunk by chunk: the p-value, the report,
+    and the packed issues of each SNP (see `get_issues_bitmask` in validation_utils),
+    optionally with the bitmask of issues for loop_fix.
+
+    The file gets its final name only when closed, so an interrupted validation doesn't leave a broken cache
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.zip = zipfile.ZipFile(path + '.tmp', 'w', zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.num_of_chunks = 0
+        self.has_bitmask = True
+
+    def write(self, arrays: Dict[str, np.ndarray]):
+        self.has_bitmask = self.has_bitmask and "bitmask" in arrays
+        for name, array in arrays.items():
+            with self.zip.open(f"{name}_{self.num_of_chunks}.npy", 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, array)
+        self.num_of_chunks += 1
+
+    def close(self, GWAS_FILE: str):
+        meta = {
+            "version": ENTRIES_CACHE_VERSION,
+            "source": get_file_signature(GWAS_FILE),
+            "hash": get_file_hash(GWAS_FILE),
+            "chunks": self.num_of_chunks,
+            "bitmask": self.has_bitmask,
+        }
+        with self.zip.open("meta.npy", 'w') as f:
+            np.lib.format.write_array(f, np.array(json.dumps(meta)))
+        self.zip.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+def read_entries_cache(path: str, GWAS_FILE: str, with_bitmask: bool = False) -> Union[Iterator[Dict[str, np.ndarray]], None]:
+    """
+    Returns an iterator over chunks of validated entries written by `EntriesCacheWriter`,
+    or None if there's no cache, it was made for another version of the file, or it doesn't have the bitmask when it's needed.
+
+    The file is considered the same if it has the same size and either the same modification time or the same contents
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        cache = np.load(path)
+        meta = json.loads(str(cache["meta"]))
+    except Exception:
+        return None
+
+    source = get_file_signature(GWAS_FILE)
+    if meta.get("version") != ENTRIES_CACHE_VERSION or meta["source"]["size"] != source["size"]:
+        return None
+    if meta["source"]["mtime_ns"] != source["mtime_ns"] and meta["hash"] != get_file_hash(GWAS_FILE):
+        return None
+    if with_bitmask and not meta["bitmask"]:
+        return None
+
+    def chunks() -> Iterator[Dict[str, np.ndarray]]:
+        with cache:
+            for i in range(meta["chunks"]):
+                names = ("pval", "report", "issues", "bitmask") if with_bitmask else ("pval", "report", "issues")
+                yield {name: cache[f"{name}_{i}"] for name in names}
+
+    return chunks()
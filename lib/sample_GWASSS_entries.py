@@ -0,0 +1,298 @@
+# standard library
+import sys
+from typing import BinaryIO, Dict, List, Literal, Tuple, Union
+import os
+import json
+import time
+import gzip
+
+# third-party libraries
+import numpy as np
+import magic
+from tqdm import tqdm
+
+# local
+from lib.file import read_chunks_of_lines, read_line_at_offset
+from lib.math_utils import binomial_confidence_interval
+from lib.report_utils import write_sample_summary_to_dir, get_file_signature
+from lib.standard_column_order import STANDARD_COLUMN_ORDER
+from lib.validate_GWASSS_entries import CHUNK_SIZE
+from lib.validation_utils import (
+    GOOD_ENTRY, MISSING_P_VALUE,
+    ISSUES, ISSUES_LABELS,
+    check_rows,
+)
+
+
+def file_exists(path: str):
+    return os.path.isfile(path)
+def dir_exists(path: str):
+    return os.path.isdir(path)
+
+def perc(x: float):
+    return str(round(x*100, 2)) + "%"
+
+
+
+def sample_lines_by_offsets(
+    GWAS_FILE_o: BinaryIO,
+    data_start: int,
+    file_size: int,
+    sample_size: int,
+    rng: np.random.Generator,
+) -> Tuple[List[bytes], np.ndarray]:
+    """
+    Samples lines of a plain text file by seeking to uniformly random byte offsets after the header
+    and taking the line each offset falls into.
+
+    This way, a line is picked with the probability proportional to its length,
+    so each line is returned along with its weight 1/length, which makes weighted estimates unbiased.
+    Lines are sampled with replacement.
+
+    Returns
+    -------
+    (lines, weights) : Tuple[List[bytes], np.ndarray]
+        sampled lines, each ending with "\\n", and float64 array of their weights
+    """
+    if file_size <= data_start:
+        return [], np.zeros(0)
+
+    # sorted offsets make the reads go forward through the file
+    offsets = np.sort(rng.integers(data_start, file_size, size=sample_size))
+
+    lines: List[bytes] = []
+    weights = np.zeros(len(offsets))
+    for i, offset in enumerate(tqdm(offsets.tolist(), desc="sampling entries ")):
+        line = read_line_at_offset(GWAS_FILE_o, offset, data_start)
+        weights[i] = 1 / len(line)
+        lines.append(line.rstrip(b'\r\n') + b'\n')
+    return lines, weights
+
+
+def sample_lines_by_reservoir(
+    GWAS_FILE_o: BinaryIO,
+    sample_size: int,
+    rng: np.random.Generator,
+) -> Tuple[List[bytes], int]:
+    """
+    Samples lines of a stream (e.g. a decompressed gzip file) uniformly without replacement,
+    reading it only once and keeping at most `sample_size` lines in memory.
+
+    Each line gets a random key, and lines with the `sample_size` smallest keys are kept (reservoir sampling).
+    Only chunks with a line whose key is small enough to get into the reservoir are split into lines.
+
+    Returns
+    -------
+    (lines, num_of_lines) : Tuple[List[bytes], int]
+        sampled lines, each ending with "\\n", and the total number of lines after the header
+    """
+    reservoir_keys = np.zeros(0)
+    reservoir_lines: List[bytes] = []
+    num_of_lines = 0
+
+    pbar = tqdm(desc="sampling entries ")
+    for chunk_i, chunk in enumerate(read_chunks_of_lines(GWAS_FILE_o, CHUNK_SIZE)):
+        if chunk_i == 0:
+            # skip the first line that is the header
+            chunk = chunk[chunk.index(b'\n')+1:]
+
+        n = chunk.count(b'\n')
+        num_of_lines += n
+        pbar.update(n)
+
+        keys = rng.random(n)
+        threshold = reservoir_keys.max() if len(reservoir_keys) >= sample_size else np.inf
+        candidates = np.flatnonzero(keys < threshold)
+        if len(candidates) == 0:
+            continue
+
+        chunk_lines = chunk.split(b'\n')
+        keys = np.concatenate((reservoir_keys, keys[candidates]))
+        lines = reservoir_lines + [chunk_lines[i] + b'\n' for i in candidates.tolist()]
+        if len(keys) > sample_size:
+            kept = np.argpartition(keys, sample_size)[:sample_size]
+            keys = keys[kept]
+            lines = [lines[i] for i in kept.tolist()]
+        reservoir_keys, reservoir_lines = keys, lines
+    pbar.close()
+
+    return reservoir_lines, num_of_lines
+
+
+
+def sample_GWASSS_entries(
+    GWAS_FILE: str,
+    FORMAT_OR_CONFIG_FILE: str = "standard",
+    REPORT_DIR: Union[str, None] = None,
+    SAMPLE_SIZE: int = 10000,
+    CONFIDENCE: float = 0.95,
+    SEED: Union[int, None] = None,
+):
+    """
+    Estimates the proportions of entries with each of the issues in the GWAS summary stats file
+    from a uniform random sample of its entries, with binomial confidence intervals.
+
+    Entries of the sample are checked the same way as in `validate_GWASSS_entries`.
+    For a plain text file, only the sampled lines are read, so the run time depends on the sample size and not on the file size.
+    Compressed files are decompressed and scanned through once, but only the sampled lines are checked.
+
+    Parameters
+    ----------
+    GWAS_FILE : str
+        GWAS summary statistics file in tsv or tsv.gz format
+
+    FORMAT_OR_CONFIG_FILE : str | "standard"
+        Either:
+         - path to json config file specifying which columns are which
+         - string "standard", which means the input file is in the internal "standard" format (e.g. formatted with fix or sort commands)
+
+    REPORT_DIR : str | None
+        If set, is a dir name where the estimates will be saved (sample_summary.json)
+
+    SAMPLE_SIZE : int
+        Number of entries to sample
+
+    CONFIDENCE : float
+        Confidence level of the intervals, between 0 and 1
+
+    SEED : int | None
+        Seed for the random generator, to reproduce a sample
+    """
+
+    if REPORT_DIR is None:
+        REPORT_ABS_DIR = None
+    else:
+        REPORT_ABS_DIR = os.path.abspath(REPORT_DIR)
+
+    if not file_exists(GWAS_FILE):
+        raise ValueError(f"passed GWAS SS file doesn't exist at path {GWAS_FILE}")
+
+    if SAMPLE_SIZE < 1:
+        raise ValueError("Sample size has to be a positive number")
+
+    if not 0 < CONFIDENCE < 1:
+        raise ValueError("Confidence level has to be between 0 and 1")
+
+    mime: str = magic.from_file(GWAS_FILE, mime=True)
+    if mime == 'application/gzip' or mime == 'application/x-gzip':
+        GWAS_FILE_o: BinaryIO = gzip.open(GWAS_FILE, 'rb')  # type: ignore # GzipFile is a binary file object
+        sampling: Literal['offsets', 'reservoir'] = 'reservoir'
+    elif mime == 'text/plain':
+        GWAS_FILE_o = open(GWAS_FILE, 'rb')
+        sampling = 'offsets'
+    elif mime == 'inode/x-empty':
+        raise FileNotFoundError('The provided file is empty!')
+    else:
+        raise ValueError(f"Got unexpected type of file: {mime}")
+
+
+    if FORMAT_OR_CONFIG_FILE == "standard":
+        cols_i: Dict[str, int] = {STANDARD_COLUMN_ORDER[i]: i for i in range(len(STANDARD_COLUMN_ORDER))}
+    else:
+        if not file_exists(FORMAT_OR_CONFIG_FILE):
+            raise ValueError(f"passed GWAS SS file doesn't have the corresponding json config file at path: {FORMAT_OR_CONFIG_FILE}. Please create one based on the config.example.json file")
+        cols_i: Dict[str, int] = json.load(open(FORMAT_OR_CONFIG_FILE,))
+
+    separator = '\t'
+
+    rng = np.random.default_rng(SEED)
+
+
+
+    # # # # # # # # # # # # # # # # # # # # # # # # # #
+    #                                                 #
+    #                      MAIN                       #
+    #                                                 #
+    # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+    MAIN_start_time = time.time()
+
+
+    #
+    # STEP #1
+    #    draw the sample of lines
+    #
+
+    if sampling == 'offsets':
+        file_size = os.path.getsize(GWAS_FILE)
+        data_start = len(read_line_at_offset(GWAS_FILE_o, 0))
+        lines, weights = sample_lines_by_offsets(GWAS_FILE_o, data_start, file_size, SAMPLE_SIZE, rng)
+
+        # mean of 1/length over lines picked proportionally to their lengths
+        # estimates the number of lines per byte
+        estimated_entries = round((file_size - data_start) * weights.mean()) if len(lines) else 0
+    else:
+        lines, estimated_entries = sample_lines_by_reservoir(GWAS_FILE_o, SAMPLE_SIZE, rng)
+        weights = np.ones(len(lines))
+
+    GWAS_FILE_o.close()
+
+    if not lines:
+        raise ValueError("The provided file doesn't have any entries")
+
+
+    #
+    # STEP #2
+    #    check the sampled entries and estimate the proportions of issues
+    #
+
+    SNPs_pval, SNPs_report, SNPs_issues = check_rows(b''.join(lines), cols_i, separator)
+    assert len(SNPs_report) == len(lines), "each sampled line has to be checked as exactly one entry"
+
+    # effective size of a weighted sample (Kish), equals the sample size when all weights are the same
+    effective_sample_size = weights.sum()**2 / (weights**2).sum()
+
+    def estimate(has_issue: np.ndarray) -> Dict[str, float]:
+        rate = float(np.dot(weights, has_issue) / weights.sum())
+
+        # entries with an issue may be much shorter than others (e.g. empty lines) and have larger weights,
+        # so the sample size that gives the same variance of the weighted estimate is found for each issue separately
+        variance = float(np.dot(weights**2, (has_issue - rate)**2) / weights.sum()**2)
+        n = rate*(1-rate)/variance if variance > 0 else effective_sample_size
+
+        low, high = binomial_confidence_interval(rate, n, CONFIDENCE)
+        return {"rate": rate, "low": low, "high": high}
+
+    estimates: Dict[str, Dict[str, float]] = {}
+    for issue_i in ISSUES:
+        estimates[ISSUES_LABELS[issue_i]] = estimate(SNPs_issues[:, issue_i])
+    estimates["pval"] = estimate(SNPs_report == MISSING_P_VALUE)
+    estimates["invalid entry"] = estimate(SNPs_report != GOOD_ENTRY)
+
+    print(f"{'estimated' if sampling == 'offsets' else 'total'} number of entries: {estimated_entries}")
+    print(f"estimated proportions of issues from a sample of {len(lines)} entries ({perc(CONFIDENCE)} confidence intervals):")
+    for issue, e in estimates.items():
+        print(f"    {issue}: {perc(e['rate'])} ({perc(e['low'])} — {perc(e['high'])})")
+
+
+    #
+    # STEP #3
+    #    save the estimates
+    #
+
+    if REPORT_ABS_DIR:
+        if not dir_exists(REPORT_ABS_DIR):
+            os.makedirs(REPORT_ABS_DIR)
+
+        write_sample_summary_to_dir({
+            "file": GWAS_FILE.split('/')[-1],
+            "source": get_file_signature(GWAS_FILE),
+            "sampling": sampling,
+            "sample_size": len(lines),
+            "effective_sample_size": float(effective_sample_size),
+            "estimated_total_entries": int(estimated_entries),
+            "confidence": CONFIDENCE,
+            "issues": estimates,
+        }, REPORT_ABS_DIR)
+
+    # print("=== MAIN: %s seconds ===" % (time.time() - MAIN_start_time))
+
+
+
+if __name__ == "__main__":
+    GWAS_FILE = sys.argv[1]
+    FORMAT_OR_CONFIG_FILE = sys.argv[2]
+    REPORT_DIR = sys.argv[3]
+    SAMPLE_SIZE = int(sys.argv[4])
+
+    sample_GWASSS_entries(GWAS_FILE, FORMAT_OR_CONFIG_FILE, REPORT_DIR, SAMPLE_SIZE)
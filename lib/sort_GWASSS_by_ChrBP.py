@@ -3,12 +3,13 @@ import sys
 import os
 
 # local
-from lib.utils import run_bash
+from lib.utils import run_bash, run_bash_into
+from lib.file import BGZF_DEFAULT_LEVEL, open_output
 from lib.standard_column_order import STANDARD_COLUMN_ORDER
 
 
 
-def sort_GWASSS_by_ChrBP(GWAS_FILE: str, OUTPUT_FILE: str):
+def sort_GWASSS_by_ChrBP(GWAS_FILE: str, OUTPUT_FILE: str, COMPRESS_LEVEL: int = BGZF_DEFAULT_LEVEL):
     """
     Sorts formatted GWAS summary stats file by two columns: chromosome and base pair position.
 
@@ -18,7 +19,11 @@ def sort_GWASSS_by_ChrBP(GWAS_FILE: str, OUTPUT_FILE: str):
         GWAS summary statistics file in the internal \"standard\" tsv format
 
     OUTPUT_FILE : str
-        output file name, GWAS summary statistics file in the internal \"standard\" tsv format sorted by Chr and BP
+        output file name, GWAS summary statistics file in the internal \"standard\" tsv format sorted by Chr and BP.
+        If it ends with .gz or .bgz, the sorted rows are compressed as BGZF as they come out of `cut`
+
+    COMPRESS_LEVEL : int
+        compression level of a .gz or .bgz output file
     """
 
     if not os.path.isfile(GWAS_FILE):
@@ -91,23 +96,17 @@ def sort_GWASSS_by_ChrBP(GWAS_FILE: str, OUTPUT_FILE: str):
     #    Specifically, sorts:
     #        1. alphabetically by the first column (chromosome order key)
     #        2. and numerically by the third column (BP)
-    #    and preserves the header
+    #    and preserves the header.
+    #
+    #    FINALLY, cuts the temporary column as the rows come out of sort, leaving properly sorted file,
+    #     and removes the intermediate file
     #
-
-    sorted_GWAS_FILE_w_col = GWAS_FILE + "_chr-order-key_sorted.tsv"
 
     # once to shift to 1-indexed, once to account for prepended chr_order column
     BP_col_i = STANDARD_COLUMN_ORDER.index('BP') + 1 + 1
-    run_bash(f'(head -n 1 "{GWAS_FILE_w_col}" && tail -n +2 "{GWAS_FILE_w_col}" | LC_ALL=C sort -t $\'\\t\' -k1,1 -k{BP_col_i},{BP_col_i}n) > "{sorted_GWAS_FILE_w_col}"')
-
-
-    #
-    # STEP #3
-    #    FINALLY, cuts the temporary column after the sorting, leaving properly sorted file.
-    #     and removes the intermediate files
-    #
-    run_bash(f"cut -d$'\t' -f2- \"{sorted_GWAS_FILE_w_col}\" > \"{OUTPUT_FILE}\"")
-    run_bash(f'rm "{GWAS_FILE_w_col}" "{sorted_GWAS_FILE_w_col}"')
+    with open_output(OUTPUT_FILE, COMPRESS_LEVEL) as OUTPUT_FILE_o:
+        run_bash_into(f'(head -n 1 "{GWAS_FILE_w_col}" && tail -n +2 "{GWAS_FILE_w_col}" | LC_ALL=C sort -t $\'\\t\' -k1,1 -k{BP_col_i},{BP_col_i}n) | cut -d$\'\\t\' -f2-', OUTPUT_FILE_o)
+    run_bash(f'rm "{GWAS_FILE_w_col}"')
 
 
 
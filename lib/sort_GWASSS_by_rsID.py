@@ -3,14 +3,16 @@ import sys
 import os
 
 # local
-from lib.utils import run_bash
+from lib.utils import run_bash_into
+from lib.file import BGZF_DEFAULT_LEVEL, open_output
 from lib.standard_column_order import STANDARD_COLUMN_ORDER
 
 
 
-def sort_GWASSS_by_rsID(GWAS_FILE: str, OUTPUT_FILE: str):
+def sort_GWASSS_by_rsID(GWAS_FILE: str, OUTPUT_FILE: str, COMPRESS_LEVEL: int = BGZF_DEFAULT_LEVEL):
     """
-    Sorts formatted GWAS summary stats file by two columns: chromosome and base pair position.
+    Sorts formatted GWAS summary stats file by rsID, in the order of their numbers, the same way dbSNP2 is sorted (see `parse_rsID`).
+    Rows which rsID isn't "rs" followed by a number are never looked up in dbSNP2, so their place in the order doesn't matter
 
     Parameters
     ----------
@@ -18,14 +20,19 @@ def sort_GWASSS_by_rsID(GWAS_FILE: str, OUTPUT_FILE: str):
         GWAS summary statistics file in the internal \"standard\" tsv format
 
     OUTPUT_FILE : str
-        output file name, GWAS summary statistics file in the internal \"standard\" tsv format sorted by rsID
+        output file name, GWAS summary statistics file in the internal \"standard\" tsv format sorted by rsID.
+        If it ends with .gz or .bgz, the sorted rows are compressed as BGZF as they come out of `sort`
+
+    COMPRESS_LEVEL : int
+        compression level of a .gz or .bgz output file
     """
 
     if not os.path.isfile(GWAS_FILE):
         raise ValueError(f"passed GWAS SS file doesn't exist at path {GWAS_FILE}")
 
     rsID_col_i = STANDARD_COLUMN_ORDER.index('rsID') + 1
-    run_bash(f'(head -n 1 "{GWAS_FILE}" && tail -n +2 "{GWAS_FILE}" | LC_ALL=C sort -t $\'\\t\' -k{rsID_col_i},{rsID_col_i}) > \"{OUTPUT_FILE}\"')
+    with open_output(OUTPUT_FILE, COMPRESS_LEVEL) as OUTPUT_FILE_o:
+        run_bash_into(f'head -n 1 "{GWAS_FILE}" && tail -n +2 "{GWAS_FILE}" | LC_ALL=C sort -t $\'\\t\' -k{rsID_col_i}.3,{rsID_col_i}n', OUTPUT_FILE_o)
 
 
 
@@ -1,8 +1,10 @@
 # standard library
-from subprocess import run, PIPE
+from subprocess import run, Popen, PIPE
 from typing import Dict, List, TypedDict
 import os
+import io
 import shutil
+import tempfile
 
 
 
@@ -52,6 +54,33 @@ def run_bash_rich(bash_code: str):
     """Runs a given bash code, returns stdout, stderr, and exit code"""
     return run_cmd_rich(['bash', '-c', bash_code])
 
+def run_bash_into(bash_code: str, OUTPUT_FILE_o):
+    """
+    Safely runs a given bash code, and writes its stdout into the file object, and nicely fails on a non-zero exit code.
+    The stdout goes right into the file if it's a file on the disk, otherwise it's written by blocks (e.g. to be compressed)
+    """
+    with tempfile.TemporaryFile() as stderr_o:
+        if isinstance(OUTPUT_FILE_o, io.IOBase):
+            OUTPUT_FILE_o.flush()
+            returncode = run(['bash', '-c', bash_code], stdout=OUTPUT_FILE_o, stderr=stderr_o).returncode
+        else:
+            with Popen(['bash', '-c', bash_code], stdout=PIPE, stderr=stderr_o) as process:
+                while True:
+                    block = process.stdout.read(1 << 20) # type: ignore # stdout is a pipe
+                    if not block:
+                        break
+                    OUTPUT_FILE_o.write(block)
+            returncode = process.returncode
+
+        if returncode != 0:
+            error_message = f"command \"bash\" finished with exit code: {returncode}"
+            stderr_o.seek(0)
+            stderr = stderr_o.read().decode('utf-8')
+            if stderr:
+                error_message += "\nand produced the following error message:\n"
+                error_message += stderr
+            raise ChildProcessError(error_message)
+
 
 def rm(file: str):
     try:
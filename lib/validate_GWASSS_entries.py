@@ -1,27 +1,36 @@
 # standard library
 import sys
-import re
-from typing import Any, Dict, List, Literal, Tuple, Union
+from typing import Any, BinaryIO, Deque, Dict, Iterable, Iterator, List, Literal, Tuple, Union
 import os
+import io
 import json
-import subprocess
 import time
 import gzip
-import io
+import multiprocessing
+from collections import deque
 
 # third-party libraries
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patheffects as path_effects
 import magic
 from tqdm import tqdm
 
 # local
-from lib.utils import run_bash
-from lib.report_utils import write_report_to_dir
+from lib.file import BGZF_DEFAULT_LEVEL, read_chunks_of_lines, is_bgzf, open_output, split_into_ranges_of_lines, split_bgzf_into_ranges, read_bgzf_range_of_lines
+from lib.report_utils import (
+    write_report_to_dir, write_summary_to_dir, get_file_signature, IssuesBitmaskWriter,
+    get_entries_cache_path, EntriesCacheWriter, read_entries_cache,
+)
 from lib.standard_column_order import STANDARD_COLUMN_ORDER
+from lib.validation_utils import (
+    GOOD_ENTRY, MISSING_P_VALUE, INVALID_ENTRY,
+    ISSUES, ISSUES_LABELS,
+    check_rows, get_issues_bitmask, get_issues_from_bitmask,
+)
 
 
+# size in bytes of chunks of lines that are read and checked at once
+CHUNK_SIZE = 2 * 1024 * 1024
+
 
 def file_exists(path: str):
     return os.path.isfile(path)
@@ -36,395 +45,222 @@ def perc(x, total):
 
 
 
-def validate_GWASSS_entries(
-    GWAS_FILE: str,
-    FORMAT_OR_CONFIG_FILE: str = "standard",
-    REPORT_DIR: Union[str, None] = None,
-    TICK_LABELS: List[str] = ["0", "1e-8", "1e-5", "1e-3", ".03", ".3", "1"],
-    TICKS_WIDTH_RULE: Literal['even', 'log10'] = 'log10',
-):
-    """
-    Loops through the GWAS summary stats file and analyses which data points are missing or invalid.
-    Then, creates a report, showing the proportions of missing or invalid data points with respect to the statistical significance (p-value)
+# with multiple processes, the file is split into this many parts per process,
+# so that processes that are done earlier pick up the remaining parts
+SHARDS_PER_PROCESS = 4
 
-    Parameters
-    ----------
-    GWAS_FILE : str
-        GWAS summary statistics file in tsv or tsv.gz format
-
-    JSON_CONFIG : str | "standard"
-        Either:
-         - path to json config file specifying which columns are which
-         - string "standard", which means the input file is in the internal "standard" format (e.g. formatted with fix or sort commands)
+# upper limit for the size in bytes of a part of the file (compressed size for BGZF),
+# which keeps the memory used by each process independent of the file size
+MAX_SHARD_SIZE = 16 * 1024 * 1024
 
-    REPORT_DIR : str | None
-        If set, is a dir name where textual and graphical reports will be saved.
-        Otherwise, doesn't save any reports into the fs but only pops up a graphical report in matplotlib plots
-
-    TICK_LABELS : List[str]
-        p-value interval tick points for the stacked histogram plot.
-
-        List of strings with numerical values between 0 and 1 in ascending order. Sets the tick labels for the stacked histogram plot.
-        Actual ticks' numerical values will be inferred from the strings.
+# number of SNPs; bins with missing p-value, valid, and invalid entries; bins with the number of each issue; total number of each issue
+EntriesCounts = Tuple[int, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
 
-    TICKS_WIDTH_RULE : 'even' | 'log10'
-        Sets the rule for calculation of width of bins in the stacked histogram.
+# arrays with a value for each entry of a chunk, besides the counts:
+#  - "bitmask": bitmask of issues for loop_fix
+#  - "pval", "report", "issues": validated entries for the cache (issues are packed with `get_issues_bitmask`)
+ChunkArrays = Dict[str, np.ndarray]
 
-        With 'even', all bars will have unit width, regardless of the numerical difference between ticks.
 
-        With 'log10', all bars will have widths adjusted in accord to log10 scale.
-        If the very first tick is zero, then the bin size from zero to the next tick equals to distance between 1e-4 and 1.
+def count_entries(
+    SNPs_pval: np.ndarray,
+    SNPs_report: np.ndarray,
+    SNPs_issues: np.ndarray,
+    ticks: List[float],
+) -> EntriesCounts:
     """
+    Counts how many entries are valid, don't have p-value, or invalid for other reasons,
+    for each p-value interval between the ticks.
 
-    if REPORT_DIR is None:
-        REPORT_ABS_DIR = None
-    else:
-        REPORT_ABS_DIR = os.path.abspath(REPORT_DIR)
-
-    if not file_exists(GWAS_FILE):
-        raise ValueError(f"passed GWAS SS file doesn't exist at path {GWAS_FILE}")
-
-    mime: str = magic.from_file(GWAS_FILE, mime=True)
-    if mime == 'application/gzip' or mime == 'application/x-gzip':
-        GWAS_FILE_o_gz: io.RawIOBase = gzip.open(GWAS_FILE, 'r')  # type: ignore # GzipFile and RawIOBase _are_ in fact compatible
-        GWAS_FILE_o = io.TextIOWrapper(io.BufferedReader(GWAS_FILE_o_gz))
-    elif mime == 'text/plain':
-        GWAS_FILE_o = open(GWAS_FILE, 'r')
-    elif mime == 'inode/x-empty':
-        raise FileNotFoundError('The provided file is empty!')
-    else:
-        raise ValueError(f"Got unexpected type of file: {mime}")
-
-
-    if FORMAT_OR_CONFIG_FILE == "standard":
-        cols_i: Dict[str, int] = {STANDARD_COLUMN_ORDER[i]: i for i in range(len(STANDARD_COLUMN_ORDER))}
-    else:
-        if not file_exists(FORMAT_OR_CONFIG_FILE):
-            raise ValueError(f"passed GWAS SS file doesn't have the corresponding json config file at path: {FORMAT_OR_CONFIG_FILE}. Please create one based on the config.example.json file")
-        cols_i: Dict[str, int] = json.load(open(FORMAT_OR_CONFIG_FILE,))
-
-
-    separator = '\t'
+    An entry with a p-value goes to the first bin `j` (starting from 1) such that p-value <= ticks[j].
+    Entries with p-value above the last tick aren't counted in bins.
 
-    x = TICK_LABELS
-
-    # p-value interval points:
-    ticks = [float(x_label) for x_label in x]
-
-    if not (  ticks == sorted(ticks) and len(ticks) == len(set(ticks))   ):
-        raise ValueError("Ticks have to be in strictly ascending order")
-    
-    if not (  ticks[0] >= 0 and ticks[-1] <= 1   ):
-        raise ValueError("Ticks have to be in range from 0 to 1")
-
-
-
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-    #                                                 #
-    #                    CONSTANTS                    #
-    #                                                 #
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-
-    GOOD_ENTRY = 0
-    MISSING_P_VALUE = 1
-    INVALID_ENTRY = 2
-
-
-    # indices for boolean values in a list of issues for each SNP
-    INVALID_ROW = 0
-    INVALID_RSID = 1
-    INVALID_CHR = 2
-    INVALID_BP = 3
-    INVALID_EA = 4
-    INVALID_OA = 5
-    INVALID_EAF = 6
-    INVALID_SE = 7
-    INVALID_ES = 8
-    ISSUES=[
-        INVALID_ROW,
-        INVALID_RSID,
-        INVALID_CHR,
-        INVALID_BP,
-        INVALID_EA,
-        INVALID_OA,
-        INVALID_EAF,
-        INVALID_SE,
-        INVALID_ES,
-    ]
-    ISSUES_LABELS = [
-        "format",
-        "rsID",
-        "Chr",
-        "BP",
-        "EA",
-        "OA",
-        "EAF",
-        "SE",
-        "beta",
-    ]
-    ISSUES_COLORS=[
-        "#ff0000", # format
-        "#777ae5", # rsID
-        "#cf44a1", # Chr
-        "#ff4481", # BP
-        "#ffa121", # EA
-        "#ff9191", # OA
-        "#fdbc64", # EAF
-        "#563E3E", # std. err.
-        "#175a63", # beta
-
-    ]
-
-    NUCLEOTIDES = ['a', 't', 'c', 'g']
-    NO_NUCLEOTIDE = '-'
-
-    ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS = True
-
-    CATEGORY_CHR = [
-    '1', '01', '2', '02', '3', '03', '4', '04', '5', '05', '6', '06', '7', '07', '8', '08', '9', '09',
-    '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20',
-    '21', '22', '23', 'X', 'x', 'Y', 'y', 'M', 'm']
-    # CATEGORY_CHR = [
-    # '1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20',
-    # '21', '22', '23', 'X', 'x', 'Y', 'y', 'M', 'm']
-
-
-
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-    #                                                 #
-    #                    FUNCTIONS                    #
-    #                                                 #
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-
-    # https://stackoverflow.com/a/850962/6041933  # a comment to the answer
-    # https://gist.github.com/zed/0ac760859e614cd03652
-    def wccount(filename: str):
-        """counts the number of lines in the file"""
-        if mime == 'application/gzip' or mime == 'application/x-gzip':
-            out = run_bash(f'gunzip -c "{filename}" | wc -l')
-        else:
-            out = run_bash(f'wc -l "{filename}"')
-        return int(out.partition(' ')[0])
-
-    def is_null(val: str) -> bool:
-        return val.lower() in ["", " ", ".", "-", "na", "nan"]
-
-
-
-
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-    #                                                 #
-    #       FUNCTION THAT CHECKS EACH SNP ENTRY       #
-    #                                                 #
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-
-    def check_row(line_cols: List[str]) -> Union[
-            # "good" entry
-            Tuple[float, Literal[0], List[bool]],
-            # "missing/invalid p-value" entry
-            Tuple[None,  Literal[1], List[bool]],
-            # "invalid" entry, having some issues (listed in the list)
-            Tuple[float, Literal[2], List[bool]],
-        ]:
-        """
-        This function runs for EVERY LINE of the input file,
-        which may be MILLIONS OF TIMES per script execution
-
-        Returns:
-            - a p-value of a SNP,
-            - a report of whether a SNP entry is valid,
-            - and a list of issues with it
-        """
-
-        issues = [False] * len(ISSUES)
-        missing_pvalue = False
-
-        ### First check if p-value itself is present ###
-        pval = None
-        try:
-            pval = line_cols[cols_i["pval"]]
-            if is_null(pval) or not (0 <= float(pval) <= 1):
-                missing_pvalue = True
-            pval = float(pval)
-        except:
-            pval = None
-            missing_pvalue = True
-
-
-        ### Try getting all columns. If some not present, will throw ###
-        try:
-            rsid  = line_cols[cols_i["rsID"]]
-            chrom = line_cols[cols_i["Chr"]]
-            bp    = line_cols[cols_i["BP"]]
-            ea    = line_cols[cols_i["EA"]]
-            oa    = line_cols[cols_i["OA"]]
-            af    = line_cols[cols_i["EAF"]]
-            se    = line_cols[cols_i["SE"]]
-            es    = line_cols[cols_i["beta"]]
-            # n     = line_cols[cols_i["N"]]
-
-        except:
-            issues[INVALID_ROW] = True
-            if missing_pvalue:
-                return None, MISSING_P_VALUE, issues
-            else:
-                assert pval is not None
-                return pval, INVALID_ENTRY, issues # pval is None
+    Returns
+    -------
+    tuple (num_of_snps, missing_pval_bins, good_entry_bins, invalid_entry_bins, invalid_entry_bins_reason_bins, issues_count_arr)
+        Counts for separate parts of a file can be added up with `add_up_counts`
+    """
+    n_bins = len(ticks)
 
-        ### Check any reasons this SNP will be discarded later ###
+    # index of the bin for each entry, with `n_bins` for p-values above the last tick (or NaN)
+    SNPs_bin = np.maximum(np.searchsorted(ticks, SNPs_pval, side='left'), 1)
 
-        # 1. rsID
-        try:
-            if not re.match("^rs\d+$", rsid):
-                issues[INVALID_RSID] = True
-        except:
-            issues[INVALID_RSID] = True
+    missing_pval_bins = np.zeros(n_bins, dtype=int)
+    missing_pval_bins[0] = np.count_nonzero(SNPs_report == MISSING_P_VALUE)
 
-        # 2. chromosome
-        try:
-            if chrom not in CATEGORY_CHR and chrom[3:] not in CATEGORY_CHR:
-                issues[INVALID_CHR] = True
-        except:
-            issues[INVALID_CHR] = True
+    good_entries_bin = SNPs_bin[SNPs_report == GOOD_ENTRY]
+    good_entry_bins = np.bincount(good_entries_bin, minlength=n_bins+1)[:n_bins]
 
-        # 3. base pair position
-        try:
-            bp = int(float(bp)) # using float allows sci notation string
-            if bp < 0:
-                issues[INVALID_BP] = True
-        except:
-            issues[INVALID_BP] = True
+    is_invalid = SNPs_report == INVALID_ENTRY
+    invalid_entries_bin = SNPs_bin[is_invalid]
+    invalid_entry_bins = np.bincount(invalid_entries_bin, minlength=n_bins+1)[:n_bins]
 
-        # 4. effect allele
-        try:
-            if ea == '':
-                issues[INVALID_EA] = True
-            elif ea == NO_NUCLEOTIDE:
-                issues[INVALID_EA] = False
-            elif ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS:
-                for char in ea.lower():
-                    if char not in NUCLEOTIDES:
-                        issues[INVALID_EA] = True
-            else:
-                if ea.lower() not in NUCLEOTIDES:
-                    issues[INVALID_EA] = True
-        except:
-            issues[INVALID_EA] = True
+    # besides total, for each of the bin we'll store the number of invalid entries for each type
+    invalid_entries_issues = SNPs_issues[is_invalid]
+    invalid_entry_bins_reason_bins = np.zeros((n_bins, max(ISSUES)+1), dtype=int)
+    for issue_i in ISSUES:
+        invalid_entry_bins_reason_bins[:, issue_i] = np.bincount(
+            invalid_entries_bin[invalid_entries_issues[:, issue_i]], minlength=n_bins+1
+        )[:n_bins]
+
+    return (
+        len(SNPs_report),
+        missing_pval_bins,
+        good_entry_bins,
+        invalid_entry_bins,
+        invalid_entry_bins_reason_bins,
+        np.count_nonzero(SNPs_issues, axis=0),
+    )
 
-        # 5. other allele
-        try:
-            if oa == '':
-                issues[INVALID_OA] = True
-            elif oa == NO_NUCLEOTIDE:
-                issues[INVALID_OA] = False
-            elif ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS:
-                for char in oa.lower():
-                    if char not in NUCLEOTIDES:
-                        issues[INVALID_OA] = True
-            else:
-                if oa.lower() not in NUCLEOTIDES:
-                    issues[INVALID_OA] = True
-        except:
-            issues[INVALID_OA] = True
 
-        # 6. effect allele frequency or minor allele frequency
-        try:
-            if not (0 <= float(af) <= 1):
-                issues[INVALID_EAF] = True
-        except:
-            issues[INVALID_EAF] = True
+def add_up_counts(a: Union[EntriesCounts, None], b: EntriesCounts) -> EntriesCounts:
+    if a is None:
+        return b
+    return tuple(a_i + b_i for a_i, b_i in zip(a, b)) # type: ignore # same structure as a and b
 
-        # 7. standard error
-        try:
-            float(se) # will throw if not float
-            if is_null(se):
-                issues[INVALID_SE] = True
-        except:
-            issues[INVALID_SE] = True
 
-        # 8. effect size (odds ratio or beta-value)
-        try:
-            float(es) # will throw if not float
-            if is_null(es):
-                issues[INVALID_ES] = True
-        except:
-            issues[INVALID_ES] = True
-
-        # # 9. n - sample size
-        # #sometimes sample size is fractional
-        # if null_entry(n) or not (0 < float(n)):
-        #     return INVALID_ENTRY, pval
-
-        if missing_pvalue:
-            return None, MISSING_P_VALUE, issues
-        else:
-            assert pval is not None
-            if any(issues):
-                return pval, INVALID_ENTRY, issues
-            else:
-                # all good?
-                return pval, GOOD_ENTRY, issues
+def empty_counts(ticks: List[float]) -> EntriesCounts:
+    return count_entries(np.zeros(0), np.zeros(0, dtype=np.int8), np.zeros((0, max(ISSUES)+1), dtype=np.bool_), ticks)
 
 
+def validate_chunk_of_lines(
+    chunk: bytes,
+    cols_i: Dict[str, Any],
+    separator: str,
+    ticks: List[float],
+    with_bitmask: bool = False,
+    with_entries: bool = False,
+) -> Tuple[EntriesCounts, ChunkArrays]:
+    """
+    Validates entries in a chunk of lines and counts them.
+    Also returns the bitmask of issues for each entry if `with_bitmask` is set,
+    and the validated entries if `with_entries` is set (see `ChunkArrays`)
+    """
+    arrays: ChunkArrays = {}
+    if with_bitmask:
+        SNPs_pval, SNPs_report, SNPs_issues, arrays["bitmask"] = check_rows(chunk, cols_i, separator, with_bitmask=True)
+    else:
+        SNPs_pval, SNPs_report, SNPs_issues = check_rows(chunk, cols_i, separator)
+    if with_entries:
+        arrays["pval"] = SNPs_pval
+        arrays["report"] = SNPs_report
+        arrays["issues"] = get_issues_bitmask(SNPs_report, SNPs_issues)
+    return count_entries(SNPs_pval, SNPs_report, SNPs_issues, ticks), arrays
+
+
+def count_cached_entries(arrays: ChunkArrays, ticks: List[float]) -> EntriesCounts:
+    return count_entries(arrays["pval"], arrays["report"], get_issues_from_bitmask(arrays["issues"]), ticks)
+
+
+def count_chunks_of_lines(
+    chunks: Iterator[bytes],
+    cols_i: Dict[str, Any],
+    separator: str,
+    ticks: List[float],
+    with_bitmask: bool = False,
+    with_entries: bool = False,
+) -> Tuple[EntriesCounts, ChunkArrays]:
+    counts: Union[EntriesCounts, None] = None
+    arrays: Dict[str, List[np.ndarray]] = {}
+    for chunk in chunks:
+        chunk_counts, chunk_arrays = validate_chunk_of_lines(chunk, cols_i, separator, ticks, with_bitmask, with_entries)
+        counts = add_up_counts(counts, chunk_counts)
+        for name, array in chunk_arrays.items():
+            arrays.setdefault(name, []).append(array)
+    if counts is None:
+        counts, empty_arrays = validate_chunk_of_lines(b'', cols_i, separator, ticks, with_bitmask, with_entries)
+        arrays = {name: [array] for name, array in empty_arrays.items()}
+    return counts, {name: np.concatenate(arrays_list) for name, arrays_list in arrays.items()}
+
+
+def validate_range_of_lines(
+    GWAS_FILE: str,
+    compression: Literal['none', 'bgzf'],
+    range_of_lines: Tuple[int, ...],
+    cols_i: Dict[str, Any],
+    separator: str,
+    ticks: List[float],
+    with_bitmask: bool = False,
+    with_entries: bool = False,
+) -> Tuple[EntriesCounts, ChunkArrays]:
+    """
+    Validates entries in a part of the GWAS SS file and counts them (see `validate_chunk_of_lines`).
+    Is run in a separate process for each of the parts (shards) of the file.
 
+    Parameters
+    ----------
+    compression : 'none' | 'bgzf'
+        Type of the file. Plain text files are split with `split_into_ranges_of_lines`,
+        and BGZF files are split with `split_bgzf_into_ranges`
 
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
-    #                                                 #
-    #                      MAIN                       #
-    #                                                 #
-    # # # # # # # # # # # # # # # # # # # # # # # # # #
+    range_of_lines : Tuple[int, ...]
+        One of the ranges returned by the corresponding split function
+    """
+    if compression == 'bgzf':
+        lookbehind, start, end = range_of_lines
+        FILE_o: BinaryIO = io.BytesIO(read_bgzf_range_of_lines(GWAS_FILE, lookbehind, start, end))
+        chunks = read_chunks_of_lines(FILE_o, CHUNK_SIZE)
+    else:
+        start, end = range_of_lines
+        FILE_o = open(GWAS_FILE, 'rb')
+        FILE_o.seek(start)
+        chunks = read_chunks_of_lines(FILE_o, CHUNK_SIZE, end - start)
 
-    MAIN_start_time = STEP1_start_time = time.time()
+    def skip_header(chunks: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk_i, chunk in enumerate(chunks):
+            if chunk_i == 0:
+                chunk = chunk[chunk.index(b'\n')+1:]
+            yield chunk
 
+    try:
+        return count_chunks_of_lines(skip_header(chunks) if start == 0 else chunks, cols_i, separator, ticks, with_bitmask, with_entries)
+    finally:
+        FILE_o.close()
 
-    #
-    # STEP #1
-    #    read the file line by line and check the validity of each SNP entry,
-    #    and save the report and the p-value if present
-    #
 
-    num_of_lines = wccount(GWAS_FILE)
-    num_of_snps = num_of_lines - 1
-    print(f"number of lines in the file: {num_of_lines}")
 
-    line_i=0
-    # skip the first line that is the header
-    GWAS_FILE_o.readline()
-    line_i+=1
+def parse_ticks(TICK_LABELS: List[str]) -> List[float]:
+    """p-value interval points from their labels (see `validate_GWASSS_entries`)"""
+    ticks = [float(x_label) for x_label in TICK_LABELS]
 
-    SNPs_pval = np.zeros(num_of_snps, dtype=np.float64)
-    SNPs_report = np.zeros(num_of_snps, dtype=np.int8)
-    SNPs_issues = np.zeros((num_of_snps, len(ISSUES)), dtype=np.bool_)
+    if not (  ticks == sorted(ticks) and len(ticks) == len(set(ticks))   ):
+        raise ValueError("Ticks have to be in strictly ascending order")
+    
+    if not (  ticks[0] >= 0 and ticks[-1] <= 1   ):
+        raise ValueError("Ticks have to be in range from 0 to 1")
 
-    ### populate the allocated array with report for each SNP as well as its p-value ###
-    pbar = tqdm(total=num_of_snps, desc="validating entries ")
-    try:
-        snp_i = 0
-        while True:
-            SNPs_pval[snp_i], SNPs_report[snp_i], SNPs_issues[snp_i] = check_row(GWAS_FILE_o.readline().replace('\n','').split(separator))
-            snp_i += 1
-            pbar.update(1)
-
-    except Exception as e:
-        if isinstance(e, IndexError) or isinstance(e, EOFError):
-            # it reached the end of the file
-            pass
-        else:
-            print(f'An error occured on line {line_i} of the GWAS SS file (see below)')
-            raise e
-    pbar.close()
-    ### ###
+    return ticks
 
 
-    GWAS_FILE_o.close()
+def report_entries(
+    GWAS_FILE: str,
+    counts: EntriesCounts,
+    REPORT_ABS_DIR: Union[str, None],
+    TICK_LABELS: List[str],
+    TICKS_WIDTH_RULE: Literal['even', 'log10'] = 'log10',
+    PLOTS: bool = True,
+):
+    """
+    Makes the report from the counts of validated entries of the GWAS SS file (see `validate_GWASSS_entries`)
+    """
+    x = TICK_LABELS
+    ticks = parse_ticks(TICK_LABELS)
+
+    (
+        num_of_snps,
+        missing_pval_bins, good_entry_bins, invalid_entry_bins,
+        invalid_entry_bins_reason_bins,
+        issues_count_arr,
+    ) = counts
+    print(f"number of lines in the file: {num_of_snps + 1}")
     # print("--- STEP1: %s seconds ---" % (time.time() - STEP1_start_time))
 
-    # result: SNPs_report, SNPs_pval
+    # result: bins of counts for each type of entries, and issues_count_arr
 
 
     #
     # STEP #2
-    #    sum up the reports and calculate the parameters before plotting
+    #    calculate the parameters before plotting
     #
     STEP2_start_time = time.time()
 
@@ -463,8 +299,6 @@ def validate_GWASSS_entries(
     else:
         raise ValueError(f'unknown ticks_width_rule: {TICKS_WIDTH_RULE}')
 
-    negative_bars_widths = list(-np.array(bars_widths))
-
 
     # 2.2
     """
@@ -482,37 +316,6 @@ def validate_GWASSS_entries(
     assert len(ticks) == len(bars_widths) == len(ticks_loc), "lists: `ticks`, `ticks_loc`, and `bars_widths` should have the same lengths"
 
 
-    # 2.3
-    ### Counting how many entries are valid, don't have p-value, or invalid for other reasons ###
-    missing_pval_bins = [0]*len(ticks)
-    good_entry_bins = [0]*len(ticks)
-    invalid_entry_bins = [0]*len(ticks)
-    # besides total, for each of the bin we'll store the number of invalid entries for each type
-    invalid_entry_bins_reason_bins = np.zeros((len(ticks), max(ISSUES)+1)).astype(int)
-
-    pbar = tqdm(total=len(SNPs_report), desc="calculating reports")
-    for line_i in range(len(SNPs_report)):
-
-        if SNPs_report[line_i] == MISSING_P_VALUE:
-            missing_pval_bins[0] += 1
-
-        elif SNPs_report[line_i] == GOOD_ENTRY:
-            for j in range(1,len(ticks)):
-                if SNPs_pval[line_i] <= ticks[j]:
-                    good_entry_bins[j] += 1
-                    break
-
-        elif SNPs_report[line_i] == INVALID_ENTRY:
-            for j in range(1, len(ticks)):
-                if SNPs_pval[line_i] <= ticks[j]:
-                    invalid_entry_bins[j] += 1
-                    invalid_entry_bins_reason_bins[j] += SNPs_issues[line_i]
-                    break
-
-        pbar.update(1)
-    pbar.close()
-
-    ### ###
 
     # print("--- STEP2: %s seconds ---" % (time.time() - STEP2_start_time))
     # print("=== MAIN: %s seconds ===" % (time.time() - MAIN_start_time)) # plotting doesn't count
@@ -522,15 +325,9 @@ def validate_GWASSS_entries(
 
     #
     # STEP #3
-    #     save csv file with report for each issue
+    #     save csv file with report for each issue, and json file with the summary of the report
     #
 
-    if REPORT_ABS_DIR:
-        if not dir_exists(REPORT_ABS_DIR):
-            os.makedirs(REPORT_ABS_DIR)
-
-
-    issues_count_arr = np.sum(SNPs_issues, axis=0)
     issues_count: Dict[str, int] = {}
 
     for issue_i in range(0, len(ISSUES)):
@@ -546,9 +343,24 @@ def validate_GWASSS_entries(
 
     issues_count["total_entries"] = num_of_snps
 
+    summary: Dict[str, Any] = {
+        "file": GWAS_FILE.split('/')[-1],
+        "source": get_file_signature(GWAS_FILE),
+        "total_entries": int(num_of_snps),
+        "issues": {issue: int(count) for issue, count in issues_count.items() if issue != "total_entries"},
+        "tick_labels": x,
+        "bins": {
+            "missing_pval": missing_pval_bins.tolist(),
+            "valid": good_entry_bins.tolist(),
+            "invalid": invalid_entry_bins.tolist(),
+            # number of invalid entries with each of the issues for each bin
+            "issues": {ISSUES_LABELS[issue_i]: invalid_entry_bins_reason_bins[:, issue_i].tolist() for issue_i in ISSUES},
+        },
+    }
 
-    if REPORT_ABS_DIR: 
+    if REPORT_ABS_DIR:
         write_report_to_dir(issues_count, REPORT_ABS_DIR)
+        write_summary_to_dir(summary, REPORT_ABS_DIR)
 
 
 
@@ -557,164 +369,346 @@ def validate_GWASSS_entries(
     #    plot
     #
 
-    ### CALC: proportion of invalid entries in total ###
-
-    invalid_entries_totally = sum(invalid_entry_bins) + sum(missing_pval_bins)
-    proportion_of_invalid_entries_totally = invalid_entries_totally / num_of_snps
-    percentage_of_invalid_entries_totally = proportion_of_invalid_entries_totally * 100
-    percentage_of_invalid_entries_totally_str = str(np.round(percentage_of_invalid_entries_totally, 1)) + "%"
-
-
-    ### PLOT: the figure, labels, ticks, bars ###
-
-    fig, ax = plt.subplots(num="valid/invalid SNPs")
+    if PLOTS:
+        # matplotlib is only imported when plots are requested
+        from lib.report_plots import save_plots, show_plots
 
-    image_name = GWAS_FILE.split('/')[-1]
-    fig.canvas.set_window_title(image_name) # sets the window title to the filename
-
-    ax.set_title(
-        f"invalid SNPs: {invalid_entries_totally}/{num_of_snps} ({percentage_of_invalid_entries_totally_str})")
+        if REPORT_ABS_DIR:
+            save_plots(REPORT_ABS_DIR, summary, ticks_loc, bars_widths)
+        else:
+            show_plots(summary, ticks_loc, bars_widths)
 
-    # # Hide the right and top spines
-    # ax.spines['right'].set_visible(False)
-    # ax.spines['top'].set_visible(False)
 
-    ax.tick_params(axis='x', labelsize=9)
 
-    ax.set_xticks(ticks_loc)
-    ax.set_xticklabels(x)
-    ax.bar(ticks_loc, missing_pval_bins, negative_bars_widths, color='#7f7f7f', align='edge')
-    ax.bar(ticks_loc, good_entry_bins, negative_bars_widths, color='#0000ff', align='edge', label="valid SNPs")
-    ax.bar(ticks_loc, invalid_entry_bins, negative_bars_widths, color='#ff0000', align='edge', bottom=good_entry_bins, label="invalid SNPs")
-    ax.set_xlabel("p-value", fontweight="heavy", fontsize=14)
-    ax.set_ylabel("N of SNPs", fontweight="heavy", fontsize=14)
-    ax.set_xlim([ticks_loc[0]+negative_bars_widths[0], ticks_loc[-1]])
 
-    max_bar_height = max(
-        np.array(missing_pval_bins) + np.array(good_entry_bins) + np.array(invalid_entry_bins) # np arrays add element-wise
-    )
+class ValidatingWriter:
+    """
+    Writes a GWAS SS file in the internal "standard" format, and validates its entries as they are written,
+    chunk by chunk (see `validate_chunk_of_lines`). When closed, makes the same report as `validate_GWASSS_entries`,
+    without reading the file again. A .gz or .bgz file is compressed as BGZF as it's written (see `BgzfWriter`).
 
-    plt_bottom, plt_top = ax.set_ylim(0, max_bar_height*1.15 if max_bar_height else 1)
-    plt_height = plt_top - plt_bottom
+    The first line written is the header, and isn't validated
+    """
 
+    def __init__(
+        self,
+        GWAS_FILE: str,
+        REPORT_DIR: str,
+        TICK_LABELS: List[str] = ["0", "1e-8", "1e-5", "1e-3", ".03", ".3", "1"],
+        TICKS_WIDTH_RULE: Literal['even', 'log10'] = 'log10',
+        PLOTS: bool = True,
+        ISSUES_BITMASK: bool = False,
+        COMPRESS_LEVEL: int = BGZF_DEFAULT_LEVEL,
+    ):
+        self.GWAS_FILE = GWAS_FILE
+        self.REPORT_ABS_DIR = os.path.abspath(REPORT_DIR)
+        self.TICK_LABELS = TICK_LABELS
+        self.TICKS_WIDTH_RULE = TICKS_WIDTH_RULE
+        self.PLOTS = PLOTS
+        self.ticks = parse_ticks(TICK_LABELS)
+        self.cols_i: Dict[str, int] = {STANDARD_COLUMN_ORDER[i]: i for i in range(len(STANDARD_COLUMN_ORDER))}
+
+        if not dir_exists(self.REPORT_ABS_DIR):
+            os.makedirs(self.REPORT_ABS_DIR)
+        self.bitmask_writer = IssuesBitmaskWriter(self.REPORT_ABS_DIR) if ISSUES_BITMASK else None
+
+        self.FILE_o = open_output(GWAS_FILE, COMPRESS_LEVEL)
+        self.counts: Union[EntriesCounts, None] = None
+        self.header_written = False
+        # written text that isn't validated yet
+        self.pending: List[str] = []
+        self.pending_size = 0
+
+    def write(self, text: str):
+        self.FILE_o.write(text)
+        if not self.header_written:
+            if '\n' not in text:
+                # the header is written in parts
+                self.pending.append(text)
+                return
+            self.header_written = True
+            text = "".join(self.pending) + text
+            self.pending.clear()
+            text = text[text.index('\n')+1:]
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= CHUNK_SIZE:
+            self.validate_pending(last=False)
+
+    def writelines(self, texts: Iterable[str]):
+        for text in texts:
+            self.write(text)
+
+    def flush(self):
+        self.FILE_o.flush()
+
+    def validate_pending(self, last: bool):
+        if not self.header_written:
+            return
+        text = "".join(self.pending)
+        # only whole lines are validated, unless it's the end of the file
+        cut = len(text) if last else text.rfind('\n') + 1
+        rest = text[cut:]
+        self.pending = [rest] if rest else []
+        self.pending_size = len(rest)
+
+        # line endings are translated the same way as in `read_chunks_of_lines`
+        chunk = text[:cut].encode().replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        if not chunk:
+            return
+        if not chunk.endswith(b'\n'):
+            chunk += b'\n'
+        chunk_counts, chunk_arrays = validate_chunk_of_lines(chunk, self.cols_i, '\t', self.ticks, self.bitmask_writer is not None)
+        self.counts = add_up_counts(self.counts, chunk_counts)
+        if self.bitmask_writer is not None:
+            self.bitmask_writer.write(chunk_arrays["bitmask"])
+
+    def close(self):
+        self.validate_pending(last=True)
+        self.FILE_o.close()
+        if self.bitmask_writer is not None:
+            self.bitmask_writer.close()
+        report_entries(
+            self.GWAS_FILE,
+            self.counts if self.counts is not None else empty_counts(self.ticks),
+            self.REPORT_ABS_DIR, self.TICK_LABELS, self.TICKS_WIDTH_RULE, self.PLOTS,
+        )
 
-    ### CALC: points right at the middle of each bin ###
-    bins_mid_points = list(np.array(ticks_loc) - np.array(bars_widths)/2)
 
 
-    ### PLOT: caption for "no p-value" bin ###
-    ax.text(x=bins_mid_points[0], y=plt_top*-0.08, s="no\np-value",
-        horizontalalignment='center',
-    )
+def validate_GWASSS_entries(
+    GWAS_FILE: str,
+    FORMAT_OR_CONFIG_FILE: str = "standard",
+    REPORT_DIR: Union[str, None] = None,
+    TICK_LABELS: List[str] = ["0", "1e-8", "1e-5", "1e-3", ".03", ".3", "1"],
+    TICKS_WIDTH_RULE: Literal['even', 'log10'] = 'log10',
+    PROCESSES: int = 1,
+    PLOTS: bool = True,
+    ISSUES_BITMASK: bool = False,
+    CACHE_DIR: Union[str, None] = None,
+):
+    """
+    Loops through the GWAS summary stats file and analyses which data points are missing or invalid.
+    Then, creates a report, showing the proportions of missing or invalid data points with respect to the statistical significance (p-value)
 
+    Parameters
+    ----------
+    GWAS_FILE : str
+        GWAS summary statistics file in tsv or tsv.gz format
 
-    ### CALC: total entries, proportion and percentage of invalid entries  ###
+    JSON_CONFIG : str | "standard"
+        Either:
+         - path to json config file specifying which columns are which
+         - string "standard", which means the input file is in the internal "standard" format (e.g. formatted with fix or sort commands)
 
-    total_p_value_entries_bins = [good_entry_bins[i]+invalid_entry_bins[i] for i in range(len(good_entry_bins))]
+    REPORT_DIR : str | None
+        If set, is a dir name where textual and graphical reports will be saved.
+        Otherwise, doesn't save any reports into the fs but only pops up a graphical report in matplotlib plots
 
-    proportion_of_invalid_entries_bins = [0.] + [
-        invalid_entry_bins[i]/total_p_value_entries_bins[i] if total_p_value_entries_bins[i] else 0.
-                    for i in range(1, len(good_entry_bins))]
+    TICK_LABELS : List[str]
+        p-value interval tick points for the stacked histogram plot.
 
-    percentage_of_invalid_entries_bins = np.round(np.array(proportion_of_invalid_entries_bins)*100).astype(int)
-    percentage_of_invalid_entries_bins_str = np.char.array(percentage_of_invalid_entries_bins) + "%" # type: ignore # pylance mistakenly doesn't recognize np.char
+        List of strings with numerical values between 0 and 1 in ascending order. Sets the tick labels for the stacked histogram plot.
+        Actual ticks' numerical values will be inferred from the strings.
 
+    TICKS_WIDTH_RULE : 'even' | 'log10'
+        Sets the rule for calculation of width of bins in the stacked histogram.
 
+        With 'even', all bars will have unit width, regardless of the numerical difference between ticks.
 
-    ### PLOT: representation of the percentage of invalid entries for each bin ###
-    # the bottom and the top spines of the plot represent 0% and 100%
-    # skipping the first, "no p-value" bin
+        With 'log10', all bars will have widths adjusted in accord to log10 scale.
+        If the very first tick is zero, then the bin size from zero to the next tick equals to distance between 1e-4 and 1.
 
-    ax.plot(
-        # X: points right at the mid of bins (except the no p-value bin)
-        bins_mid_points[1:],
+    PROCESSES : int
+        Number of processes to validate entries with.
 
-        # Y: how much proportion -> that much height within the plot
-        np.array(proportion_of_invalid_entries_bins[1:]) * plt_height + plt_bottom,
+        With more than one process, plain text and BGZF files are split into ranges of lines validated independently,
+        while regular gzip files are decompressed in the main process and validated by chunks in the other processes.
 
-        linestyle='-',
-        color="red",
-        alpha=0.5,
-        linewidth=2,
-    )
+    PLOTS : bool
+        If False, only the textual report (invalid_entries.csv and summary.json) is saved into the REPORT_DIR,
+        and matplotlib isn't used at all.
+        If True, plots are saved as PNG files into the REPORT_DIR, or pop up in matplotlib windows if REPORT_DIR isn't set.
 
+    ISSUES_BITMASK : bool
+        If set, also saves a bitmask of issues for each row into the REPORT_DIR (issues_bitmask.npy),
+        which lets loop_fix skip valid rows of the same file without parsing them.
 
-    ### PLOT: Captions above the points of the plot ###
-    # shows percentage of invalid entries for each bin in text
-    # skipping the first, "no p-value" bin
+    CACHE_DIR : str | None
+        If set, validated entries of the file are saved into this dir (a compressed .npz file for each file and columns config).
+        When the same file is validated again, e.g. with other ticks, entries are loaded from the cache instead,
+        and only counting by bins and plotting are redone.
+        The cache is used as long as the file has the same size and either the same modification time or the same contents.
+    """
 
-    # points right at the mid of bins
-    X = bins_mid_points
-    # how much proportion -> that much height within the plot, also lifted 5%
-    Y = (np.array(proportion_of_invalid_entries_bins) * plt_height) + plt_height*0.05 + plt_bottom
+    if REPORT_DIR is None:
+        REPORT_ABS_DIR = None
+    else:
+        REPORT_ABS_DIR = os.path.abspath(REPORT_DIR)
 
-    for i in range(1, len(percentage_of_invalid_entries_bins_str)):
-        if proportion_of_invalid_entries_bins[i] > 0.15:
-            text = ax.text(X[i], Y[i], s=percentage_of_invalid_entries_bins_str[i],
-                horizontalalignment='center',
-                color="#bf3f3f", # caption may overlap with the red stuff from stacked bar
-                fontsize=10,
-                fontweight="demibold",
-            )
-        else:
-            text = ax.text(X[i], Y[i], s=percentage_of_invalid_entries_bins_str[i],
-                horizontalalignment='center',
-                color="#ff0000",
-                fontsize=10,
-            )
-        # text.set_path_effects([path_effects.Stroke(linewidth=1, foreground='#000000'),
-        #                        path_effects.Normal()])
+    if not file_exists(GWAS_FILE):
+        raise ValueError(f"passed GWAS SS file doesn't exist at path {GWAS_FILE}")
 
+    mime: str = magic.from_file(GWAS_FILE, mime=True)
+    if mime == 'application/gzip' or mime == 'application/x-gzip':
+        GWAS_FILE_o: BinaryIO = gzip.open(GWAS_FILE, 'rb')  # type: ignore # GzipFile is a binary file object
+        compression = 'bgzf' if is_bgzf(GWAS_FILE) else 'gzip'
+    elif mime == 'text/plain':
+        GWAS_FILE_o = open(GWAS_FILE, 'rb')
+        compression = 'none'
+    elif mime == 'inode/x-empty':
+        raise FileNotFoundError('The provided file is empty!')
+    else:
+        raise ValueError(f"Got unexpected type of file: {mime}")
 
-    if REPORT_ABS_DIR: fig.savefig(os.path.join(REPORT_ABS_DIR, image_name+'.png'))
 
+    if FORMAT_OR_CONFIG_FILE == "standard":
+        cols_i: Dict[str, int] = {STANDARD_COLUMN_ORDER[i]: i for i in range(len(STANDARD_COLUMN_ORDER))}
+    else:
+        if not file_exists(FORMAT_OR_CONFIG_FILE):
+            raise ValueError(f"passed GWAS SS file doesn't have the corresponding json config file at path: {FORMAT_OR_CONFIG_FILE}. Please create one based on the config.example.json file")
+        cols_i: Dict[str, int] = json.load(open(FORMAT_OR_CONFIG_FILE,))
 
-    ### PLOT: bar chart for issues in each of the p-value bins ###
-    for i in range(1, len(invalid_entry_bins)):
-        image_name = f'bin_{i}__{x[i-1]}—{x[i]}'
-        plot_i, ax = plt.subplots(num=image_name)
 
-        issues_proportions = [0] * len(ISSUES)
-        total_invalids = invalid_entry_bins[i]
-        total_snps = invalid_entry_bins[i] + good_entry_bins[i]
+    separator = '\t'
 
-        proportion_of_invalids = total_invalids / total_snps if total_snps else 0
-        percentage_of_invalids = proportion_of_invalids * 100
-        percentage_of_invalids_str = str(np.round(percentage_of_invalids, 1)) + "%"
+    ticks = parse_ticks(TICK_LABELS)
 
-        ax.set_title(f'issues in p-value: {x[i-1]} — {x[i]}\ninvalid SNPs: {total_invalids}/{total_snps} ({percentage_of_invalids_str})')
-        ax.set_ylim(0, total_invalids if total_invalids > 0 else 1)
-        ax.set_ylabel("N of invalid SNPs", fontweight="demibold", fontsize=14)
 
-        if total_invalids == 0:
-            ax.bar(ISSUES_LABELS, height=issues_proportions, width=1, color=ISSUES_COLORS)
-        else:
-            for issue in range(len(ISSUES)): # for each ISSUE
-                issues_proportions[issue] = invalid_entry_bins_reason_bins[i][issue] / total_invalids
-            ax.bar(ISSUES_LABELS, height=invalid_entry_bins_reason_bins[i], width=1, color=ISSUES_COLORS)
 
-        if REPORT_ABS_DIR: plot_i.savefig(os.path.join(REPORT_ABS_DIR, image_name+'.png'))
+    # # # # # # # # # # # # # # # # # # # # # # # # # #
+    #                                                 #
+    #                      MAIN                       #
+    #                                                 #
+    # # # # # # # # # # # # # # # # # # # # # # # # # #
 
+    MAIN_start_time = STEP1_start_time = time.time()
 
 
-    ### FINALLY: display results and the figure (if report directory was not set) ###
+    #
+    # STEP #1
+    #    read the file by chunks of lines and check the validity of each SNP entry,
+    #    and count valid, invalid entries and entries without p-value for each p-value bin
+    #
 
-    # print(f'missing_pval_bins = {missing_pval_bins}')
-    # print(f'good_entry_bins = {good_entry_bins}')
-    # print(f'invalid_entry_bins = {invalid_entry_bins}')
+    if REPORT_ABS_DIR:
+        if not dir_exists(REPORT_ABS_DIR):
+            os.makedirs(REPORT_ABS_DIR)
 
-    # print(f'proportion_of_invalid_entries_bins = {proportion_of_invalid_entries_bins}')
+    counts: Union[EntriesCounts, None] = None
+
+    # bitmask of issues for each row is written chunk by chunk
+    bitmask_writer = IssuesBitmaskWriter(REPORT_ABS_DIR) if ISSUES_BITMASK and REPORT_ABS_DIR else None
+    with_bitmask = bitmask_writer is not None
+
+    # validated entries are either loaded from the cache, or saved into it chunk by chunk
+    cached_chunks = None
+    cache_writer = None
+    if CACHE_DIR:
+        if not dir_exists(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        entries_cache_path = get_entries_cache_path(CACHE_DIR, GWAS_FILE, cols_i)
+        cached_chunks = read_entries_cache(entries_cache_path, GWAS_FILE, with_bitmask)
+        if cached_chunks is None:
+            cache_writer = EntriesCacheWriter(entries_cache_path)
+    with_entries = cache_writer is not None
+
+    def collect(chunk_counts: EntriesCounts, chunk_arrays: ChunkArrays):
+        nonlocal counts
+        counts = add_up_counts(counts, chunk_counts)
+        if bitmask_writer is not None:
+            bitmask_writer.write(chunk_arrays["bitmask"])
+        if cache_writer is not None:
+            cache_writer.write(chunk_arrays)
+
+    if cached_chunks is not None:
+
+        ### count entries loaded from the cache ###
+        print("loading validated entries from the cache")
+        for chunk_arrays in cached_chunks:
+            collect(count_cached_entries(chunk_arrays, ticks), chunk_arrays)
+
+    elif PROCESSES > 1:
+
+        ### validate parts of the file in separate processes and add up their counts ###
+        with multiprocessing.Pool(PROCESSES) as pool:
+            try:
+                if compression in ('none', 'bgzf'):
+                    n_shards = max(PROCESSES*SHARDS_PER_PROCESS, -(-os.path.getsize(GWAS_FILE) // MAX_SHARD_SIZE))
+                    if compression == 'bgzf':
+                        ranges_of_lines: List[Tuple[int, ...]] = list(split_bgzf_into_ranges(GWAS_FILE, n_shards))
+                    else:
+                        ranges_of_lines = list(split_into_ranges_of_lines(GWAS_FILE, n_shards))
+
+                    pbar = tqdm(total=len(ranges_of_lines), desc="validating parts of the file")
+                    results = [
+                        pool.apply_async(validate_range_of_lines, (GWAS_FILE, compression, range_of_lines, cols_i, separator, ticks, with_bitmask, with_entries))
+                            for range_of_lines in ranges_of_lines
+                    ]
+                    for result in results:
+                        collect(*result.get())
+                        pbar.update(1)
+                    pbar.close()
+
+                else:
+                    # regular gzip can only be decompressed sequentially,
+                    # so the chunks are sent to other processes as soon as they are decompressed
+                    pbar = tqdm(desc="validating entries ")
+                    pending: Deque[multiprocessing.pool.AsyncResult] = deque()
+
+                    def collect_one():
+                        chunk_counts, chunk_arrays = pending.popleft().get()
+                        collect(chunk_counts, chunk_arrays)
+                        pbar.update(chunk_counts[0])
+
+                    for chunk_i, chunk in enumerate(read_chunks_of_lines(GWAS_FILE_o, CHUNK_SIZE)):
+                        if chunk_i == 0:
+                            # skip the first line that is the header
+                            chunk = chunk[chunk.index(b'\n')+1:]
+                        pending.append(pool.apply_async(validate_chunk_of_lines, (chunk, cols_i, separator, ticks, with_bitmask, with_entries)))
+                        # don't let decompressed chunks pile up in memory
+                        if len(pending) >= 2*PROCESSES:
+                            collect_one()
+                    while pending:
+                        collect_one()
+                    pbar.close()
+
+            except Exception as e:
+                print(f'An error occured while validating a part of the GWAS SS file (see below)')
+                raise e
 
-    # for i in range(1, len(invalid_entry_bins)):
-    #     print(f"{x[i-1]} — {x[i]}: {[invalid_entry_bins_reason_bins[i][issue] for issue in ISSUES]}")
+    else:
+        line_i=0
 
+        ### check chunks of lines and add up their counts, so that only one chunk is in memory at a time ###
+        pbar = tqdm(desc="validating entries ")
+        try:
+            for chunk in read_chunks_of_lines(GWAS_FILE_o, CHUNK_SIZE):
+                if line_i == 0:
+                    # skip the first line that is the header
+                    chunk = chunk[chunk.index(b'\n')+1:]
+                    line_i += 1
+
+                chunk_counts, chunk_arrays = validate_chunk_of_lines(chunk, cols_i, separator, ticks, with_bitmask, with_entries)
+                collect(chunk_counts, chunk_arrays)
+                line_i += chunk_counts[0]
+                pbar.update(chunk_counts[0])
+
+        except Exception as e:
+            print(f'An error occured on a chunk of lines starting from line {line_i} of the GWAS SS file (see below)')
+            raise e
+        pbar.close()
 
+    if counts is None:
+        counts = empty_counts(ticks)
+    if bitmask_writer is not None:
+        bitmask_writer.close()
+    if cache_writer is not None:
+        cache_writer.close(GWAS_FILE)
 
-    if not REPORT_DIR:
-        plt.show()
-        input("")
-        input("")
+    GWAS_FILE_o.close()
 
+    report_entries(GWAS_FILE, counts, REPORT_ABS_DIR, TICK_LABELS, TICKS_WIDTH_RULE, PLOTS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,823 @@
+# standard library
+import re
+from typing import Any, Dict, List, Literal, Tuple, Union
+from math import isnan
+
+# third-party libraries
+import numpy as np
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    CONSTANTS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+GOOD_ENTRY = 0
+MISSING_P_VALUE = 1
+INVALID_ENTRY = 2
+
+
+# indices for boolean values in a list of issues for each SNP
+INVALID_ROW = 0
+INVALID_RSID = 1
+INVALID_CHR = 2
+INVALID_BP = 3
+INVALID_EA = 4
+INVALID_OA = 5
+INVALID_EAF = 6
+INVALID_SE = 7
+INVALID_ES = 8
+ISSUES=[
+    INVALID_ROW,
+    INVALID_RSID,
+    INVALID_CHR,
+    INVALID_BP,
+    INVALID_EA,
+    INVALID_OA,
+    INVALID_EAF,
+    INVALID_SE,
+    INVALID_ES,
+]
+ISSUES_LABELS = [
+    "format",
+    "rsID",
+    "Chr",
+    "BP",
+    "EA",
+    "OA",
+    "EAF",
+    "SE",
+    "beta",
+]
+
+# in the per-row bitmask of issues, bit `issue` is set for each of the ISSUES,
+# and this bit is set if p-value is missing or invalid
+INVALID_PVAL_BIT = len(ISSUES)
+
+NUCLEOTIDES = ['a', 't', 'c', 'g']
+NO_NUCLEOTIDE = '-'
+
+ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS = True
+
+CATEGORY_CHR = [
+'1', '01', '2', '02', '3', '03', '4', '04', '5', '05', '6', '06', '7', '07', '8', '08', '9', '09',
+'10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20',
+'21', '22', '23', 'X', 'x', 'Y', 'y', 'M', 'm']
+
+NULL_VALUES = ["", " ", ".", "-", "na", "nan"]
+
+RSID_PATTERN = re.compile(r"^rs\d+$")
+
+# columns that have to be present in a row for it to be well-formatted (besides p-value)
+ROW_COLUMNS = ["rsID", "Chr", "BP", "EA", "OA", "EAF", "SE", "beta"]
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#       FUNCTION THAT CHECKS EACH SNP ENTRY       #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def is_null(val: str) -> bool:
+    return val.lower() in NULL_VALUES
+
+
+def check_row(line_cols: List[str], cols_i: Dict[str, Any]) -> Union[
+        # "good" entry
+        Tuple[float, Literal[0], List[bool]],
+        # "missing/invalid p-value" entry
+        Tuple[None,  Literal[1], List[bool]],
+        # "invalid" entry, having some issues (listed in the list)
+        Tuple[float, Literal[2], List[bool]],
+    ]:
+    """
+    Checks a single SNP entry. This is the reference for the semantics of the validation,
+    `check_rows` has to produce exactly the same results for every row.
+
+    Returns:
+        - a p-value of a SNP,
+        - a report of whether a SNP entry is valid,
+        - and a list of issues with it
+    """
+
+    issues = [False] * len(ISSUES)
+    missing_pvalue = False
+
+    ### First check if p-value itself is present ###
+    pval = None
+    try:
+        pval = line_cols[cols_i["pval"]]
+        if is_null(pval) or not (0 <= float(pval) <= 1):
+            missing_pvalue = True
+        pval = float(pval)
+    except:
+        pval = None
+        missing_pvalue = True
+
+
+    ### Try getting all columns. If some not present, will throw ###
+    try:
+        rsid  = line_cols[cols_i["rsID"]]
+        chrom = line_cols[cols_i["Chr"]]
+        bp    = line_cols[cols_i["BP"]]
+        ea    = line_cols[cols_i["EA"]]
+        oa    = line_cols[cols_i["OA"]]
+        af    = line_cols[cols_i["EAF"]]
+        se    = line_cols[cols_i["SE"]]
+        es    = line_cols[cols_i["beta"]]
+        # n     = line_cols[cols_i["N"]]
+
+    except:
+        issues[INVALID_ROW] = True
+        if missing_pvalue:
+            return None, MISSING_P_VALUE, issues
+        else:
+            assert pval is not None
+            return pval, INVALID_ENTRY, issues # pval is None
+
+    ### Check any reasons this SNP will be discarded later ###
+
+    # 1. rsID
+    try:
+        if not RSID_PATTERN.match(rsid):
+            issues[INVALID_RSID] = True
+    except:
+        issues[INVALID_RSID] = True
+
+    # 2. chromosome
+    try:
+        if chrom not in CATEGORY_CHR and chrom[3:] not in CATEGORY_CHR:
+            issues[INVALID_CHR] = True
+    except:
+        issues[INVALID_CHR] = True
+
+    # 3. base pair position
+    try:
+        bp = int(float(bp)) # using float allows sci notation string
+        if bp < 0:
+            issues[INVALID_BP] = True
+    except:
+        issues[INVALID_BP] = True
+
+    # 4. effect allele
+    try:
+        if ea == '':
+            issues[INVALID_EA] = True
+        elif ea == NO_NUCLEOTIDE:
+            issues[INVALID_EA] = False
+        elif ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS:
+            for char in ea.lower():
+                if char not in NUCLEOTIDES:
+                    issues[INVALID_EA] = True
+        else:
+            if ea.lower() not in NUCLEOTIDES:
+                issues[INVALID_EA] = True
+    except:
+        issues[INVALID_EA] = True
+
+    # 5. other allele
+    try:
+        if oa == '':
+            issues[INVALID_OA] = True
+        elif oa == NO_NUCLEOTIDE:
+            issues[INVALID_OA] = False
+        elif ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS:
+            for char in oa.lower():
+                if char not in NUCLEOTIDES:
+                    issues[INVALID_OA] = True
+        else:
+            if oa.lower() not in NUCLEOTIDES:
+                issues[INVALID_OA] = True
+    except:
+        issues[INVALID_OA] = True
+
+    # 6. effect allele frequency or minor allele frequency
+    try:
+        if not (0 <= float(af) <= 1):
+            issues[INVALID_EAF] = True
+    except:
+        issues[INVALID_EAF] = True
+
+    # 7. standard error
+    try:
+        float(se) # will throw if not float
+        if is_null(se):
+            issues[INVALID_SE] = True
+    except:
+        issues[INVALID_SE] = True
+
+    # 8. effect size (odds ratio or beta-value)
+    try:
+        float(es) # will throw if not float
+        if is_null(es):
+            issues[INVALID_ES] = True
+    except:
+        issues[INVALID_ES] = True
+
+    # # 9. n - sample size
+    # #sometimes sample size is fractional
+    # if null_entry(n) or not (0 < float(n)):
+    #     return INVALID_ENTRY, pval
+
+    if missing_pvalue:
+        return None, MISSING_P_VALUE, issues
+    else:
+        assert pval is not None
+        if any(issues):
+            return pval, INVALID_ENTRY, issues
+        else:
+            # all good?
+            return pval, GOOD_ENTRY, issues
+
+
+
+def check_row_strictly(line_cols: List[str], cols_i: Dict[str, Any]) -> List[bool]:
+    """
+    Lists issues with values that `check_row` accepts, but resolvers in loop_fix consider invalid:
+    chromosomes with a prefix (e.g. "chr1"), and "nan" with a sign or whitespaces in SE or beta
+    """
+    issues = [False] * len(ISSUES)
+    try:
+        issues[INVALID_CHR] = line_cols[cols_i["Chr"]] not in CATEGORY_CHR
+    except:
+        pass
+    for col, issue in (("SE", INVALID_SE), ("beta", INVALID_ES)):
+        try:
+            issues[issue] = isnan(float(line_cols[cols_i[col]]))
+        except:
+            pass
+    return issues
+
+
+def get_issues_bitmask(SNPs_report: np.ndarray, SNPs_issues: np.ndarray) -> np.ndarray:
+    """
+    Packs issues of each SNP into a uint16 bitmask (see INVALID_PVAL_BIT)
+    """
+    weights = (1 << np.arange(len(ISSUES))).astype(np.uint16)
+    bitmask = SNPs_issues.astype(np.uint16) @ weights
+    bitmask |= (SNPs_report == MISSING_P_VALUE).astype(np.uint16) << np.uint16(INVALID_PVAL_BIT)
+    return bitmask
+
+
+def get_issues_from_bitmask(bitmask: np.ndarray) -> np.ndarray:
+    """
+    Unpacks a bitmask made by `get_issues_bitmask` back into a boolean matrix of issues
+    with a row for each SNP and a column for each of the ISSUES
+    """
+    return ((bitmask[:, None] >> np.arange(len(ISSUES), dtype=np.uint16)) & 1).astype(np.bool_)
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#     FUNCTIONS THAT CHECK A CHUNK OF ENTRIES     #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+"""
+The columnar engine. A chunk of the file (bytes, whole lines) is put into a numpy array of bytes.
+Positions of all separators give start and end of every field in every row,
+and every column is then checked at once as a matrix of bytes (a column for each field), padded with zeros.
+
+Rows with non-ASCII characters or null bytes, and values that are too exotic for the vectorized checks
+(e.g. "inf", "1_000", or floats with too many digits), fall back to the same python code as in `check_row`,
+so the results are always identical to checking each row with `check_row`.
+"""
+
+NEWLINE = ord('\n')
+
+# fields longer than that are checked in python
+MAX_FIELD_WIDTH = 32
+MAX_ALLELE_WIDTH = 64
+# proportion of the longest fields that are left for python, rather than widening the matrix of fields for them
+WIDTH_QUANTILE_GAP = 0.001
+# matrices of fields up to that width are cheap enough to fit all fields
+NARROW_WIDTH = 16
+
+# exact powers of 10 in float64
+POW10 = 10.0 ** np.arange(23)
+
+# a lookup table for chromosomes: 2 bytes of a chromosome => whether it's valid
+CHR_LUT = np.zeros(256*256, dtype=np.bool_)
+for _chr in CATEGORY_CHR:
+    _b = _chr.encode() + b'\0'
+    CHR_LUT[_b[0]*256 + _b[1]] = True
+
+# characters that may appear in a string that python's `float()` parses (besides non-ASCII whitespaces)
+FLOAT_CHARS_LUT = np.zeros(256, dtype=np.bool_)
+FLOAT_CHARS_LUT[list(b'0123456789+-._ \t\n\r\x0b\x0ceEinfatyINFATY')] = True
+FLOAT_CHARS_LUT[0] = True # padding
+
+NUCLEOTIDES_LUT = np.zeros(256, dtype=np.bool_)
+NUCLEOTIDES_LUT[[ord(c) for c in ''.join(NUCLEOTIDES)]] = True
+NUCLEOTIDES_LUT[[ord(c) for c in ''.join(NUCLEOTIDES).upper()]] = True
+
+
+def get_col_index(cols_i: Dict[str, Any], col: str) -> Union[int, None]:
+    """Index of the column as used by `check_row`, or None if accessing the column throws for any row"""
+    i = cols_i.get(col)
+    if isinstance(i, int):
+        return i
+    return None
+
+
+def has_column(n_fields: np.ndarray, col_i: Union[int, None]) -> np.ndarray:
+    """Boolean mask of rows that have a column with the given index (python list indexing rules)"""
+    if col_i is None:
+        return np.zeros(len(n_fields), dtype=np.bool_)
+    if col_i >= 0:
+        return n_fields > col_i
+    return n_fields >= -col_i
+
+
+def field_matrix(buf: np.ndarray, start: np.ndarray, lens: np.ndarray, width: int) -> np.ndarray:
+    """
+    Gathers fields from the buffer into a matrix of bytes with a column for each field (i.e. a row for each position).
+    Fields are cut at the `width` and padded with zeros. The buffer has to have at least `width` bytes
+    (rounded up to a multiple of 8) of padding at the end.
+
+    The matrix is "transposed" because numpy reduces short rows slowly, but is fast on reducing many long rows
+    """
+    # fields are gathered at once as 8-byte words starting at every byte of the buffer,
+    # which is much faster than gathering each position separately.
+    # Each position is then shifted out of the words, which is faster than transposing a matrix of bytes
+    n_words = -(-width // 8)
+    windows = np.ndarray(shape=(len(buf) - 8*n_words + 1,), dtype=np.dtype((np.void, 8*n_words)), buffer=buf, strides=(1,))
+    words = np.ascontiguousarray(windows[start].view('<u8').reshape(-1, n_words).T)
+    mat = np.empty((width, len(start)), dtype=np.uint8)
+    for j in range(width):
+        mat[j] = words[j // 8] >> np.uint64(8 * (j % 8))
+    mat *= np.arange(width, dtype=np.uint8)[:, None] < np.minimum(lens, width).astype(np.uint8)
+    return mat
+
+
+class Fields:
+    """Bounds of one column in a chunk"""
+    def __init__(self, chunk: bytes, buf: np.ndarray, has: np.ndarray, start: np.ndarray, end: np.ndarray):
+        self.chunk = chunk
+        self.buf = buf
+        self.has = has
+        self.start = start
+        self.end = end
+        self.lens = end - start
+
+    def str(self, i: int) -> str:
+        return self.chunk[self.start[i]:self.end[i]].decode('utf-8')
+
+    def width(self, todo: np.ndarray, max_width: int) -> int:
+        """
+        Width of the matrix of fields that fits most of the fields to do (the rest are checked in python)
+        """
+        longest = int(self.lens.max(where=todo, initial=1))
+        if longest <= min(NARROW_WIDTH, max_width):
+            return longest
+        lens_counts = np.bincount(np.minimum(self.lens[todo], max_width + 1), minlength=max_width + 2)
+        fits = np.cumsum(lens_counts) >= (1 - WIDTH_QUANTILE_GAP) * lens_counts.sum()
+        return max(1, min(int(np.argmax(fits)), max_width))
+
+    def matrix(self, width: int) -> np.ndarray:
+        return field_matrix(self.buf, self.start, self.lens, width)
+
+    def subset(self, rows: np.ndarray) -> 'Fields':
+        return Fields(self.chunk, self.buf, self.has[rows], self.start[rows], self.end[rows])
+
+
+def parse_any_floats(fields: Fields, todo: np.ndarray, with_values: bool = True):
+    """
+    Parses fields the same way python's `float()` does.
+
+    Plain numbers with up to 15 significant digits and a small exponent are parsed with
+    Clinger's fast path, which is exact: an integer mantissa and a power of 10 are both exactly representable in float64,
+    so a single multiplication/division is correctly rounded. Everything else is parsed with `float()`.
+
+    Returns the array of parsed values (nan where not parsed) and the mask of values that were successfully parsed.
+    If `with_values` is False, values of plain decimal numbers aren't computed and are set to 0
+    """
+    n = len(todo)
+    values = np.full(n, np.nan, dtype=np.float64)
+    parsed = np.zeros(n, dtype=np.bool_)
+
+    todo = todo & (fields.lens > 0) # float('') throws
+    if not todo.any():
+        return values, parsed
+
+    width = fields.width(todo, MAX_FIELD_WIDTH)
+    mat = fields.matrix(width)
+    lens = np.minimum(fields.lens, width + 1).astype(np.uint8)
+    pos = np.arange(width, dtype=np.uint8)[:, None]
+
+    digits = mat - np.uint8(ord('0'))
+    is_digit = digits < 10
+    is_exp = (mat | np.uint8(0x20)) == ord('e')
+    is_dot = mat == ord('.')
+    is_sign = (mat == ord('+')) | (mat == ord('-'))
+
+    n_digits = is_digit.sum(axis=0, dtype=np.uint8)
+    n_exps = is_exp.sum(axis=0, dtype=np.uint8)
+    n_dots = is_dot.sum(axis=0, dtype=np.uint8)
+    n_signs = is_sign.sum(axis=0, dtype=np.uint8)
+    has_exp = n_exps > 0
+
+    exp_pos = np.where(has_exp, (is_exp * pos).max(axis=0), lens)
+    dot_pos = np.where(n_dots > 0, (is_dot * pos).max(axis=0), exp_pos)
+    after_exp = pos == exp_pos + np.uint8(1)
+    n_signs_after_exp = (is_sign & after_exp).any(axis=0).astype(np.uint8)
+
+    mantissa_digits = is_digit & (pos < exp_pos)
+    n_mantissa_digits = mantissa_digits.sum(axis=0, dtype=np.uint8)
+    n_exp_digits = n_digits - n_mantissa_digits
+
+    # [+-]? digits [. digits]? ([eE] [+-]? digits)?  with at least one digit in the mantissa
+    plain_number = (
+        todo & (fields.lens <= width) &
+        (n_digits + n_exps + n_dots + n_signs == lens) &
+        (n_exps <= 1) & (n_dots <= 1) & (dot_pos <= exp_pos) &
+        (n_signs == is_sign[0] + n_signs_after_exp) &
+        (n_mantissa_digits >= 1) & (~has_exp | (n_exp_digits >= 1))
+    )
+
+    if with_values:
+        # Horner's scheme over positions, where positions of other characters multiply by 1 and add 0
+        mantissa = np.zeros(n, dtype=np.float64)
+        multipliers = mantissa_digits * np.uint8(9) + np.uint8(1)
+        addends = digits * mantissa_digits
+        for j in range(int(exp_pos.max(initial=0, where=plain_number))):
+            mantissa *= multipliers[j]
+            mantissa += addends[j]
+
+        exponent = np.zeros(n, dtype=np.int64)
+        if (plain_number & has_exp).any():
+            exp_digits = is_digit & (pos > exp_pos)
+            multipliers = exp_digits * np.uint8(9) + np.uint8(1)
+            addends = digits * exp_digits
+            for j in range(int(exp_pos.min(initial=width, where=plain_number & has_exp)), width):
+                exponent *= multipliers[j]
+                exponent += addends[j]
+            exponent[((mat == ord('-')) & after_exp).any(axis=0)] *= -1
+        # in plain numbers, everything between the dot and the exponent are digits of the fraction
+        exponent -= np.where(n_dots > 0, exp_pos.astype(np.int64) - dot_pos - 1, 0)
+
+        fast_path = plain_number & (n_mantissa_digits <= 15) & (n_exp_digits <= 5) & (np.abs(exponent) < len(POW10))
+        power = POW10[np.minimum(np.abs(exponent), len(POW10) - 1)]
+        fast_values = np.where(exponent >= 0, mantissa * power, mantissa / power)
+        fast_values[mat[0] == ord('-')] *= -1
+        values[fast_path] = fast_values[fast_path]
+    else:
+        fast_path = plain_number
+        values[fast_path] = 0.
+
+    parsed[fast_path] = True
+
+    # anything that python may parse has either a digit, or has an "n" in it ("nan", "inf", "infinity"), and only has
+    # characters of those words, digits, signs, dots, underscores and whitespaces (python's `float()` strips them)
+    rest = np.flatnonzero(todo & ~fast_path & (fields.lens <= width))
+    rest_mat = mat[:, rest]
+    may_be_float = (
+        FLOAT_CHARS_LUT.take(rest_mat).all(axis=0) &
+        ((n_digits[rest] > 0) | (((rest_mat | np.uint8(0x20)) == ord('n')).any(axis=0) & (lens[rest] >= 3)))
+    )
+    rest = np.concatenate((rest[may_be_float], np.flatnonzero(todo & (fields.lens > width))))
+
+    for i in rest:
+        try:
+            values[i] = float(fields.str(i))
+            parsed[i] = True
+        except:
+            pass
+
+    return values, parsed
+
+
+def mantissas(digits: np.ndarray, is_digit: np.ndarray) -> np.ndarray:
+    """
+    Integers made of the digits in each column of the matrix, skipping other characters. The width has to be a multiple of 4.
+    The result is exact for up to 15 digits.
+
+    Neighbouring positions are combined in pairs, and pairs in quads, in small integer types,
+    so that only every 4th position takes a multiplication in float64
+    """
+    multipliers = is_digit * np.uint8(9) + np.uint8(1)
+    addends = digits * is_digit
+    pair_multipliers = multipliers[0::2] * multipliers[1::2]
+    pair_addends = addends[0::2] * multipliers[1::2] + addends[1::2]
+    quad_multipliers = (pair_multipliers[0::2].astype(np.uint16) * pair_multipliers[1::2]).astype(np.float64)
+    quad_addends = (pair_addends[0::2].astype(np.uint16) * pair_multipliers[1::2] + pair_addends[1::2]).astype(np.float64)
+    mantissa = quad_addends[0]
+    for j in range(1, len(quad_addends)):
+        mantissa *= quad_multipliers[j]
+        mantissa += quad_addends[j]
+    return mantissa
+
+
+def decimal_values(mat: np.ndarray, lens: np.ndarray) -> np.ndarray:
+    """
+    Values of decimal numbers (see `parse_floats`) with up to 15 digits in each column of the matrix.
+    Computed with Clinger's fast path (see `parse_any_floats`)
+    """
+    digits = mat - np.uint8(ord('0'))
+    # position of the dot + 1, or 0 if there's no dot
+    dot_end = ((mat == ord('.')) * np.arange(1, len(mat) + 1, dtype=np.uint8)[:, None]).max(axis=0)
+    n_fraction_digits = np.where(dot_end > 0, lens - dot_end, 0)
+    values = mantissas(digits, digits < 10) / POW10[np.minimum(n_fraction_digits, len(POW10) - 1)]
+    np.negative(values, out=values, where=mat[0] == ord('-'))
+    return values
+
+
+def parse_floats(fields: Fields, todo: np.ndarray, with_values: Union[bool, np.ndarray] = True):
+    """
+    Parses fields the same way python's `float()` does.
+
+    Decimal numbers, i.e. digits with an optional dot and an optional leading minus, are by far the most common,
+    and are recognized with just a few operations, as well as "nan" in any case. All other fields are parsed with `parse_any_floats`.
+
+    Returns the array of parsed values (nan where not parsed) and the mask of values that were successfully parsed.
+    `with_values` is either whether to compute the values, or the mask of rows for which values of decimal numbers are needed.
+    Values that aren't computed are set to 0
+    """
+    n = len(todo)
+    values = np.full(n, np.nan, dtype=np.float64)
+    parsed = np.zeros(n, dtype=np.bool_)
+
+    todo = todo & (fields.lens > 0) # float('') throws
+    if not todo.any():
+        return values, parsed
+
+    width = -(-fields.width(todo, MAX_FIELD_WIDTH) // 4) * 4
+    mat = fields.matrix(width)
+    lens = fields.lens
+
+    is_digit = (mat - np.uint8(ord('0'))) < 10
+    n_digits = is_digit.sum(axis=0, dtype=np.uint8)
+    n_dots = (mat == ord('.')).sum(axis=0, dtype=np.uint8)
+    # -? digits [. digits]?  where either part may be empty, but not both
+    decimal = (
+        todo & (lens <= width) &
+        (n_digits + n_dots + (mat[0] == ord('-')) == lens) & (n_dots <= 1) & (n_digits >= 1)
+    )
+
+    if with_values is True:
+        values_needed = decimal
+    elif with_values is False:
+        values_needed = np.zeros(n, dtype=np.bool_)
+    else:
+        values_needed = with_values
+    # Clinger's fast path is exact for up to 15 digits, longer numbers are left for `parse_any_floats`
+    decimal &= ~values_needed | (n_digits <= 15)
+    values[decimal] = 0.
+    computed = decimal & values_needed
+    n_computed = np.count_nonzero(computed)
+    # it's only worth gathering the fields to compute when there are few of them
+    if n_computed > n // 2:
+        np.copyto(values, decimal_values(mat, lens), where=computed)
+    elif n_computed:
+        computed = np.flatnonzero(computed)
+        values[computed] = decimal_values(mat[:, computed], lens[computed])
+    parsed |= decimal
+
+    if width >= 3:
+        lowercase = mat[:3] | np.uint8(0x20)
+        parsed |= todo & (lens == 3) & (lowercase[0] == ord('n')) & (lowercase[1] == ord('a')) & (lowercase[2] == ord('n'))
+
+    # anything else that python may parse has either a digit, or has an "n" in it ("nan", "inf", "infinity"), and only has
+    # characters of those words, digits, signs, dots, underscores and whitespaces (python's `float()` strips them)
+    rest = np.flatnonzero(todo & ~parsed)
+    rest_mat = mat[:, rest]
+    may_be_float = (lens[rest] > width) | (
+        FLOAT_CHARS_LUT.take(rest_mat).all(axis=0) &
+        ((n_digits[rest] > 0) | (((rest_mat | np.uint8(0x20)) == ord('n')).any(axis=0) & (lens[rest] >= 3)))
+    )
+    rest = rest[may_be_float]
+    if len(rest):
+        values[rest], parsed[rest] = parse_any_floats(fields.subset(rest), np.ones(len(rest), dtype=np.bool_), with_values is not False)
+
+    return values, parsed
+
+
+def check_rsIDs(fields: Fields, todo: np.ndarray) -> np.ndarray:
+    """Vectorized `RSID_PATTERN.match(rsid)`. Returns the mask of valid rsIDs"""
+    width = max(3, fields.width(todo, MAX_FIELD_WIDTH))
+    mat = fields.matrix(width)
+    lens = fields.lens
+    digit_or_pad = ((mat[2:] - np.uint8(ord('0'))) < 10) | (mat[2:] == 0)
+    valid = (
+        todo & (lens >= 3) & (lens <= width) &
+        (mat[0] == ord('r')) & (mat[1] == ord('s')) &
+        digit_or_pad.all(axis=0)
+    )
+    for i in np.flatnonzero(todo & (lens > width)):
+        valid[i] = bool(RSID_PATTERN.match(fields.str(i)))
+    return valid
+
+
+def check_Chrs(fields: Fields, todo: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `chrom in CATEGORY_CHR or chrom[3:] in CATEGORY_CHR`. Returns the mask of valid chromosomes
+
+    All valid chromosome values are 1 or 2 characters long,
+    so a field is valid only if it is 1-2 bytes long, or 4-5 bytes long with the last 1-2 bytes being valid
+    """
+    mat = fields.matrix(5).astype(np.uint16)
+    lens = fields.lens
+    valid = (
+        ((lens >= 1) & (lens <= 2) & CHR_LUT.take(mat[0] << 8 | mat[1])) |
+        ((lens >= 4) & (lens <= 5) & CHR_LUT.take(mat[3] << 8 | mat[4]))
+    )
+    return todo & valid
+
+
+def is_valid_allele(allele: str) -> bool:
+    """The allele check from `check_row`"""
+    if allele == '':
+        return False
+    elif allele == NO_NUCLEOTIDE:
+        return True
+    elif ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS:
+        return all(char in NUCLEOTIDES for char in allele.lower())
+    else:
+        return allele.lower() in NUCLEOTIDES
+
+
+def check_alleles(fields: Fields, todo: np.ndarray) -> np.ndarray:
+    """Vectorized allele check from `check_row`. Returns the mask of valid alleles"""
+    lens = fields.lens
+    first_char = fields.buf.take(fields.start)
+    valid = todo & (lens == 1) & (NUCLEOTIDES_LUT.take(first_char) | (first_char == ord(NO_NUCLEOTIDE)))
+
+    if ALLOW_MULTI_NUCLEOTIDE_POLYMORPHISMS:
+        # most alleles are single nucleotides, so longer ones are gathered separately
+        longer = todo & (lens > 1)
+        width = fields.width(longer, MAX_ALLELE_WIDTH)
+        longer_i = np.flatnonzero(longer & (lens <= width))
+        mat = field_matrix(fields.buf, fields.start[longer_i], lens[longer_i], width)
+        valid[longer_i] = (NUCLEOTIDES_LUT.take(mat) | (mat == 0)).all(axis=0)
+        for i in np.flatnonzero(longer & (lens > width)):
+            valid[i] = is_valid_allele(fields.str(i))
+
+    return valid
+
+
+def check_rows(chunk: bytes, cols_i: Dict[str, Any], separator: str = '\t', with_bitmask: bool = False):
+    """
+    Checks a chunk of SNP entries at once.
+    Gives exactly the same results as calling `check_row` for each line of the chunk.
+
+    Parameters
+    ----------
+    chunk : bytes
+        whole lines of the GWAS SS file, in UTF-8, with "\\n" line endings
+
+    cols_i : Dict[str, Any]
+        column indices, as in the json config file
+
+    separator : str
+        column separator, a single ASCII character
+
+    with_bitmask : bool
+        whether to also return the bitmask of issues for each SNP (see `get_issues_bitmask`),
+        which also includes issues from `check_row_strictly`
+
+    Returns
+    -------
+    (SNPs_pval, SNPs_report, SNPs_issues) : Tuple[np.ndarray, np.ndarray, np.ndarray]
+        float64 array of p-values (nan if a p-value is missing or invalid),
+        int8 array of reports,
+        and a boolean matrix of issues with a row for each SNP and a column for each of the ISSUES
+
+    (SNPs_pval, SNPs_report, SNPs_issues, SNPs_bitmask) : Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        if `with_bitmask` is set
+    """
+    if chunk and not chunk.endswith(b'\n'):
+        chunk += b'\n'
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    padded_buf = np.concatenate((buf, np.zeros(MAX_ALLELE_WIDTH, dtype=np.uint8)))
+
+    ### positions of all fields ###
+    is_newline = buf == NEWLINE
+    seps = np.flatnonzero(is_newline | (buf == ord(separator)))
+    n = int(np.count_nonzero(is_newline))
+
+    SNPs_pval = np.full(n, np.nan, dtype=np.float64)
+    SNPs_report = np.zeros(n, dtype=np.int8)
+    # issues are filled in with a row for each issue, which is much faster, and are returned transposed
+    issues = np.zeros((len(ISSUES), n), dtype=np.bool_)
+    # issues from `check_row_strictly`
+    strict_issues = np.zeros((len(ISSUES), n), dtype=np.bool_)
+    if n == 0:
+        return (SNPs_pval, SNPs_report, issues.T) + ((np.zeros(0, dtype=np.uint16),) if with_bitmask else ())
+
+    # usually all rows have the same number of fields, and then separators make a matrix with a column for each line
+    n_cols = int(np.searchsorted(seps, chunk.index(b'\n'))) + 1
+    seps_by_col = None
+    if len(seps) == n * n_cols:
+        # (transposed, so that bounds of fields in each column are contiguous, and narrowed, which makes transposing faster)
+        seps_by_col = np.ascontiguousarray(seps.astype(np.int32 if len(buf) < 2**31 else np.int64).reshape(n, n_cols).T)
+        if not (buf.take(seps_by_col[-1]) == NEWLINE).all():
+            seps_by_col = None
+    if seps_by_col is not None:
+        line_ends = seps_by_col[-1]
+        n_fields = np.full(n, n_cols)
+    else:
+        seps_i_at_line_ends = np.flatnonzero(buf.take(seps) == NEWLINE)
+        line_ends = seps[seps_i_at_line_ends]
+        first_sep_i = np.concatenate(([0], seps_i_at_line_ends[:-1] + 1))
+        n_fields = seps_i_at_line_ends - first_sep_i + 1
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+
+    # rows with non-ASCII characters or null bytes are checked one by one
+    special_rows = np.array([], dtype=np.int64)
+    if buf.max() >= 128 or not buf.all():
+        special_bytes_pos = np.flatnonzero((buf >= 128) | (buf == 0))
+        special_rows = np.unique(np.searchsorted(line_ends, special_bytes_pos))
+    regular = np.ones(n, dtype=np.bool_)
+    regular[special_rows] = False
+
+    def get_fields(col: str) -> Fields:
+        col_i = get_col_index(cols_i, col)
+        has = has_column(n_fields, col_i)
+        if col_i is None or not has.any():
+            return Fields(chunk, padded_buf, has, line_starts, line_starts)
+        if seps_by_col is not None:
+            k = col_i % n_cols
+            end = seps_by_col[k]
+            start = line_starts if k == 0 else seps_by_col[k - 1] + 1
+        elif col_i >= 0:
+            # bounds of the fields in rows that don't have the column are taken from the next rows, but are never used
+            sep_i = np.minimum(first_sep_i + col_i, len(seps) - 1)
+            end = seps[sep_i]
+            start = line_starts if col_i == 0 else seps[sep_i - 1] + 1
+        else:
+            k = np.where(has, n_fields + col_i, 0)
+            sep_i = first_sep_i + k
+            end = seps[sep_i]
+            start = np.where(k == 0, line_starts, seps[sep_i - 1] + 1)
+        return Fields(chunk, padded_buf, has, start, end)
+
+
+    ### p-value ###
+    pval_fields = get_fields("pval")
+    pvals, parsed = parse_floats(pval_fields, pval_fields.has & regular)
+    valid_pval = parsed & (pvals >= 0) & (pvals <= 1)
+    SNPs_pval[valid_pval] = pvals[valid_pval]
+
+
+    ### format: all columns have to be present ###
+    fields: Dict[str, Fields] = {col: get_fields(col) for col in ROW_COLUMNS}
+    well_formatted = np.ones(n, dtype=np.bool_)
+    for col in ROW_COLUMNS:
+        well_formatted &= fields[col].has
+    issues[INVALID_ROW] = ~well_formatted
+
+    todo = well_formatted & regular
+    if todo.any():
+        # 1. rsID
+        issues[INVALID_RSID] = todo & ~check_rsIDs(fields["rsID"], todo)
+
+        # 2. chromosome
+        issues[INVALID_CHR] = todo & ~check_Chrs(fields["Chr"], todo)
+        # valid chromosomes without a prefix are 1-2 characters long
+        strict_issues[INVALID_CHR] = todo & (fields["Chr"].lens > 2)
+
+        # 3. base pair position: int(float(bp)) >= 0, which only depends on the value of negative numbers
+        bp_fields = fields["BP"]
+        bps, parsed = parse_floats(bp_fields, todo, with_values=bp_fields.buf.take(bp_fields.start) == ord('-'))
+        with np.errstate(invalid='ignore'):
+            issues[INVALID_BP] = todo & ~(parsed & np.isfinite(bps) & (bps > -1))
+
+        # 4. effect allele
+        issues[INVALID_EA] = todo & ~check_alleles(fields["EA"], todo)
+
+        # 5. other allele
+        issues[INVALID_OA] = todo & ~check_alleles(fields["OA"], todo)
+
+        # 6. effect allele frequency or minor allele frequency, which is valid without its value if it's "0." followed by digits
+        af_fields = fields["EAF"]
+        zero_point = (af_fields.buf.take(af_fields.start) == ord('0')) & (af_fields.buf.take(af_fields.start + 1) == ord('.'))
+        afs, parsed = parse_floats(af_fields, todo, with_values=~zero_point)
+        with np.errstate(invalid='ignore'):
+            issues[INVALID_EAF] = todo & ~(parsed & (afs >= 0) & (afs <= 1))
+
+        # 7. standard error, and 8. effect size: a float that is not a null value
+        for col, issue in (("SE", INVALID_SE), ("beta", INVALID_ES)):
+            floats, parsed = parse_floats(fields[col], todo, with_values=False)
+            is_nan = parsed & np.isnan(floats)
+            strict_issues[issue] = is_nan
+            # the only null value that can be parsed as float is "nan" in any case, while e.g. "+nan" or " nan" aren't null
+            parsed &= ~(is_nan & (fields[col].lens == 3))
+            issues[issue] = todo & ~parsed
+
+
+    SNPs_report[issues.any(axis=0)] = INVALID_ENTRY
+    SNPs_report[~valid_pval] = MISSING_P_VALUE
+
+    for i in special_rows:
+        line_cols = chunk[line_starts[i]:line_ends[i]].decode('utf-8').split(separator)
+        SNPs_pval[i], SNPs_report[i], issues[:, i] = check_row(line_cols, cols_i)
+        if with_bitmask and not issues[INVALID_ROW, i]:
+            strict_issues[:, i] = check_row_strictly(line_cols, cols_i)
+
+    if with_bitmask:
+        return SNPs_pval, SNPs_report, issues.T, get_issues_bitmask(SNPs_report, (issues | strict_issues).T)
+    return SNPs_pval, SNPs_report, issues.T
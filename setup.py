@@ -9,7 +9,6 @@ install_requires = [
     "numpy>=1.20.1",
     "matplotlib>=3.3.4",
     "scipy==1.6.1",
-    "liftover==1.1.13",
     "python-magic==0.4.24",
     "requests>=2.22.0",
     "tqdm>=4.60.0, <5.0.0",
@@ -35,18 +34,24 @@ if __name__ == "__main__":
         classifiers=classifiers.split("\n"),
         zip_safe=False,
         py_modules=['SumStatsRehab',
+            'lib/chain_utils',
+            'lib/dbSNP_utils',
             'lib/env',
             'lib/file',
+            'lib/liftover_GWASSS',
             'lib/loop_fix',
             'lib/math_utils',
             'lib/prepare_GWASSS_columns',
             'lib/prepare_two_dbSNPs',
+            'lib/report_plots',
             'lib/report_utils',
+            'lib/sample_GWASSS_entries',
             'lib/sort_GWASSS_by_ChrBP',
             'lib/sort_GWASSS_by_rsID',
             'lib/standard_column_order',
             'lib/utils',
             'lib/validate_GWASSS_entries',
+            'lib/validation_utils',
         ],
         install_requires=install_requires,
         entry_points={"console_scripts": ["SumStatsRehab=SumStatsRehab:main"]},
@@ -0,0 +1,162 @@
+# standard library
+import random
+from math import copysign, isnan
+from typing import Any, Dict, List
+
+# third-party libraries
+import numpy as np
+import pytest
+
+# local
+from lib.standard_column_order import STANDARD_COLUMN_ORDER
+from lib.validation_utils import (
+    INVALID_ROW, ISSUES, MISSING_P_VALUE,
+    check_row, check_row_strictly, check_rows, get_issues_bitmask,
+)
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    CONSTANTS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+"""
+`check_rows` has to give exactly the same results as `check_row` for every row.
+Rows are made of values that go through each of the paths in `check_rows`: the vectorized checks,
+the fallback to python for values that are too long or too exotic, and rows with non-ASCII characters or null bytes
+"""
+
+FLOATS = [
+    # plain numbers
+    '0', '1', '0.5', '-0.5', '.5', '5.', '-.5', '-0', '-0.0', '00012', '0.082073', '-0.0341027', '0.7732',
+    '123456789012345', '1234567890123456', '9007199254740993', '0.12345678901234567890', '1.0000000000000000001',
+    # scientific notation
+    '1e-5', '1E+05', '3.91734e-05', '1.e5', '0.1e1', '1e22', '1e23', '1e-22', '1e-23', '5e-324', '1e400', '-1e400', '1e-400',
+    # invalid or null values
+    '', '.', '-', '+', 'NA', 'na', 'N', 'e', 'e5', '.e5', '1e', '1e+-5', '1.2.3', '1e5.5', '--1', '1-', '++1', '1 2', 'abc', '0x10',
+    # values only python parses
+    '+1', '+.5', 'inf', '-Infinity', 'infinit', 'nan', 'NaN', '-nan', ' 0.5 ', '1_000', '1_0.5', '1e1_0', '1__0', '_1',
+    # out of range for some of the columns
+    '1.5', '2', '-1', '-1.5', '46000130', '0.' + '1'*40, '1'*40,
+    # non-ASCII and null bytes
+    '٣', ' 0.5', '1\x000', 'ｎａｎ',
+]
+
+RSIDS = ['rs123', 'rs8578543', 'rs', 'RS123', 'rs12a', 'rs123 ', 'rs' + '1'*40, '1:12345_A_G', '.', '', 'NA', 'rs１２', 'rs1\x00']
+
+CHRS = [
+    '1', '01', '9', '10', '22', '23', '24', 'X', 'x', 'Y', 'M', 'MT', '0', '', '.', 'NA',
+    'chr1', 'chrX', 'chr01', 'chr23', 'chr24', 'chr', 'Chr1', 'ch1', 'chrom1', 'chr1 ', 'chrΧ',
+]
+
+ALLELES = ['A', 'c', 'G', 't', '-', '', '.', 'N', 'AT', 'acgt', 'A-', '--', 'A'*70, 'T'*70 + 'N', 'é', 'A\x00']
+
+VALUES: Dict[str, List[str]] = {
+    "Chr": CHRS,
+    "BP": FLOATS,
+    "rsID": RSIDS,
+    "OA": ALLELES,
+    "EA": ALLELES,
+    "EAF": FLOATS,
+    "beta": FLOATS,
+    "SE": FLOATS,
+    "pval": FLOATS,
+    "N": ['50000', ''],
+    "INFO": ['0.8', 'é'],
+}
+
+STANDARD_COLS_I: Dict[str, Any] = {col: i for i, col in enumerate(STANDARD_COLUMN_ORDER)}
+
+COLS_I_VARIANTS: Dict[str, Dict[str, Any]] = {
+    "standard": STANDARD_COLS_I,
+    "shuffled": {col: i for i, col in enumerate(["pval", "rsID", "EA", "OA", "SE", "beta", "EAF", "Chr", "BP", "N", "INFO"])},
+    "negative indices": {**STANDARD_COLS_I, "pval": -3, "EA": -7},
+    "no p-value": {col: i for col, i in STANDARD_COLS_I.items() if col != "pval"},
+    "no SE": {col: i for col, i in STANDARD_COLS_I.items() if col != "SE"},
+}
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                    FUNCTIONS                    #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def make_rows(num_of_rows: int, seed: int) -> List[str]:
+    """
+    Random rows in the standard column order. Most rows are valid, others have a few invalid values
+    or miss columns, so that each column is checked both in well-formatted and malformed rows
+    """
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(num_of_rows):
+        fields = [rng.choice(VALUES[col][:2] if rng.random() < 0.5 else VALUES[col]) for col in STANDARD_COLUMN_ORDER]
+        r = rng.random()
+        if r < 0.05:
+            fields = fields[:rng.randrange(len(fields))]
+        elif r < 0.07:
+            fields += ['extra']
+        rows.append('\t'.join(fields))
+    return rows
+
+
+def assert_same_as_check_row(rows: List[str], cols_i: Dict[str, Any]):
+    SNPs_pval, SNPs_report, SNPs_issues, SNPs_bitmask = check_rows(
+        ''.join(row + '\n' for row in rows).encode('utf-8'), cols_i, '\t', with_bitmask=True
+    )
+    assert len(SNPs_report) == len(rows)
+
+    for i, row in enumerate(rows):
+        line_cols = row.split('\t')
+        pval, report, issues = check_row(line_cols, cols_i)
+        strict_issues = check_row_strictly(line_cols, cols_i) if not issues[INVALID_ROW] else [False] * len(ISSUES)
+        bitmask = get_issues_bitmask(np.array([report]), np.array([issues]) | np.array([strict_issues]))[0]
+
+        assert (SNPs_report[i], SNPs_issues[i].tolist(), SNPs_bitmask[i]) == (report, issues, bitmask), repr(row)
+        if report == MISSING_P_VALUE:
+            assert isnan(SNPs_pval[i]), repr(row)
+        else:
+            assert (SNPs_pval[i], copysign(1, SNPs_pval[i])) == (pval, copysign(1, pval)), repr(row)
+
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                 #
+#                      TESTS                      #
+#                                                 #
+# # # # # # # # # # # # # # # # # # # # # # # # # #
+
+@pytest.mark.parametrize("cols_i", COLS_I_VARIANTS.values(), ids=COLS_I_VARIANTS.keys())
+def test_check_rows_random_rows(cols_i: Dict[str, Any]):
+    assert_same_as_check_row(make_rows(20000, seed=0), cols_i)
+
+
+@pytest.mark.parametrize("col", [col for col in STANDARD_COLUMN_ORDER if col not in ("N", "INFO")])
+def test_check_rows_each_value(col: str):
+    """Every value of the column in an otherwise valid row"""
+    valid_row = [VALUES[c][0] for c in STANDARD_COLUMN_ORDER]
+    rows = []
+    for value in VALUES[col]:
+        row = valid_row.copy()
+        row[STANDARD_COLUMN_ORDER.index(col)] = value
+        rows.append('\t'.join(row))
+    assert_same_as_check_row(rows, STANDARD_COLS_I)
+
+
+def test_check_rows_malformed_rows():
+    valid_row = [VALUES[c][0] for c in STANDARD_COLUMN_ORDER]
+    rows = ['\t'.join(valid_row[:k]) for k in range(len(valid_row) + 1)]
+    rows += ['\t'.join(valid_row + ['extra']), '\t'.join(valid_row[:3]) + '\tü', '\t'.join(valid_row[:8]) + '\t\x00']
+    for cols_i in COLS_I_VARIANTS.values():
+        assert_same_as_check_row(rows, cols_i)
+
+
+def test_check_rows_empty_chunk_and_missing_newline():
+    SNPs_pval, SNPs_report, SNPs_issues = check_rows(b'', STANDARD_COLS_I)
+    assert (len(SNPs_pval), len(SNPs_report), SNPs_issues.shape) == (0, 0, (0, len(ISSUES)))
+
+    row = '\t'.join(VALUES[c][0] for c in STANDARD_COLUMN_ORDER)
+    assert check_rows(row.encode(), STANDARD_COLS_I)[1].tolist() == check_rows((row + '\n').encode(), STANDARD_COLS_I)[1].tolist()